@@ -3,9 +3,13 @@ Step 2 Solution: Generate embeddings for multiple sentences and compute cosine
 similarity between all pairs.
 """
 
-import math
+import os
+import sys
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from similarity import pairwise_similarity
+
 OLLAMA_URL = "http://localhost:11434/api/embed"
 
 SENTENCES = [
@@ -23,24 +27,6 @@ def get_embedding(text):
     return response.json()["embeddings"][0]
 
 
-def cosine_similarity(vec_a, vec_b):
-    """Compute the cosine similarity between two vectors.
-
-    Args:
-        vec_a: First embedding vector (list of floats).
-        vec_b: Second embedding vector (list of floats).
-
-    Returns:
-        A float between -1 and 1 representing cosine similarity.
-    """
-    dot_product = sum(a * b for a, b in zip(vec_a, vec_b))
-    norm_a = math.sqrt(sum(a * a for a in vec_a))
-    norm_b = math.sqrt(sum(b * b for b in vec_b))
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot_product / (norm_a * norm_b)
-
-
 if __name__ == "__main__":
     print("Generating embeddings for all sentences...")
     embeddings = []
@@ -51,11 +37,14 @@ if __name__ == "__main__":
 
     print(f"\nEmbedding dimensions: {len(embeddings[0])}")
 
+    # One matrix product gives the similarity of every pair of sentences.
+    similarities = pairwise_similarity(embeddings)
+
     print("\nPairwise cosine similarities:")
     print("-" * 60)
     for i in range(len(SENTENCES)):
         for j in range(i + 1, len(SENTENCES)):
-            sim = cosine_similarity(embeddings[i], embeddings[j])
+            sim = similarities[i, j]
             label_i = SENTENCES[i][:50]
             label_j = SENTENCES[j][:50]
             print(f"  ({i+1},{j+1}) {sim:.4f}  {label_i}...")
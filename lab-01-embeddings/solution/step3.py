@@ -3,9 +3,13 @@ Step 3 Solution: Compare similarity scores for semantically related vs unrelated
 term pairs.
 """
 
-import math
+import os
+import sys
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from similarity import cosine_similarity
+
 OLLAMA_URL = "http://localhost:11434/api/embed"
 
 TEST_PAIRS = [
@@ -26,16 +30,6 @@ def get_embedding(text):
     return response.json()["embeddings"][0]
 
 
-def cosine_similarity(vec_a, vec_b):
-    """Compute cosine similarity between two vectors."""
-    dot_product = sum(a * b for a, b in zip(vec_a, vec_b))
-    norm_a = math.sqrt(sum(a * a for a in vec_a))
-    norm_b = math.sqrt(sum(b * b for b in vec_b))
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot_product / (norm_a * norm_b)
-
-
 def classify_pair(similarity, threshold=SIMILARITY_THRESHOLD):
     """Classify a pair as 'similar' or 'dissimilar' based on the threshold."""
     return "similar" if similarity >= threshold else "dissimilar"
@@ -4,9 +4,13 @@ Embed a full paragraph, then split into sentences and embed each individually.
 Compare full-paragraph embedding to each sentence embedding.
 """
 
-import math
+import os
+import sys
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from similarity import cosine_scores, pairwise_similarity
+
 OLLAMA_URL = "http://localhost:11434/api/embed"
 
 AML_PARAGRAPH = (
@@ -27,16 +31,6 @@ def get_embedding(text):
     return response.json()["embeddings"][0]
 
 
-def cosine_similarity(vec_a, vec_b):
-    """Compute cosine similarity between two vectors."""
-    dot_product = sum(a * b for a, b in zip(vec_a, vec_b))
-    norm_a = math.sqrt(sum(a * a for a in vec_a))
-    norm_b = math.sqrt(sum(b * b for b in vec_b))
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot_product / (norm_a * norm_b)
-
-
 def split_into_sentences(text):
     """Split text into sentences on period boundaries.
 
@@ -68,30 +62,25 @@ if __name__ == "__main__":
     sentences = split_into_sentences(AML_PARAGRAPH)
     print(f"Number of sentences: {len(sentences)}\n")
 
+    sent_embeddings = [get_embedding(sentence) for sentence in sentences]
+    sims_to_full = cosine_scores(full_embedding, sent_embeddings)
+
     print("Similarity of each sentence to the full paragraph:")
     print("-" * 70)
-    sent_embeddings = []
     for i, sentence in enumerate(sentences):
-        sent_embedding = get_embedding(sentence)
-        sent_embeddings.append(sent_embedding)
-        sim = cosine_similarity(full_embedding, sent_embedding)
         word_count = len(sentence.split())
-        print(f"  Sentence {i+1} ({word_count} words): {sim:.4f}  \"{sentence[:55]}...\"")
+        print(f"  Sentence {i+1} ({word_count} words): {sims_to_full[i]:.4f}  \"{sentence[:55]}...\"")
 
     # Compare sentence-to-sentence similarity
     print("\nSentence-to-sentence similarities:")
     print("-" * 70)
+    sentence_sims = pairwise_similarity(sent_embeddings)
     for i in range(len(sentences)):
         for j in range(i + 1, len(sentences)):
-            sim = cosine_similarity(sent_embeddings[i], sent_embeddings[j])
-            print(f"  S{i+1} vs S{j+1}: {sim:.4f}")
+            print(f"  S{i+1} vs S{j+1}: {sentence_sims[i, j]:.4f}")
 
     # Summary insight
-    sims_to_full = []
-    for se in sent_embeddings:
-        sims_to_full.append(cosine_similarity(full_embedding, se))
-    avg_sim = sum(sims_to_full) / len(sims_to_full)
-    print(f"\nAverage sentence-to-paragraph similarity: {avg_sim:.4f}")
-    print(f"Max: {max(sims_to_full):.4f} | Min: {min(sims_to_full):.4f}")
+    print(f"\nAverage sentence-to-paragraph similarity: {sims_to_full.mean():.4f}")
+    print(f"Max: {sims_to_full.max():.4f} | Min: {sims_to_full.min():.4f}")
     print("\nKey takeaway: Individual sentences capture only part of the paragraph's")
     print("meaning. Longer chunks preserve more context but may dilute specifics.")
@@ -3,6 +3,10 @@ Step 1 Solution: Fixed-window chunking by word count.
 """
 
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from chunking import fixed_windows
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sample_policy.md")
 
@@ -19,12 +23,7 @@ def load_document(filepath):
 
 def fixed_window_chunk(text, window_size=200):
     """Split text into chunks of approximately window_size words."""
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), window_size):
-        chunk = " ".join(words[i : i + window_size])
-        chunks.append(chunk)
-    return chunks
+    return [chunk["content"] for chunk in fixed_windows(text, window_size)]
 
 
 if __name__ == "__main__":
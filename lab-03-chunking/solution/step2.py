@@ -3,6 +3,10 @@ Step 2 Solution: Structure-aware Markdown chunking by ## headings.
 """
 
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from chunking import heading_sections
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sample_policy.md")
 
@@ -18,44 +22,15 @@ def load_document(filepath):
 
 
 def heading_chunk(text):
-    """Split Markdown text into chunks by ## headings."""
-    lines = text.split("\n")
-    chunks = []
-    current_heading = None
-    current_lines = []
-
-    for line in lines:
-        if line.startswith("## "):
-            # Save previous chunk if it exists
-            if current_heading is not None:
-                content = "\n".join(current_lines).strip()
-                if content:
-                    chunks.append({
-                        "heading": current_heading,
-                        "content": content,
-                    })
-            current_heading = line.strip("# ").strip()
-            current_lines = []
-        elif current_heading is not None:
-            current_lines.append(line)
-        else:
-            # Content before the first ## heading (e.g., the # title)
-            # We can either skip it or store it as a preamble chunk
-            if line.strip() and not line.startswith("# "):
-                if not chunks and current_heading is None:
-                    current_heading = "Preamble"
-                    current_lines.append(line)
-
-    # Save the last chunk
-    if current_heading is not None:
-        content = "\n".join(current_lines).strip()
-        if content:
-            chunks.append({
-                "heading": current_heading,
-                "content": content,
-            })
-
-    return chunks
+    """Split Markdown text into chunks by ## headings.
+
+    Content before the first ## heading (other than the # title) is kept
+    as a "Preamble" chunk.
+    """
+    return [
+        {"heading": section["heading"], "content": section["content"]}
+        for section in heading_sections(text, preamble=True)
+    ]
 
 
 if __name__ == "__main__":
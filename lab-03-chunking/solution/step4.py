@@ -3,6 +3,10 @@ Step 4 Solution: Compare all three chunking strategies on the same document.
 """
 
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+import chunking
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sample_policy.md")
 
@@ -19,95 +23,27 @@ def load_document(filepath):
 
 def fixed_window_chunk(text, window_size=200):
     """Split text into fixed-size word-count windows."""
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), window_size):
-        chunk = " ".join(words[i : i + window_size])
-        chunks.append(chunk)
-    return chunks
+    return [chunk["content"] for chunk in chunking.fixed_windows(text, window_size)]
 
 
 def heading_chunk(text):
     """Split text by ## headings, returning content strings."""
-    lines = text.split("\n")
-    chunks = []
-    current_heading = None
-    current_lines = []
-
-    for line in lines:
-        if line.startswith("## "):
-            if current_heading is not None:
-                content = "\n".join(current_lines).strip()
-                if content:
-                    chunks.append(content)
-            current_heading = line.strip("# ").strip()
-            current_lines = []
-        elif current_heading is not None:
-            current_lines.append(line)
-
-    if current_heading is not None:
-        content = "\n".join(current_lines).strip()
-        if content:
-            chunks.append(content)
-
-    return chunks
+    return [section["content"] for section in chunking.heading_sections(text)]
 
 
 def split_paragraphs(text):
     """Split text into paragraphs."""
-    raw = text.split("\n\n")
-    return [p.strip() for p in raw if p.strip()]
+    return [p["content"] for p in chunking.split_paragraphs(text)]
 
 
 def split_sentences(text):
     """Split text into sentences."""
-    raw_parts = text.replace("\n", " ").split(". ")
-    sentences = []
-    for part in raw_parts:
-        cleaned = part.strip()
-        if cleaned:
-            if not cleaned.endswith("."):
-                cleaned += "."
-            sentences.append(cleaned)
-    return sentences
+    return [s["content"] for s in chunking.split_sentences(text)]
 
 
 def recursive_chunk(text, target_words=200):
     """Recursively chunk text by paragraphs, sentences, then words."""
-    paragraphs = split_paragraphs(text)
-    small_pieces = []
-
-    for para in paragraphs:
-        if len(para.split()) <= target_words:
-            small_pieces.append(para)
-        else:
-            sentences = split_sentences(para)
-            for sentence in sentences:
-                if len(sentence.split()) <= target_words:
-                    small_pieces.append(sentence)
-                else:
-                    words = sentence.split()
-                    for i in range(0, len(words), target_words):
-                        small_pieces.append(" ".join(words[i : i + target_words]))
-
-    chunks = []
-    current_chunk = []
-    current_word_count = 0
-
-    for piece in small_pieces:
-        piece_words = len(piece.split())
-        if current_word_count + piece_words > target_words and current_chunk:
-            chunks.append("\n\n".join(current_chunk))
-            current_chunk = [piece]
-            current_word_count = piece_words
-        else:
-            current_chunk.append(piece)
-            current_word_count += piece_words
-
-    if current_chunk:
-        chunks.append("\n\n".join(current_chunk))
-
-    return chunks
+    return [chunk["content"] for chunk in chunking.recursive_chunks(text, target_words)]
 
 
 def analyze_chunks(chunks, strategy_name):
@@ -1,14 +1,29 @@
 """
 Stretch Solution: Semantic chunking using embedding similarity.
+
+Sentences are embedded in batches and stacked into one NumPy matrix, so the
+similarity of every adjacent pair is computed in a single vectorized step.
 """
 
 import os
-import math
+import sys
+import numpy as np
 import requests
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from embedding_cache import EmbeddingCache
+from similarity import adjacent_similarities
+
 DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "sample_policy.md")
 OLLAMA_URL = "http://localhost:11434/api/embed"
 SIMILARITY_THRESHOLD = 0.75
+EMBED_BATCH_SIZE = 32
+# Average each boundary score over this many neighbouring sentence pairs.
+SMOOTHING_WINDOW = 3
+# Start a new chunk rather than let one grow past this many words.
+MAX_CHUNK_WORDS = 300
+
+EMBEDDING_CACHE = EmbeddingCache()
 
 
 def load_document(filepath):
@@ -21,21 +36,11 @@ def load_document(filepath):
     return "", text.strip()
 
 
-def get_embedding(text):
-    """Generate an embedding using Ollama bge-m3."""
-    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": text})
+def get_embeddings(texts):
+    """Generate embeddings for a list of texts in a single Ollama request."""
+    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": list(texts)})
     response.raise_for_status()
-    return response.json()["embeddings"][0]
-
-
-def cosine_similarity(vec_a, vec_b):
-    """Compute cosine similarity between two vectors."""
-    dot_product = sum(a * b for a, b in zip(vec_a, vec_b))
-    norm_a = math.sqrt(sum(a * a for a in vec_a))
-    norm_b = math.sqrt(sum(b * b for b in vec_b))
-    if norm_a == 0 or norm_b == 0:
-        return 0.0
-    return dot_product / (norm_a * norm_b)
+    return response.json()["embeddings"]
 
 
 def split_sentences(text):
@@ -51,38 +56,56 @@ def split_sentences(text):
     return sentences
 
 
-def semantic_chunk(sentences, threshold=SIMILARITY_THRESHOLD):
-    """Group consecutive sentences into chunks based on embedding similarity."""
+def embed_sentences(sentences, batch_size=EMBED_BATCH_SIZE):
+    """Embed sentences batch_size at a time and return an (n, dim) float32 matrix."""
+    rows = []
+    for start in range(0, len(sentences), batch_size):
+        batch = sentences[start:start + batch_size]
+        rows.extend(EMBEDDING_CACHE.embed(batch, get_embeddings))
+        print(f"    Embedded {start + len(batch)}/{len(sentences)} sentences")
+    return np.asarray(rows, dtype=np.float32)
+
+
+def smooth(similarities, window):
+    """Centred moving average of similarities; window <= 1 returns them unchanged."""
+    if window <= 1 or len(similarities) == 0:
+        return similarities
+    padded = np.pad(similarities, (window // 2, (window - 1) // 2), mode="edge")
+    return np.convolve(padded, np.ones(window) / window, mode="valid")
+
+
+def semantic_chunk(sentences, threshold=SIMILARITY_THRESHOLD, window=1, max_words=None):
+    """Group consecutive sentences into chunks based on embedding similarity.
+
+    A new chunk starts where the (optionally smoothed) similarity between two
+    adjacent sentences falls below threshold, or where adding the next
+    sentence would take the chunk past max_words.
+    """
     if not sentences:
         return []
 
     print(f"  Embedding {len(sentences)} sentences...")
-    embeddings = []
-    for i, sentence in enumerate(sentences):
-        emb = get_embedding(sentence)
-        embeddings.append(emb)
-        if (i + 1) % 10 == 0 or i == len(sentences) - 1:
-            print(f"    Embedded {i+1}/{len(sentences)} sentences")
-
-    # Compare consecutive sentences and find chunk boundaries
+    similarities = smooth(adjacent_similarities(embed_sentences(sentences)), window)
+    word_counts = [len(sentence.split()) for sentence in sentences]
+
     chunks = []
     current_chunk_sentences = [sentences[0]]
+    current_words = word_counts[0]
 
     for i in range(1, len(sentences)):
-        sim = cosine_similarity(embeddings[i - 1], embeddings[i])
-        if sim >= threshold:
-            # High similarity: keep in the same chunk
+        sim = similarities[i - 1]
+        too_long = max_words is not None and current_words + word_counts[i] > max_words
+        if sim >= threshold and not too_long:
             current_chunk_sentences.append(sentences[i])
-        else:
-            # Low similarity: start a new chunk
-            chunks.append(" ".join(current_chunk_sentences))
-            current_chunk_sentences = [sentences[i]]
-            print(f"    Chunk boundary at sentence {i+1} (similarity: {sim:.4f})")
-
-    # Add the final chunk
-    if current_chunk_sentences:
+            current_words += word_counts[i]
+            continue
         chunks.append(" ".join(current_chunk_sentences))
+        current_chunk_sentences = [sentences[i]]
+        current_words = word_counts[i]
+        reason = f"similarity: {sim:.4f}" if sim < threshold else f"over {max_words} words"
+        print(f"    Chunk boundary at sentence {i+1} ({reason})")
 
+    chunks.append(" ".join(current_chunk_sentences))
     return chunks
 
 
@@ -92,10 +115,12 @@ if __name__ == "__main__":
 
     sentences = split_sentences(body)
     print(f"Total sentences: {len(sentences)}")
-    print(f"Similarity threshold: {SIMILARITY_THRESHOLD}\n")
+    print(f"Similarity threshold: {SIMILARITY_THRESHOLD}")
+    print(f"Smoothing window: {SMOOTHING_WINDOW}, max chunk size: {MAX_CHUNK_WORDS} words\n")
 
-    print("Computing semantic chunks (this may take a moment)...")
-    chunks = semantic_chunk(sentences, threshold=SIMILARITY_THRESHOLD)
+    print("Computing semantic chunks...")
+    chunks = semantic_chunk(sentences, threshold=SIMILARITY_THRESHOLD,
+                            window=SMOOTHING_WINDOW, max_words=MAX_CHUNK_WORDS)
 
     print(f"\nNumber of semantic chunks: {len(chunks)}\n")
     for i, chunk in enumerate(chunks):
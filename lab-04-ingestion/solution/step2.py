@@ -3,6 +3,10 @@ Step 2 Solution: Chunk all documents using structure-aware Markdown chunking.
 """
 
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from chunking import heading_sections
 
 POLICIES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "policies")
 
@@ -39,28 +43,10 @@ def load_all_policies(directory):
 
 def heading_chunk(text):
     """Split Markdown text into chunks by ## headings."""
-    lines = text.split("\n")
-    chunks = []
-    current_heading = None
-    current_lines = []
-
-    for line in lines:
-        if line.startswith("## "):
-            if current_heading is not None:
-                content = "\n".join(current_lines).strip()
-                if content:
-                    chunks.append({"heading": current_heading, "content": content})
-            current_heading = line.strip("# ").strip()
-            current_lines = []
-        elif current_heading is not None:
-            current_lines.append(line)
-
-    if current_heading is not None:
-        content = "\n".join(current_lines).strip()
-        if content:
-            chunks.append({"heading": current_heading, "content": content})
-
-    return chunks
+    return [
+        {"heading": section["heading"], "content": section["content"]}
+        for section in heading_sections(text)
+    ]
 
 
 def chunk_all_documents(documents):
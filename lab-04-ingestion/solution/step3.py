@@ -3,10 +3,17 @@ Step 3 Solution: Generate embeddings for all chunks with progress reporting.
 """
 
 import os
-import requests
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from chunking import heading_sections
+from embedding_cache import EmbeddingCache
+from ollama_client import get_client
 
 POLICIES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "policies")
-OLLAMA_URL = "http://localhost:11434/api/embed"
+EMBED_BATCH_SIZE = 32
+
+EMBEDDING_CACHE = EmbeddingCache()
 
 
 def parse_frontmatter(text):
@@ -41,25 +48,10 @@ def load_all_policies(directory):
 
 def heading_chunk(text):
     """Split Markdown text into chunks by ## headings."""
-    lines = text.split("\n")
-    chunks = []
-    current_heading = None
-    current_lines = []
-    for line in lines:
-        if line.startswith("## "):
-            if current_heading is not None:
-                content = "\n".join(current_lines).strip()
-                if content:
-                    chunks.append({"heading": current_heading, "content": content})
-            current_heading = line.strip("# ").strip()
-            current_lines = []
-        elif current_heading is not None:
-            current_lines.append(line)
-    if current_heading is not None:
-        content = "\n".join(current_lines).strip()
-        if content:
-            chunks.append({"heading": current_heading, "content": content})
-    return chunks
+    return [
+        {"heading": section["heading"], "content": section["content"]}
+        for section in heading_sections(text)
+    ]
 
 
 def chunk_all_documents(documents):
@@ -81,19 +73,28 @@ def chunk_all_documents(documents):
 
 def get_embedding(text):
     """Generate an embedding using Ollama bge-m3."""
-    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": text})
-    response.raise_for_status()
-    return response.json()["embeddings"][0]
+    return get_client().embed_one(text)
+
+
+def get_embeddings(texts):
+    """Generate embeddings for a list of texts through the shared Ollama client."""
+    return get_client().embed(texts)
+
 
+def embed_all_chunks(chunks, batch_size=EMBED_BATCH_SIZE):
+    """Generate embeddings for all chunks in batches with progress reporting.
 
-def embed_all_chunks(chunks):
-    """Generate embeddings for all chunks with progress reporting."""
+    Chunks whose content is already in the embedding cache are not sent to
+    Ollama. Returns a list of embeddings aligned with the input chunk list.
+    """
     embeddings = []
     total = len(chunks)
-    for i, chunk in enumerate(chunks):
-        print(f"  Embedding chunk {i+1}/{total}...")
-        embedding = get_embedding(chunk["content"])
-        embeddings.append(embedding)
+    for start in range(0, total, batch_size):
+        batch = chunks[start:start + batch_size]
+        end = start + len(batch)
+        print(f"  Embedding chunks {start+1}-{end}/{total}...")
+        texts = [chunk["content"] for chunk in batch]
+        embeddings.extend(EMBEDDING_CACHE.embed(texts, get_embeddings))
     return embeddings
 
 
@@ -112,5 +113,6 @@ if __name__ == "__main__":
         embeddings = embed_all_chunks(all_chunks)
 
         print(f"\nGenerated {len(embeddings)} embeddings.")
+        print(f"Embedding cache: {EMBEDDING_CACHE.stats()}")
         if embeddings:
             print(f"Embedding dimensions: {len(embeddings[0])}")
@@ -1,14 +1,37 @@
 """
 Step 4 Solution: Bulk-load documents and chunks into PostgreSQL with embeddings.
+
+Documents are streamed from disk through chunking, embedding and COPY one
+batch at a time (shared/streaming_ingest.py), so memory use does not grow
+with the size of the corpus. Each batch of documents is embedded first and
+then written, together with its chunks, in one short transaction.
 """
 
+import argparse
 import json
 import os
+import sys
+from contextlib import nullcontext
 import psycopg2
-import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from async_ingest import DEFAULT_CONCURRENCY, run_ingest
+from chunking import heading_sections
+from embedding_cache import EmbeddingCache
+from incremental_ingest import content_hash, document_hash, sync_documents, with_hash
+from index_build import deferred_indexes, estimated_rows, is_bulk_load
+from migrations import ensure_schema
+from ollama_client import get_client
+from pgvector_adapter import register_vector, to_vector
+from search_vector import backfill_search_vectors
+from streaming_ingest import (embed_batches, ingest_in_transactions, iter_chunks,
+                              iter_document_paths, read_documents)
+from tagging import enrich_chunk_metadata
 
 POLICIES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "policies")
-OLLAMA_URL = "http://localhost:11434/api/embed"
+EMBED_BATCH_SIZE = 32
+
+EMBEDDING_CACHE = EmbeddingCache()
 
 DB_CONFIG = {
     "dbname": "pgvector",
@@ -38,62 +61,67 @@ def parse_frontmatter(text):
 
 def load_all_policies(directory):
     """Load all .md files from the given directory."""
-    documents = []
-    for filename in sorted(os.listdir(directory)):
-        if filename.endswith(".md"):
-            filepath = os.path.join(directory, filename)
-            with open(filepath, "r") as f:
-                text = f.read()
-            metadata, body = parse_frontmatter(text)
-            documents.append({"metadata": metadata, "content": body})
-    return documents
+    return list(read_documents(iter_document_paths(directory), parse_frontmatter))
 
 
 def heading_chunk(text):
     """Split Markdown text into chunks by ## headings."""
-    lines = text.split("\n")
-    chunks = []
-    current_heading = None
-    current_lines = []
-    for line in lines:
-        if line.startswith("## "):
-            if current_heading is not None:
-                content = "\n".join(current_lines).strip()
-                if content:
-                    chunks.append({"heading": current_heading, "content": content})
-            current_heading = line.strip("# ").strip()
-            current_lines = []
-        elif current_heading is not None:
-            current_lines.append(line)
-    if current_heading is not None:
-        content = "\n".join(current_lines).strip()
-        if content:
-            chunks.append({"heading": current_heading, "content": content})
-    return chunks
+    return [
+        {"heading": section["heading"], "content": section["content"]}
+        for section in heading_sections(text)
+    ]
+
+
+def chunk_document(doc):
+    """Chunk one document and attach metadata, tags and a hash of each chunk's text."""
+    doc_id = doc["metadata"].get("doc_id", "unknown")
+    return [
+        {
+            "document_id": doc_id,
+            "chunk_index": idx,
+            "heading": section["heading"],
+            "content": section["content"],
+            "metadata": with_hash(
+                enrich_chunk_metadata(doc["metadata"], section["content"], idx),
+                content_hash(section["content"]),
+            ),
+        }
+        for idx, section in enumerate(heading_chunk(doc["content"]))
+    ]
 
 
 def chunk_all_documents(documents):
     """Chunk all documents and attach metadata."""
-    all_chunks = []
-    for doc in documents:
-        doc_id = doc["metadata"].get("doc_id", "unknown")
-        sections = heading_chunk(doc["content"])
-        for idx, section in enumerate(sections):
-            all_chunks.append({
-                "document_id": doc_id,
-                "chunk_index": idx,
-                "heading": section["heading"],
-                "content": section["content"],
-                "metadata": doc["metadata"],
-            })
-    return all_chunks
+    return list(iter_chunks(documents, chunk_document))
+
+
+def hashed_metadata(doc):
+    """Return a document's metadata carrying the hash of its frontmatter and body."""
+    return with_hash(doc["metadata"], document_hash(doc["metadata"], doc["content"]))
+
+
+def estimate_incoming_chunks(cursor, document_count):
+    """Estimate the chunks document_count documents add, from the stored average."""
+    stored_chunks = estimated_rows(cursor, "policy_chunks")
+    stored_documents = estimated_rows(cursor, "policy_documents")
+    if not stored_chunks or not stored_documents:
+        return document_count
+    return round(document_count * stored_chunks / stored_documents)
 
 
 def get_embedding(text):
     """Generate an embedding using Ollama bge-m3."""
-    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": text})
-    response.raise_for_status()
-    return response.json()["embeddings"][0]
+    return get_client().embed_one(text)
+
+
+def get_embeddings(texts):
+    """Generate embeddings for a list of texts through the shared Ollama client."""
+    return get_client().embed(texts)
+
+
+def embed_texts(texts):
+    """Embed texts, sending only embedding-cache misses to Ollama."""
+    return EMBEDDING_CACHE.embed(texts, get_embeddings)
 
 
 def create_tables(cursor):
@@ -142,70 +170,149 @@ def insert_chunk(cursor, chunk, embedding):
     cursor.execute(
         """
         INSERT INTO policy_chunks (document_id, chunk_index, content, heading, embedding, metadata)
-        VALUES (%s, %s, %s, %s, %s::vector, %s::jsonb)
+        VALUES (%s, %s, %s, %s, %s, %s::jsonb)
         """,
         (
             chunk["document_id"],
             chunk["chunk_index"],
             chunk["content"],
             chunk["heading"],
-            str(embedding),
+            to_vector(embedding),
             json.dumps(chunk["metadata"]),
         ),
     )
 
 
 def create_indexes(cursor):
-    """Create HNSW index on embedding and GIN index on metadata."""
-    cursor.execute("DROP INDEX IF EXISTS idx_policy_chunks_hnsw;")
+    """Create HNSW index on embedding and GIN index on metadata if missing.
+
+    Existing indexes are kept: they were either maintained during the load or
+    rebuilt after it by deferred_indexes().
+    """
     cursor.execute("""
-        CREATE INDEX idx_policy_chunks_hnsw
+        CREATE INDEX IF NOT EXISTS idx_policy_chunks_hnsw
         ON policy_chunks
         USING hnsw (embedding vector_cosine_ops)
         WITH (m = 16, ef_construction = 64);
     """)
-    cursor.execute("DROP INDEX IF EXISTS idx_policy_chunks_metadata;")
     cursor.execute("""
-        CREATE INDEX idx_policy_chunks_metadata
+        CREATE INDEX IF NOT EXISTS idx_policy_chunks_metadata
         ON policy_chunks
         USING gin (metadata);
     """)
 
 
+def embed_chunks(chunks, batch_size=EMBED_BATCH_SIZE, start=0):
+    """Embed a list of chunks one request batch at a time, returning embeddings in order.
+
+    start offsets the progress numbering.
+    """
+    embeddings = []
+    for batch, batch_embeddings in embed_batches(chunks, embed_texts, batch_size):
+        done = start + len(embeddings)
+        print(f"  Embedded chunks {done+1}-{done+len(batch)}...")
+        embeddings.extend(batch_embeddings)
+    return embeddings
+
+
+def embed_chunks_async(chunks, concurrency=DEFAULT_CONCURRENCY, batch_size=EMBED_BATCH_SIZE):
+    """Embed a list of chunks with several requests in flight, returning embeddings in order."""
+    embeddings = [None] * len(chunks)
+    items = [{"content": chunk["content"], "position": i} for i, chunk in enumerate(chunks)]
+
+    def collect(batch, batch_embeddings):
+        for item, embedding in zip(batch, batch_embeddings):
+            embeddings[item["position"]] = embedding
+
+    run_ingest(items, embed_fn=embed_texts, write_fn=collect,
+               concurrency=concurrency, batch_size=batch_size, total=len(items))
+    return embeddings
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest policy documents into pgvector.")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="embed each batch of documents with several concurrent requests")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="maximum embedding requests in flight with --async")
+    parser.add_argument("--defer-indexes", choices=["auto", "always", "never"], default="auto",
+                        help="drop HNSW/GIN indexes during the load and rebuild them after "
+                             "(auto: only for bulk loads)")
+    parser.add_argument("--full", action="store_true",
+                        help="replace the chunks of every loaded document instead of "
+                             "syncing only what changed; each batch of documents is "
+                             "embedded first, then replaced in one transaction")
+    parser.add_argument("--prune", action="store_true",
+                        help="with incremental sync, delete stored documents that are "
+                             "no longer in the policies directory")
+    args = parser.parse_args()
+
     print(f"Loading policies from: {POLICIES_DIR}")
 
     if not os.path.isdir(POLICIES_DIR):
         print(f"Directory not found: {POLICIES_DIR}")
     else:
-        documents = load_all_policies(POLICIES_DIR)
-        print(f"Loaded {len(documents)} documents.")
-
-        all_chunks = chunk_all_documents(documents)
-        print(f"Total chunks: {len(all_chunks)}")
+        paths = list(iter_document_paths(POLICIES_DIR))
+        print(f"Found {len(paths)} documents.")
+        documents = read_documents(paths, parse_frontmatter)
 
         print("\nConnecting to PostgreSQL...")
         conn = psycopg2.connect(**DB_CONFIG)
         conn.autocommit = True
+        register_vector(conn)
         cur = conn.cursor()
 
         print("Creating tables...")
         create_tables(cur)
+        applied = ensure_schema(conn)
+        if applied:
+            print(f"  Applied migrations: {', '.join(applied)}")
+
+        cur.execute("SELECT EXISTS (SELECT 1 FROM policy_chunks)")
+        incremental = cur.fetchone()[0] and not args.full
+
+        if incremental:
+            print("\nSyncing changed documents (use --full to reload everything)...")
+            stats = sync_documents(conn, documents, chunk_fn=chunk_document,
+                                   embed_fn=embed_texts, prune=args.prune)
+            print(f"  Incremental sync: {stats}")
+        else:
+            defer = args.defer_indexes == "always" or (
+                args.defer_indexes == "auto"
+                and is_bulk_load(cur, "policy_chunks",
+                                 estimate_incoming_chunks(cur, len(paths)))
+            )
+            index_context = (
+                deferred_indexes(conn, monitor_config=DB_CONFIG) if defer else nullcontext()
+            )
+
+            # Each batch of documents is chunked and embedded first, then
+            # upserted (and with --full, its old chunks removed) and copied
+            # in one short transaction, so a failed run never leaves a
+            # document with a hash but no chunks.
+            doc_stats = {}
+
+            def embed_batch_chunks(chunks):
+                if args.use_async:
+                    return embed_chunks_async(chunks, concurrency=args.concurrency)
+                return embed_chunks(chunks, start=doc_stats.get("rows_written", 0))
+
+            print("\nStreaming documents through chunking, embedding and COPY...")
+            with index_context:
+                ingest_in_transactions(conn, documents, chunk_document, embed_batch_chunks,
+                                       prepare_fn=hashed_metadata, replace=args.full,
+                                       stats=doc_stats)
+            print(f"  Copied {doc_stats['rows_written']} chunks.")
+            print(f"  Upserted {doc_stats['documents']} documents "
+                  f"in {doc_stats['transactions']} transactions.")
+            if args.full:
+                print(f"  Removed {doc_stats['chunks_removed']} existing chunks.")
+
+        print(f"Embedding cache: {EMBEDDING_CACHE.stats()}")
 
-        print("Inserting documents...")
-        seen_docs = set()
-        for doc in documents:
-            doc_id = doc["metadata"].get("doc_id", "unknown")
-            if doc_id not in seen_docs:
-                insert_document(cur, doc["metadata"])
-                seen_docs.add(doc_id)
-                print(f"  Inserted document: {doc_id}")
-
-        print(f"\nEmbedding and inserting {len(all_chunks)} chunks...")
-        for i, chunk in enumerate(all_chunks):
-            print(f"  Embedding chunk {i+1}/{len(all_chunks)}...")
-            embedding = get_embedding(chunk["content"])
-            insert_chunk(cur, chunk, embedding)
+        backfill = backfill_search_vectors(conn)
+        if backfill["rows_updated"]:
+            print(f"Backfilled search_vector: {backfill}")
 
         print("\nCreating indexes...")
         create_indexes(cur)
@@ -1,6 +1,6 @@
 """
 Step 3: Generate embeddings for all chunks using batch processing.
-Show progress as each chunk is embedded.
+Show progress as each batch is embedded.
 """
 
 import os
@@ -8,6 +8,7 @@ import requests
 
 POLICIES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "policies")
 OLLAMA_URL = "http://localhost:11434/api/embed"
+EMBED_BATCH_SIZE = 32
 
 
 def parse_frontmatter(text):
@@ -87,21 +88,38 @@ def get_embedding(text):
     return response.json()["embeddings"][0]
 
 
-def embed_all_chunks(chunks):
-    """Generate embeddings for all chunks with progress reporting.
+def get_embeddings(texts):
+    """Generate embeddings for a list of texts in a single Ollama request.
+
+    /api/embed accepts a list in "input" and returns one vector per input,
+    in the same order.
+    """
+    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": list(texts)})
+    response.raise_for_status()
+    embeddings = response.json()["embeddings"]
+    if len(embeddings) != len(texts):
+        raise ValueError(
+            f"Expected {len(texts)} embeddings from Ollama, got {len(embeddings)}"
+        )
+    return embeddings
+
+
+def embed_all_chunks(chunks, batch_size=EMBED_BATCH_SIZE):
+    """Generate embeddings for all chunks in batches with progress reporting.
 
     Args:
         chunks: A list of chunk dicts (each must have a 'content' key).
+        batch_size: Number of chunks to send to Ollama per request.
 
     Returns:
         A list of embedding vectors (list of lists of floats),
         in the same order as the input chunks.
     """
     # TODO: implement
-    # For each chunk:
-    #   1. Call get_embedding on the chunk's content
-    #   2. Print progress (e.g., "Embedding chunk 15/234...")
-    #   3. Append the embedding to the results list
+    # For each batch of batch_size chunks:
+    #   1. Call get_embeddings on the batch's contents (one HTTP request)
+    #   2. Print progress (e.g., "Embedding chunks 33-64/234...")
+    #   3. Extend the results list with the returned embeddings
     ...
 
 
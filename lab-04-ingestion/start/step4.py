@@ -11,6 +11,7 @@ import requests
 
 POLICIES_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "data", "policies")
 OLLAMA_URL = "http://localhost:11434/api/embed"
+EMBED_BATCH_SIZE = 32
 
 DB_CONFIG = {
     "dbname": "pgvector",
@@ -98,6 +99,18 @@ def get_embedding(text):
     return response.json()["embeddings"][0]
 
 
+def get_embeddings(texts):
+    """Generate embeddings for a list of texts in a single Ollama request."""
+    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": list(texts)})
+    response.raise_for_status()
+    embeddings = response.json()["embeddings"]
+    if len(embeddings) != len(texts):
+        raise ValueError(
+            f"Expected {len(texts)} embeddings from Ollama, got {len(embeddings)}"
+        )
+    return embeddings
+
+
 def create_tables(cursor):
     """Create the policy_documents and policy_chunks tables.
 
@@ -187,10 +200,12 @@ if __name__ == "__main__":
                 print(f"  Inserted document: {doc_id}")
 
         print(f"\nEmbedding and inserting {len(all_chunks)} chunks...")
-        for i, chunk in enumerate(all_chunks):
-            print(f"  Embedding chunk {i+1}/{len(all_chunks)}...")
-            embedding = get_embedding(chunk["content"])
-            insert_chunk(cur, chunk, embedding)
+        for start in range(0, len(all_chunks), EMBED_BATCH_SIZE):
+            batch = all_chunks[start:start + EMBED_BATCH_SIZE]
+            print(f"  Embedding chunks {start+1}-{start+len(batch)}/{len(all_chunks)}...")
+            embeddings = get_embeddings([chunk["content"] for chunk in batch])
+            for chunk, embedding in zip(batch, embeddings):
+                insert_chunk(cur, chunk, embedding)
 
         print("\nCreating indexes...")
         create_indexes(cur)
@@ -1,8 +1,47 @@
+"""
+Backfill policy_chunks.search_vector on databases where it is a plain column.
+
+Searches never write to the table; run this once after loading data into an
+older schema (Lab 04 ingestion also runs it). It updates rows in batches,
+committing each one, and does nothing when search_vector is generated.
+
+Usage:
+    python solution/fix_db.py [--batch-size 1000]
+"""
+
+import argparse
+import os
+import sys
 import psycopg2
-conn = psycopg2.connect(dbname="pgvector", user="postgres",
-password="postgres", host="localhost", port="5050")
-conn.autocommit = True
-cur = conn.cursor()
-cur.execute("UPDATE policy_chunks SET search_vector = to_tsvector('english', content) WHERE search_vector IS NULL")
-print("Done - search_vector populated")
-conn.close()
\ No newline at end of file
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from migrations import ensure_schema
+from search_vector import DEFAULT_BACKFILL_BATCH_SIZE, backfill_search_vectors
+
+DB_CONFIG = {
+    "dbname": "pgvector",
+    "user": "postgres",
+    "password": "postgres",
+    "host": "localhost",
+    "port": "5050"
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill policy_chunks.search_vector in batches.")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BACKFILL_BATCH_SIZE,
+                        help="Rows updated per transaction")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        ensure_schema(conn)
+        stats = backfill_search_vectors(conn, batch_size=args.batch_size)
+    finally:
+        conn.close()
+
+    if stats["generated"]:
+        print("search_vector is a generated column; nothing to backfill.")
+    else:
+        print(f"Done - {stats['rows_updated']} search vectors populated "
+              f"in {stats['batches']} batches ({stats['seconds']}s)")
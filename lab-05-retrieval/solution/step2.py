@@ -44,15 +44,15 @@ def filtered_vector_search(query, top_k=5, doc_type=None, regulatory_body=None,
     params = []
 
     if doc_type:
-        conditions.append("pd.doc_type = %s")
+        conditions.append("pc.doc_type = %s")
         params.append(doc_type)
 
     if regulatory_body:
-        conditions.append("pd.regulatory_body = %s")
+        conditions.append("pc.regulatory_body = %s")
         params.append(regulatory_body)
 
     if effective_after:
-        conditions.append("pd.effective_date > %s")
+        conditions.append("pc.effective_date > %s")
         params.append(effective_after)
 
     where_clause = ""
@@ -66,11 +66,10 @@ def filtered_vector_search(query, top_k=5, doc_type=None, regulatory_body=None,
             pc.content,
             pc.heading,
             1 - (pc.embedding <=> %s::vector) AS score,
-            pd.title AS doc_title,
-            pd.doc_type,
-            pd.effective_date
+            pc.doc_title,
+            pc.doc_type,
+            pc.effective_date
         FROM policy_chunks pc
-        JOIN policy_documents pd ON pc.document_id = pd.doc_id
         {where_clause}
         ORDER BY pc.embedding <=> %s::vector
         LIMIT %s
@@ -2,9 +2,14 @@
 Lab 05, Step 4 Solution: Hybrid Search (Vector + Full-Text)
 """
 
+import os
+import sys
 import psycopg2
 import requests
-import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from hybrid_search import DEFAULT_TEXT_DEPTH, DEFAULT_VECTOR_DEPTH, hybrid_search as fused_search
+from pgvector_adapter import register_vector
 
 DB_CONFIG = {
     "dbname": "pgvector",
@@ -23,66 +28,54 @@ def get_embedding(text):
     return response.json()["embeddings"][0]
 
 
-def hybrid_search(query, top_k=5, vector_weight=0.7, text_weight=0.3):
+def hybrid_search(query, top_k=5, vector_weight=0.7, text_weight=0.3, method="weighted",
+                  vector_depth=DEFAULT_VECTOR_DEPTH, text_depth=DEFAULT_TEXT_DEPTH):
     """
     Combine vector similarity with full-text search.
 
-    The combined score is:
+    Candidates come from the HNSW index (the vector_depth nearest chunks) and
+    the GIN index on search_vector (the text_depth best matches for the
+    query), so the search never scans the whole table. With
+    method="weighted" the combined score is:
         vector_weight * vector_score + text_weight * text_score
+    With method="rrf" it is the Reciprocal Rank Fusion score of the two lists.
 
     Args:
         query: The search query string.
         top_k: Number of top results to return.
         vector_weight: Weight for vector similarity (default 0.7).
         text_weight: Weight for full-text score (default 0.3).
+        method: "weighted" or "rrf".
+        vector_depth: Number of vector candidates.
+        text_depth: Number of full-text candidates.
 
     Returns:
         List of dicts with keys: content, heading, vector_score, text_score, combined_score.
     """
     query_embedding = get_embedding(query)
-    embedding_json = json.dumps(query_embedding)
 
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = register_vector(psycopg2.connect(**DB_CONFIG))
     try:
         with conn.cursor() as cur:
-            # Backfill search_vector if not yet populated
-            cur.execute("""
-                UPDATE policy_chunks
-                SET search_vector = to_tsvector('english', content)
-                WHERE search_vector IS NULL
-            """)
-            conn.commit()
-
-            cur.execute("""
-                SELECT
-                    content,
-                    heading,
-                    1 - (embedding <=> %s::vector) AS vector_score,
-                    ts_rank(search_vector, plainto_tsquery('english', %s)) AS text_score,
-                    (
-                        %s * (1 - (embedding <=> %s::vector))
-                        + %s * ts_rank(search_vector, plainto_tsquery('english', %s))
-                    ) AS combined_score
-                FROM policy_chunks
-                ORDER BY combined_score DESC
-                LIMIT %s
-            """, (
-                embedding_json,
-                query,
-                vector_weight, embedding_json,
-                text_weight, query,
-                top_k
-            ))
-
-            rows = cur.fetchall()
+            rows = fused_search(
+                cur, query, query_embedding,
+                select="pc.content, pc.heading",
+                top_k=top_k,
+                vector_depth=vector_depth,
+                text_depth=text_depth,
+                method=method,
+                vector_weight=vector_weight,
+                text_weight=text_weight,
+            )
+
             results = []
             for row in rows:
                 results.append({
-                    "content": row[0],
-                    "heading": row[1],
-                    "vector_score": float(row[2]),
-                    "text_score": float(row[3]),
-                    "combined_score": float(row[4])
+                    "content": row[5],
+                    "heading": row[6],
+                    "vector_score": float(row[1]),
+                    "text_score": float(row[2]),
+                    "combined_score": float(row[0])
                 })
             return results
     finally:
@@ -106,3 +99,7 @@ if __name__ == "__main__":
             print()
     else:
         print("No results found.")
+
+    print("=== Hybrid search results (Reciprocal Rank Fusion) ===")
+    for i, r in enumerate(hybrid_search(query, top_k=5, method="rrf"), 1):
+        print(f"Result {i}: {r['heading']} (RRF {r['combined_score']:.4f})")
@@ -41,10 +41,9 @@ def initial_retrieval(query, top_k=10):
                     pc.content,
                     pc.heading,
                     1 - (pc.embedding <=> %s::vector) AS score,
-                    pd.effective_date,
-                    pd.title AS doc_title
+                    pc.effective_date,
+                    pc.doc_title
                 FROM policy_chunks pc
-                JOIN policy_documents pd ON pc.document_id = pd.doc_id
                 ORDER BY pc.embedding <=> %s::vector
                 LIMIT %s
             """, (embedding_json, embedding_json, top_k))
@@ -49,10 +49,9 @@ def retrieve_chunks(query, top_k=5):
                 SELECT
                     pc.content,
                     pc.heading,
-                    pd.title AS doc_title,
+                    pc.doc_title,
                     1 - (pc.embedding <=> %s::vector) AS score
                 FROM policy_chunks pc
-                JOIN policy_documents pd ON pc.document_id = pd.doc_id
                 ORDER BY pc.embedding <=> %s::vector
                 LIMIT %s
             """, (embedding_json, embedding_json, top_k))
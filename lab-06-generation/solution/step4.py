@@ -2,11 +2,16 @@
 Lab 06, Step 4 Solution: Edge Case Handling
 """
 
+import os
+import sys
 import boto3
 import psycopg2
 import requests
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from matcher import KeywordMatcher
+
 DB_CONFIG = {
     "dbname": "pgvector",
     "user": "postgres",
@@ -34,6 +39,7 @@ OUT_OF_SCOPE_KEYWORDS = [
     "weather", "sports", "recipe", "movie", "music", "game",
     "celebrity", "joke", "story", "poem"
 ]
+OUT_OF_SCOPE_MATCHER = KeywordMatcher(OUT_OF_SCOPE_KEYWORDS)
 
 
 def get_embedding(text):
@@ -56,11 +62,7 @@ def is_out_of_scope(query):
     """
     Check if the query is clearly outside banking policy scope.
     """
-    query_lower = query.lower()
-    for keyword in OUT_OF_SCOPE_KEYWORDS:
-        if keyword in query_lower:
-            return True
-    return False
+    return OUT_OF_SCOPE_MATCHER.search(query)
 
 
 def retrieve_with_threshold(query, top_k=5, threshold=None):
@@ -80,10 +82,9 @@ def retrieve_with_threshold(query, top_k=5, threshold=None):
                 SELECT
                     pc.content,
                     pc.heading,
-                    pd.title AS doc_title,
+                    pc.doc_title,
                     1 - (pc.embedding <=> %s::vector) AS score
                 FROM policy_chunks pc
-                JOIN policy_documents pd ON pc.document_id = pd.doc_id
                 ORDER BY pc.embedding <=> %s::vector
                 LIMIT %s
             """, (embedding_json, embedding_json, top_k))
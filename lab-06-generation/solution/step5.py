@@ -2,10 +2,15 @@
 Lab 06, Step 5 Solution: Full RAG Loop -- ask_policychat()
 """
 
+import os
+import sys
 import psycopg2
 import requests
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from matcher import KeywordMatcher
+
 DB_CONFIG = {
     "dbname": "pgvector",
     "user": "postgres",
@@ -29,6 +34,7 @@ OUT_OF_SCOPE_KEYWORDS = [
     "weather", "sports", "recipe", "movie", "music", "game",
     "celebrity", "joke", "story", "poem"
 ]
+OUT_OF_SCOPE_MATCHER = KeywordMatcher(OUT_OF_SCOPE_KEYWORDS)
 
 
 def get_embedding(text):
@@ -57,18 +63,16 @@ def ask_policychat(query):
             - "sources": List of unique source document titles used.
     """
     # 1. Check out-of-scope
-    query_lower = query.lower()
-    for keyword in OUT_OF_SCOPE_KEYWORDS:
-        if keyword in query_lower:
-            return {
-                "answer": (
-                    "I am PolicyChat, a banking regulatory policy assistant. "
-                    "Your question appears to be outside the scope of banking "
-                    "policy and compliance. Please ask a question related to "
-                    "regulatory policies or banking guidelines."
-                ),
-                "sources": []
-            }
+    if OUT_OF_SCOPE_MATCHER.search(query):
+        return {
+            "answer": (
+                "I am PolicyChat, a banking regulatory policy assistant. "
+                "Your question appears to be outside the scope of banking "
+                "policy and compliance. Please ask a question related to "
+                "regulatory policies or banking guidelines."
+            ),
+            "sources": []
+        }
 
     # 2. Embed and retrieve
     query_embedding = get_embedding(query)
@@ -81,10 +85,9 @@ def ask_policychat(query):
                 SELECT
                     pc.content,
                     pc.heading,
-                    pd.title AS doc_title,
+                    pc.doc_title,
                     1 - (pc.embedding <=> %s::vector) AS score
                 FROM policy_chunks pc
-                JOIN policy_documents pd ON pc.document_id = pd.doc_id
                 ORDER BY pc.embedding <=> %s::vector
                 LIMIT 5
             """, (embedding_json, embedding_json))
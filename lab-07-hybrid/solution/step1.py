@@ -2,8 +2,15 @@
 Lab 07, Step 1 Solution: Enrich Policy Chunks with JSONB Metadata
 """
 
+import os
+import sys
+import time
 import psycopg2
 import json
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from tagging import TAG_RULES_VERSION, VERSION_KEY, enrich_chunk_metadata
 
 DB_CONFIG = {
     "dbname": "pgvector",
@@ -13,89 +20,65 @@ DB_CONFIG = {
     "port": "5050"
 }
 
-TAG_RULES = {
-    "kyc": ["kyc", "compliance", "identity"],
-    "know your customer": ["kyc", "compliance", "identity"],
-    "anti-money laundering": ["aml", "compliance", "financial-crime"],
-    "aml": ["aml", "compliance", "financial-crime"],
-    "suspicious": ["aml", "reporting", "financial-crime"],
-    "due diligence": ["kyc", "due-diligence", "compliance"],
-    "loan": ["lending", "credit-risk"],
-    "credit": ["lending", "credit-risk"],
-    "mortgage": ["lending", "mortgage"],
-    "data protection": ["data-privacy", "compliance"],
-    "gdpr": ["data-privacy", "compliance"],
-    "risk assessment": ["risk-management", "compliance"],
-    "capital": ["capital-requirements", "regulatory"],
-    "fraud": ["fraud", "financial-crime"],
-    "transaction monitoring": ["aml", "monitoring"],
-}
-
-REVIEW_STATUSES = ["current", "under_review", "archived"]
+# Chunks updated per UPDATE ... FROM (VALUES ...) statement and commit.
+ENRICH_BATCH_SIZE = 500
 
 
-def derive_tags(content):
+def enrich_metadata(batch_size=ENRICH_BATCH_SIZE):
     """
-    Derive a list of tags for a chunk based on keyword matching.
-    """
-    content_lower = content.lower()
-    tags = set()
-    for keyword, associated_tags in TAG_RULES.items():
-        if keyword in content_lower:
-            tags.update(associated_tags)
-    if not tags:
-        tags.add("general")
-    return sorted(tags)
-
-
-def derive_review_status(chunk_index):
-    """
-    Assign a review status based on the chunk index to simulate variety.
-    """
-    if chunk_index % 5 == 0:
-        return "archived"
-    elif chunk_index % 3 == 0:
-        return "under_review"
-    else:
-        return "current"
-
+    Update policy_chunks rows with enriched JSONB metadata, in batches.
 
-def enrich_metadata():
-    """
-    Update all policy_chunks rows with enriched JSONB metadata.
+    Rows are streamed from a server-side cursor on a separate read
+    connection. Each batch is written back with one UPDATE ... FROM (VALUES
+    ...) statement and committed. Rows already enriched with the current
+    tag rules are skipped, so an interrupted run resumes where it stopped.
     """
+    read_conn = psycopg2.connect(**DB_CONFIG)
     conn = psycopg2.connect(**DB_CONFIG)
     try:
+        pending_filter = f"metadata->>'{VERSION_KEY}' IS DISTINCT FROM %s"
         with conn.cursor() as cur:
-            cur.execute("SELECT id, content, chunk_index, metadata FROM policy_chunks")
-            rows = cur.fetchall()
-            print(f"Found {len(rows)} chunks to enrich.")
-
-            updated = 0
-            for row in rows:
-                chunk_id, content, chunk_index, existing_metadata = row
-
-                # Start with existing metadata or empty dict
-                if existing_metadata and isinstance(existing_metadata, dict):
-                    metadata = existing_metadata.copy()
-                else:
-                    metadata = {}
-
-                # Derive and add new fields
-                metadata["tags"] = derive_tags(content)
-                metadata["review_status"] = derive_review_status(chunk_index)
-                metadata["last_reviewed"] = "2024-06-15"
-                metadata["enriched"] = True
-
-                cur.execute(
-                    "UPDATE policy_chunks SET metadata = %s WHERE id = %s",
-                    (json.dumps(metadata), chunk_id)
-                )
-                updated += 1
-
-            conn.commit()
-            print(f"Successfully enriched {updated} chunks with JSONB metadata.")
+            cur.execute(f"SELECT COUNT(*) FROM policy_chunks WHERE {pending_filter}",
+                        (TAG_RULES_VERSION,))
+            total = cur.fetchone()[0]
+        print(f"Found {total} chunks to enrich (tag rules {TAG_RULES_VERSION}).")
+
+        updated = 0
+        started = time.perf_counter()
+        with read_conn.cursor(name="enrich_chunks") as reader:
+            reader.itersize = batch_size
+            reader.execute(f"""
+                SELECT id, content, chunk_index, metadata
+                FROM policy_chunks
+                WHERE {pending_filter}
+                ORDER BY id
+            """, (TAG_RULES_VERSION,))
+
+            while True:
+                rows = reader.fetchmany(batch_size)
+                if not rows:
+                    break
+                values = [
+                    (chunk_id, json.dumps(enrich_chunk_metadata(metadata, content, chunk_index)))
+                    for chunk_id, content, chunk_index, metadata in rows
+                ]
+                with conn.cursor() as cur:
+                    execute_values(cur, """
+                        UPDATE policy_chunks AS pc
+                        SET metadata = v.metadata
+                        FROM (VALUES %s) AS v (id, metadata)
+                        WHERE pc.id = v.id
+                    """, values, template="(%s::int, %s::jsonb)", page_size=len(values))
+                conn.commit()
+
+                updated += len(values)
+                elapsed = time.perf_counter() - started
+                print(f"  Enriched {updated}/{total} chunks "
+                      f"({updated / elapsed:.0f} chunks/s, last id {rows[-1][0]})")
+
+        print(f"Successfully enriched {updated} chunks with JSONB metadata.")
 
+        with conn.cursor() as cur:
             # Print a summary of tag distribution
             cur.execute("""
                 SELECT
@@ -112,6 +95,7 @@ def enrich_metadata():
                 print(f"  {tag_row[0]}: {tag_row[1]} chunks")
 
     finally:
+        read_conn.close()
         conn.close()
 
 
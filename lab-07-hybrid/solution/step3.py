@@ -2,10 +2,16 @@
 Lab 07, Step 3 Solution: Hybrid Queries -- Vector + Relational + JSONB
 """
 
+import os
+import sys
 import psycopg2
 import requests
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from filtered_search import filtered_vector_search
+from pgvector_adapter import register_vector
+
 DB_CONFIG = {
     "dbname": "pgvector",
     "user": "postgres",
@@ -40,9 +46,8 @@ def vector_only_search(query, top_k=10):
                     1 - (pc.embedding <=> %s::vector) AS score,
                     pc.metadata->'tags' AS tags,
                     pc.metadata->>'review_status' AS review_status,
-                    pd.title AS doc_title
+                    pc.doc_title
                 FROM policy_chunks pc
-                JOIN policy_documents pd ON pc.document_id = pd.doc_id
                 ORDER BY pc.embedding <=> %s::vector
                 LIMIT %s
             """, (embedding_json, embedding_json, top_k))
@@ -63,15 +68,19 @@ def vector_only_search(query, top_k=10):
         conn.close()
 
 
-def hybrid_filtered_search(query, top_k=10, tag=None, review_status=None, doc_type=None):
+def hybrid_filtered_search_with_stats(query, top_k=10, tag=None, review_status=None,
+                                      doc_type=None):
     """
     Vector search combined with JSONB metadata filters and relational filters.
+
+    Selective filters do not cut the result list short: the candidate pool
+    taken from the HNSW index grows until top_k matching chunks are found.
+    Returns (results, stats), where stats includes candidates_scanned.
     """
     query_embedding = get_embedding(query)
-    embedding_json = json.dumps(query_embedding)
 
     conditions = []
-    params = [embedding_json]
+    params = []
 
     if tag:
         conditions.append("pc.metadata->'tags' @> %s::jsonb")
@@ -82,49 +91,51 @@ def hybrid_filtered_search(query, top_k=10, tag=None, review_status=None, doc_ty
         params.append(review_status)
 
     if doc_type:
-        conditions.append("pd.doc_type = %s")
+        conditions.append("pc.doc_type = %s")
         params.append(doc_type)
 
-    where_clause = ""
-    if conditions:
-        where_clause = "WHERE " + " AND ".join(conditions)
-
-    params.extend([embedding_json, top_k])
-
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = register_vector(psycopg2.connect(**DB_CONFIG))
     try:
         with conn.cursor() as cur:
-            cur.execute(f"""
-                SELECT
+            rows, stats = filtered_vector_search(
+                cur, query_embedding,
+                select="""
                     pc.id,
                     pc.heading,
-                    1 - (pc.embedding <=> %s::vector) AS score,
                     pc.metadata->'tags' AS tags,
                     pc.metadata->>'review_status' AS review_status,
-                    pd.title AS doc_title
-                FROM policy_chunks pc
-                JOIN policy_documents pd ON pc.document_id = pd.doc_id
-                {where_clause}
-                ORDER BY pc.embedding <=> %s::vector
-                LIMIT %s
-            """, params)
+                    pc.doc_title
+                """,
+                conditions=conditions,
+                params=params,
+                top_k=top_k,
+            )
 
-            rows = cur.fetchall()
             results = []
             for row in rows:
                 results.append({
-                    "id": row[0],
-                    "heading": row[1],
-                    "score": float(row[2]),
+                    "id": row[1],
+                    "heading": row[2],
+                    "score": 1 - float(row[0]),
                     "tags": row[3],
                     "review_status": row[4],
                     "doc_title": row[5]
                 })
-            return results
+            return results, stats
     finally:
         conn.close()
 
 
+def hybrid_filtered_search(query, top_k=10, tag=None, review_status=None, doc_type=None):
+    """
+    Vector search combined with JSONB metadata filters and relational filters.
+    """
+    results, _ = hybrid_filtered_search_with_stats(
+        query, top_k=top_k, tag=tag, review_status=review_status, doc_type=doc_type
+    )
+    return results
+
+
 if __name__ == "__main__":
     query = "loan approval process"
 
@@ -137,9 +148,14 @@ if __name__ == "__main__":
         print(f"  [{r['score']:.4f}] {r['heading']} | tags={r.get('tags')} | status={r.get('review_status')}")
 
     print("\n=== Filtered: tag='lending' AND review_status='current' ===")
-    results_filtered = hybrid_filtered_search(query, top_k=10, tag="lending", review_status="current")
-    print(f"Results: {len(results_filtered)}")
+    results_filtered, stats = hybrid_filtered_search_with_stats(
+        query, top_k=10, tag="lending", review_status="current"
+    )
+    print(f"Results: {len(results_filtered)} "
+          f"({stats['candidates_scanned']} candidates scanned, strategy={stats['strategy']})")
     for r in results_filtered[:5]:
         print(f"  [{r['score']:.4f}] {r['heading']} | tags={r.get('tags')} | status={r.get('review_status')}")
 
-    print(f"\nFiltering narrowed results from {len(results_all)} to {len(results_filtered)}")
+    overlap = {r["id"] for r in results_all} & {r["id"] for r in results_filtered}
+    print(f"\n{len(overlap)} of the {len(results_all)} unfiltered results match the filters; "
+          f"filtered search still returned {len(results_filtered)}")
@@ -3,9 +3,9 @@ Lab 08 Solution: Flask App -- PolicyChat REST API
 """
 
 from flask import Flask, request, jsonify
-from search import search_policies
+from search import RESULT_CACHE, search_policies, search_policies_with_stats
 from generate import generate_answer
-from utils import get_db_connection
+from utils import QUERY_CACHE, db_connection, get_db_pool
 
 app = Flask(__name__)
 
@@ -24,12 +24,13 @@ def search():
         filters = data.get("filters", None)
         top_k = data.get("top_k", 5)
 
-        results = search_policies(query, filters=filters, top_k=top_k)
+        results, stats = search_policies_with_stats(query, filters=filters, top_k=top_k)
 
         return jsonify({
             "query": query,
             "results": results,
-            "count": len(results)
+            "count": len(results),
+            "search_stats": stats
         })
 
     except Exception as e:
@@ -72,8 +73,7 @@ def list_documents():
     List all policy documents.
     """
     try:
-        conn = get_db_connection()
-        try:
+        with db_connection() as conn:
             with conn.cursor() as cur:
                 cur.execute("""
                     SELECT id, doc_id, title, doc_type
@@ -89,8 +89,6 @@ def list_documents():
                         "title": row[2],
                         "doc_type": row[3]
                     })
-        finally:
-            conn.close()
 
         return jsonify({
             "documents": documents,
@@ -101,6 +99,25 @@ def list_documents():
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/pool", methods=["GET"])
+def pool_stats():
+    """
+    Report database connection pool gauges.
+    """
+    return jsonify(get_db_pool().stats())
+
+
+@app.route("/cache", methods=["GET"])
+def cache_stats():
+    """
+    Report query embedding and search result cache hit rates.
+    """
+    return jsonify({
+        "query_embeddings": QUERY_CACHE.stats(),
+        "search_results": RESULT_CACHE.stats(),
+    })
+
+
 if __name__ == "__main__":
     print("Starting PolicyChat API on http://localhost:5001")
     app.run(host="0.0.0.0", port=5001, debug=True)
@@ -2,79 +2,69 @@
 Lab 08 Solution: Search Module
 """
 
-import json
-from utils import get_db_connection, get_embedding
+import os
+from utils import db_connection, get_query_embedding
+from retriever import make_retriever
+from result_cache import SearchResultCache, corpus_generation
 
+# "pgvector" queries Postgres per request; "memory" searches an in-process
+# copy of policy_chunks that refreshes itself from the database.
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "pgvector")
+RETRIEVER_OPTIONS = {}
+if SEARCH_BACKEND == "memory" and os.environ.get("SEARCH_SNAPSHOT"):
+    # Start from an exported snapshot; only newer chunks come from Postgres.
+    RETRIEVER_OPTIONS["snapshot_path"] = os.environ["SEARCH_SNAPSHOT"]
+RETRIEVER = make_retriever(SEARCH_BACKEND, db_connection, **RETRIEVER_OPTIONS)
+RESULT_CACHE = SearchResultCache()
 
-def search_policies(query, filters=None, top_k=5):
+
+def index_version():
     """
-    Search policy chunks using vector similarity with optional metadata filters.
+    Return the version of the data searches read: the corpus generation
+    bumped by every load, plus the retriever's own version.
     """
-    query_embedding = get_embedding(query)
-    embedding_json = json.dumps(query_embedding)
-
-    conditions = []
-    params = [embedding_json]
-
-    if filters:
-        if filters.get("doc_type"):
-            conditions.append("pd.doc_type = %s")
-            params.append(filters["doc_type"])
-
-        if filters.get("regulatory_body"):
-            conditions.append("pd.regulatory_body = %s")
-            params.append(filters["regulatory_body"])
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            generation = corpus_generation(cur)
+    if generation is None:
+        return None
+    return generation, RETRIEVER.version()
 
-        if filters.get("tag"):
-            conditions.append("pc.metadata->'tags' @> %s::jsonb")
-            params.append(json.dumps([filters["tag"]]))
 
-        if filters.get("review_status"):
-            conditions.append("pc.metadata->>'review_status' = %s")
-            params.append(filters["review_status"])
+def search_policies_with_stats(query, filters=None, top_k=5):
+    """
+    Search policy chunks using vector similarity with optional metadata filters.
 
-    where_clause = ""
-    if conditions:
-        where_clause = "WHERE " + " AND ".join(conditions)
+    Returns (results, stats), where stats reports how the search ran, how
+    many candidates it scanned and whether it was served from the cache.
+    Repeated searches are answered from RESULT_CACHE until the corpus changes.
+    """
+    def run_search():
+        results, stats = RETRIEVER.search(get_query_embedding(query),
+                                          filters=filters, top_k=top_k)
+        return results, {"backend": RETRIEVER.backend, **stats}
 
-    params.extend([embedding_json, top_k])
+    (results, stats), hit = RESULT_CACHE.get_or_search(
+        query, filters, top_k, index_version(), run_search
+    )
+    return results, {**stats, "cache": "hit" if hit else "miss"}
 
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute(f"""
-                SELECT
-                    pc.content,
-                    pc.heading,
-                    1 - (pc.embedding <=> %s::vector) AS score,
-                    pd.title AS doc_title,
-                    pc.metadata
-                FROM policy_chunks pc
-                JOIN policy_documents pd ON pc.document_id = pd.doc_id
-                {where_clause}
-                ORDER BY pc.embedding <=> %s::vector
-                LIMIT %s
-            """, params)
 
-            rows = cur.fetchall()
-            results = []
-            for row in rows:
-                results.append({
-                    "content": row[0],
-                    "heading": row[1],
-                    "score": float(row[2]),
-                    "doc_title": row[3],
-                    "metadata": row[4] if row[4] else {}
-                })
-            return results
-    finally:
-        conn.close()
+def search_policies(query, filters=None, top_k=5):
+    """
+    Search policy chunks using vector similarity with optional metadata filters.
+    """
+    results, _ = search_policies_with_stats(query, filters=filters, top_k=top_k)
+    return results
 
 
 if __name__ == "__main__":
-    results = search_policies("What are the KYC requirements?", top_k=3)
+    results, stats = search_policies_with_stats(
+        "What are the KYC requirements?", filters={"doc_type": "Compliance Procedure"}, top_k=3
+    )
     if results:
         for r in results:
             print(f"[{r['score']:.4f}] {r['doc_title']} -- {r['heading']}")
     else:
         print("No results found.")
+    print(f"Search stats: {stats}")
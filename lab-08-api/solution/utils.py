@@ -2,10 +2,18 @@
 Lab 08 Solution: Shared Utilities (same as start -- provided complete)
 """
 
+import os
+import sys
 import psycopg2
-import requests
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from db_pool import get_pool
+from embedding_cache import EmbeddingCache
+from ollama_client import get_client
+from pgvector_adapter import register_vector
+from query_cache import QueryEmbeddingCache
+
 DB_CONFIG = {
     "dbname": "pgvector",
     "user": "postgres",
@@ -14,8 +22,11 @@ DB_CONFIG = {
     "port": "5050"
 }
 
-OLLAMA_URL = "http://localhost:11434/api/embed"
-OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
+# Set QUERY_CACHE_SHARED=1 to also share query embeddings between worker
+# processes through the on-disk embedding cache.
+QUERY_CACHE = QueryEmbeddingCache(
+    l2=EmbeddingCache() if os.environ.get("QUERY_CACHE_SHARED") else None
+)
 
 SYSTEM_PROMPT = """You are PolicyChat, a banking regulatory policy assistant.
 Answer questions using ONLY the provided context from policy documents.
@@ -25,20 +36,26 @@ Use professional, precise language appropriate for banking compliance."""
 
 
 def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    return register_vector(psycopg2.connect(**DB_CONFIG))
+
+
+def get_db_pool():
+    return get_pool(DB_CONFIG, configure=register_vector)
+
+
+def db_connection():
+    """Borrow a pooled connection: `with db_connection() as conn: ...`"""
+    return get_db_pool().connection()
 
 
 def get_embedding(text):
-    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": text})
-    response.raise_for_status()
-    return response.json()["embeddings"][0]
+    return get_client().embed_one(text)
+
+
+def get_query_embedding(query):
+    """Embed a search query, reusing the embedding of an identical earlier query."""
+    return QUERY_CACHE.get(query, get_embedding)
 
 
 def chat_with_llm(messages):
-    response = requests.post(OLLAMA_CHAT_URL, json={
-        "model": "llama3.2",
-        "messages": messages,
-        "stream": False
-    })
-    response.raise_for_status()
-    return response.json()["message"]["content"]
+    return get_client().chat(messages)
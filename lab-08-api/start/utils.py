@@ -5,10 +5,16 @@ This file contains database configuration, embedding, and LLM helpers
 used by the other modules in this lab.
 """
 
+import os
+import sys
 import psycopg2
-import requests
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from db_pool import get_pool
+from ollama_client import get_client
+from pgvector_adapter import register_vector
+
 DB_CONFIG = {
     "dbname": "pgvector",
     "user": "postgres",
@@ -17,9 +23,6 @@ DB_CONFIG = {
     "port": "5050"
 }
 
-OLLAMA_URL = "http://localhost:11434/api/embed"
-OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
-
 SYSTEM_PROMPT = """You are PolicyChat, a banking regulatory policy assistant.
 Answer questions using ONLY the provided context from policy documents.
 Always cite the source document title for each claim you make.
@@ -28,20 +31,21 @@ Use professional, precise language appropriate for banking compliance."""
 
 
 def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    return register_vector(psycopg2.connect(**DB_CONFIG))
+
+
+def get_db_pool():
+    return get_pool(DB_CONFIG, configure=register_vector)
+
+
+def db_connection():
+    """Borrow a pooled connection: `with db_connection() as conn: ...`"""
+    return get_db_pool().connection()
 
 
 def get_embedding(text):
-    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": text})
-    response.raise_for_status()
-    return response.json()["embeddings"][0]
+    return get_client().embed_one(text)
 
 
 def chat_with_llm(messages):
-    response = requests.post(OLLAMA_CHAT_URL, json={
-        "model": "llama3.2",
-        "messages": messages,
-        "stream": False
-    })
-    response.raise_for_status()
-    return response.json()["message"]["content"]
+    return get_client().chat(messages)
@@ -5,10 +5,16 @@ Implement precision@K and recall@K for each query in the golden test set.
 Print a formatted table showing per-query and average metrics.
 """
 
+import os
+import sys
 import psycopg2
 import requests
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from filtered_search import nearest_documents
+from pgvector_adapter import register_vector
+
 DB_CONFIG = {
     "dbname": "pgvector",
     "user": "postgres",
@@ -35,16 +41,9 @@ def load_golden_test_set(filepath):
 def retrieve_doc_ids(query, top_k=5):
     """Embed the query, run vector search, return unique doc_ids."""
     embedding = get_embedding(query)
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = register_vector(psycopg2.connect(**DB_CONFIG))
     cur = conn.cursor()
-    cur.execute("""
-        SELECT DISTINCT pd.doc_id
-        FROM policy_chunks pc
-        JOIN policy_documents pd ON pc.document_id = pd.doc_id
-        ORDER BY pc.embedding <=> %s::vector
-        LIMIT %s
-    """, (str(embedding), top_k))
-    doc_ids = [row[0] for row in cur.fetchall()]
+    doc_ids = nearest_documents(cur, embedding, top_k=top_k)
     cur.close()
     conn.close()
     return doc_ids
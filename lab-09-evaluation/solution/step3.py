@@ -5,11 +5,16 @@ Run the full RAG pipeline for each query, then ask the LLM to score
 the generated answer on faithfulness and relevance.
 """
 
+import os
+import sys
 import psycopg2
 import requests
 import json
 import re
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from pgvector_adapter import register_vector, to_vector
+
 DB_CONFIG = {
     "dbname": "pgvector",
     "user": "postgres",
@@ -47,15 +52,15 @@ def load_golden_test_set(filepath):
 def retrieve_chunks(query, top_k=5):
     """Embed the query and retrieve the top-K chunks with their content."""
     embedding = get_embedding(query)
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = register_vector(psycopg2.connect(**DB_CONFIG))
     cur = conn.cursor()
     cur.execute("""
-        SELECT pc.content, 1 - (pc.embedding <=> %s::vector) AS score
+        SELECT pc.content, pc.embedding <=> %s AS distance
         FROM policy_chunks pc
-        ORDER BY pc.embedding <=> %s::vector
+        ORDER BY distance
         LIMIT %s
-    """, (str(embedding), str(embedding), top_k))
-    results = [{"content": row[0], "score": row[1]} for row in cur.fetchall()]
+    """, (to_vector(embedding), top_k))
+    results = [{"content": row[0], "score": 1 - row[1]} for row in cur.fetchall()]
     cur.close()
     conn.close()
     return results
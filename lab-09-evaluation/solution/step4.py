@@ -5,10 +5,17 @@ Run evaluation with different values of K (3, 5, 10) and with/without
 hybrid search to see how metrics change across configurations.
 """
 
+import os
+import sys
 import psycopg2
 import requests
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from filtered_search import nearest_documents
+from hybrid_search import hybrid_search
+from pgvector_adapter import register_vector
+
 DB_CONFIG = {
     "dbname": "pgvector",
     "user": "postgres",
@@ -19,6 +26,9 @@ DB_CONFIG = {
 
 OLLAMA_URL = "http://localhost:11434/api/embed"
 
+# Chunks fetched per requested document; several chunks often share a document.
+CANDIDATE_MULTIPLIER = 5
+
 
 def get_embedding(text):
     response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": text})
@@ -35,16 +45,9 @@ def load_golden_test_set(filepath):
 def retrieve_vector_only(query, top_k=5):
     """Retrieve doc_ids using vector search only."""
     embedding = get_embedding(query)
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = register_vector(psycopg2.connect(**DB_CONFIG))
     cur = conn.cursor()
-    cur.execute("""
-        SELECT DISTINCT pd.doc_id
-        FROM policy_chunks pc
-        JOIN policy_documents pd ON pc.document_id = pd.doc_id
-        ORDER BY pc.embedding <=> %s::vector
-        LIMIT %s
-    """, (str(embedding), top_k))
-    doc_ids = [row[0] for row in cur.fetchall()]
+    doc_ids = nearest_documents(cur, embedding, top_k=top_k)
     cur.close()
     conn.close()
     return doc_ids
@@ -53,51 +56,22 @@ def retrieve_vector_only(query, top_k=5):
 def retrieve_hybrid(query, top_k=5):
     """Retrieve doc_ids using hybrid search (vector + full-text).
 
-    Uses Reciprocal Rank Fusion (RRF) to combine vector similarity
-    and full-text search rankings.
+    Chunks are ranked with Reciprocal Rank Fusion (RRF) of the HNSW and
+    full-text candidate lists, then collapsed to documents in rank order.
     """
     embedding = get_embedding(query)
-    conn = psycopg2.connect(**DB_CONFIG)
+    conn = register_vector(psycopg2.connect(**DB_CONFIG))
     cur = conn.cursor()
-
-    # Vector search results with rank
-    cur.execute("""
-        WITH vector_results AS (
-            SELECT pc.document_id, pd.doc_id,
-                   ROW_NUMBER() OVER (ORDER BY pc.embedding <=> %s::vector) AS vec_rank
-            FROM policy_chunks pc
-            JOIN policy_documents pd ON pc.document_id = pd.doc_id
-            LIMIT %s
-        ),
-        text_results AS (
-            SELECT pc.document_id, pd.doc_id,
-                   ROW_NUMBER() OVER (ORDER BY ts_rank(pc.search_vector,
-                       plainto_tsquery('english', %s)) DESC) AS text_rank
-            FROM policy_chunks pc
-            JOIN policy_documents pd ON pc.document_id = pd.doc_id
-            WHERE pc.search_vector @@ plainto_tsquery('english', %s)
-            LIMIT %s
-        ),
-        combined AS (
-            SELECT doc_id,
-                   COALESCE(1.0 / (60 + vec_rank), 0) AS vec_rrf
-            FROM vector_results
-            UNION ALL
-            SELECT doc_id,
-                   COALESCE(1.0 / (60 + text_rank), 0) AS text_rrf
-            FROM text_results
-        )
-        SELECT doc_id, SUM(vec_rrf) AS rrf_score
-        FROM combined
-        GROUP BY doc_id
-        ORDER BY rrf_score DESC
-        LIMIT %s
-    """, (str(embedding), top_k * 2, query, query, top_k * 2, top_k))
-
-    doc_ids = [row[0] for row in cur.fetchall()]
+    rows = hybrid_search(cur, query, embedding, select="pc.document_id",
+                         top_k=top_k * CANDIDATE_MULTIPLIER)
     cur.close()
     conn.close()
-    return doc_ids
+
+    doc_ids = []
+    for row in rows:
+        if row[5] not in doc_ids:
+            doc_ids.append(row[5])
+    return doc_ids[:top_k]
 
 
 def precision_at_k(retrieved, relevant, k):
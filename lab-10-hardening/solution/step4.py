@@ -5,9 +5,14 @@ Implement input sanitization to detect and block common prompt injection
 attacks against the RAG system.
 """
 
+import os
 import re
+import sys
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from matcher import KeywordMatcher
+
 # Patterns that may indicate prompt injection attempts
 INJECTION_PATTERNS = [
     "ignore previous instructions",
@@ -17,19 +22,14 @@ INJECTION_PATTERNS = [
     "disregard",
     "forget your instructions",
 ]
+INJECTION_MATCHER = KeywordMatcher(INJECTION_PATTERNS)
 
 MAX_INPUT_LENGTH = 500
 
 
 def detect_injection(query):
     """Check if a query contains common prompt injection patterns."""
-    query_lower = query.lower()
-    matched = []
-
-    for pattern in INJECTION_PATTERNS:
-        if pattern.lower() in query_lower:
-            matched.append(pattern)
-
+    matched = INJECTION_MATCHER.find_all(query)
     return {
         "is_suspicious": len(matched) > 0,
         "matched_patterns": matched
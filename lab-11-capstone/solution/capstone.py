@@ -6,10 +6,23 @@ searches across both sources, generates answers with source attribution,
 and detects potential conflicts between policies and updates.
 """
 
+import argparse
 import psycopg2
-import requests
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from async_ingest import DEFAULT_CONCURRENCY, run_ingest
+from chunking import fixed_windows
+from db_pool import get_pool
+from embedding_cache import EmbeddingCache
+from incremental_ingest import content_hash, diff_chunks, document_hash, transaction
+from migrations import ensure_schema
+from ollama_client import get_client
+from pgvector_adapter import register_vector, to_vector
+
+from multi_search import SOURCES, reset_source_cache, search_sources, validate_sources
 
 DB_CONFIG = {
     "dbname": "pgvector",
@@ -19,24 +32,23 @@ DB_CONFIG = {
     "port": "5050"
 }
 
-OLLAMA_URL = "http://localhost:11434/api/embed"
-OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
+EMBEDDING_CACHE = EmbeddingCache()
+
+
+def get_db_pool():
+    return get_pool(DB_CONFIG, configure=register_vector)
 
 
 def get_embedding(text):
-    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": text})
-    response.raise_for_status()
-    return response.json()["embeddings"][0]
+    return get_client().embed_one(text)
+
+
+def get_embeddings(texts):
+    return get_client().embed(texts)
 
 
 def chat_with_llm(messages):
-    response = requests.post(OLLAMA_CHAT_URL, json={
-        "model": "llama3.2",
-        "messages": messages,
-        "stream": False
-    })
-    response.raise_for_status()
-    return response.json()["message"]["content"]
+    return get_client().chat(messages)
 
 
 def parse_frontmatter(text):
@@ -91,47 +103,140 @@ def parse_frontmatter(text):
 
 def chunk_text(text, chunk_size=500, overlap=50):
     """Split text into overlapping chunks."""
-    words = text.split()
-    chunks = []
-    start = 0
-    while start < len(words):
-        end = start + chunk_size
-        chunk = " ".join(words[start:end])
-        chunks.append(chunk)
-        start = end - overlap
-        if start >= len(words):
-            break
+    chunks = [chunk["content"] for chunk in fixed_windows(text, chunk_size, overlap)]
     return chunks if chunks else [text]
 
 
-def ingest_regulatory_updates(directory_path):
-    """Load and ingest regulatory update documents into the database."""
-    conn = psycopg2.connect(**DB_CONFIG)
+def embed_texts(texts):
+    """Embed texts, sending only embedding-cache misses to Ollama."""
+    return EMBEDDING_CACHE.embed(texts, get_embeddings)
+
+
+def affected_areas(metadata):
+    """Return the frontmatter affects field as a list of policy areas."""
+    affects = metadata.get("affects", [])
+    return [affects] if isinstance(affects, str) else list(affects)
+
+
+def insert_update_chunk(cur, chunk, embedding):
+    """Insert one regulatory update chunk with its embedding."""
+    metadata = chunk["metadata"]
+
+    chunk_metadata = {
+        "source_file": chunk["source_file"],
+        "content_hash": chunk["content_hash"],
+        "document_hash": chunk["document_hash"],
+    }
+
+    cur.execute("""
+        INSERT INTO regulatory_updates
+        (doc_id, title, effective_date, regulatory_body, update_type,
+         affects, content, embedding, metadata)
+        VALUES (%s, %s, %s, %s, %s, %s::text[], %s, %s, %s)
+    """, (
+        metadata.get("doc_id"),
+        metadata.get("title"),
+        metadata.get("effective_date"),
+        metadata.get("regulatory_body"),
+        metadata.get("update_type"),
+        affected_areas(metadata),
+        chunk["content"],
+        to_vector(embedding),
+        json.dumps(chunk_metadata)
+    ))
+
+
+def plan_update_document(cur, metadata, body, filename):
+    """Diff one update file against its stored chunks by content hash."""
+    digest = document_hash(metadata, body)
+    chunks = [
+        {"content": chunk, "metadata": metadata, "source_file": filename,
+         "content_hash": content_hash(chunk), "document_hash": digest}
+        for chunk in chunk_text(body)
+    ]
+
+    cur.execute("""
+        SELECT id, metadata->>'content_hash'
+        FROM regulatory_updates
+        WHERE doc_id = %s
+    """, (metadata["doc_id"],))
+    keep, insert, delete = diff_chunks(cur.fetchall(), [c["content_hash"] for c in chunks])
+
+    return {
+        "metadata": metadata,
+        "source_file": filename,
+        "document_hash": digest,
+        "keep": [row_id for row_id, _ in keep],
+        "insert": [chunks[i] for i in insert],
+        "delete": delete,
+    }
+
+
+def apply_update_plan(conn, plan, embeddings):
+    """Apply one document's diff in a single transaction."""
+    metadata = plan["metadata"]
+    with transaction(conn) as cur:
+        if plan["delete"]:
+            cur.execute("DELETE FROM regulatory_updates WHERE id = ANY(%s)", (plan["delete"],))
+        if plan["keep"]:
+            # Reused chunks keep their embedding; refresh document-level fields.
+            cur.execute("""
+                UPDATE regulatory_updates
+                SET title = %s, effective_date = %s, regulatory_body = %s,
+                    update_type = %s, affects = %s::text[],
+                    metadata = (metadata - 'affects') || %s::jsonb
+                WHERE id = ANY(%s)
+            """, (
+                metadata.get("title"),
+                metadata.get("effective_date"),
+                metadata.get("regulatory_body"),
+                metadata.get("update_type"),
+                affected_areas(metadata),
+                json.dumps({
+                    "source_file": plan["source_file"],
+                    "document_hash": plan["document_hash"],
+                }),
+                plan["keep"],
+            ))
+        for chunk, embedding in zip(plan["insert"], embeddings):
+            insert_update_chunk(cur, chunk, embedding)
+
+
+def ingest_regulatory_updates(directory_path, concurrency=None):
+    """Load regulatory update documents and sync them into the database.
+
+    Files whose content is unchanged since the last run are skipped. For
+    changed files only new chunk text is embedded; unchanged chunks keep
+    their rows and removed ones are deleted, one transaction per document.
+    Updates whose file is gone are deleted.
+
+    With concurrency set, embedding requests for all changed files run
+    through the asyncio pipeline with that many requests in flight. Each
+    file's changes are applied as soon as its last chunk is embedded, while
+    later requests are still running. As in the sequential mode, a file whose
+    embedding fails is reported and skipped.
+    """
+    conn = register_vector(psycopg2.connect(**DB_CONFIG))
     cur = conn.cursor()
 
-    # Create the regulatory_updates table
+    # Create or upgrade the regulatory_updates table and its indexes
+    ensure_schema(conn)
+    reset_source_cache()
+
     cur.execute("""
-        CREATE TABLE IF NOT EXISTS regulatory_updates (
-            id SERIAL PRIMARY KEY,
-            doc_id TEXT NOT NULL,
-            title TEXT,
-            effective_date DATE,
-            regulatory_body TEXT,
-            update_type TEXT,
-            content TEXT NOT NULL,
-            embedding vector(1024),
-            metadata JSONB
-        )
+        SELECT DISTINCT ON (doc_id) doc_id, metadata->>'document_hash'
+        FROM regulatory_updates
+        ORDER BY doc_id
     """)
-    conn.commit()
-
-    # Clear existing data to allow re-running
-    cur.execute("DELETE FROM regulatory_updates")
-    conn.commit()
+    stored_hashes = dict(cur.fetchall())
 
     # Process each markdown file
     files_processed = 0
+    files_unchanged = 0
     chunks_inserted = 0
+    chunks_deleted = 0
+    seen_doc_ids = set()
+    plans = []
 
     for filename in sorted(os.listdir(directory_path)):
         if not filename.endswith(".md"):
@@ -147,110 +252,114 @@ def ingest_regulatory_updates(directory_path):
             print(f"  Skipping {filename}: no doc_id in frontmatter")
             continue
 
-        # Chunk the body text
-        chunks = chunk_text(body)
+        seen_doc_ids.add(metadata["doc_id"])
+        if stored_hashes.get(metadata["doc_id"]) == document_hash(metadata, body):
+            files_unchanged += 1
+            continue
 
-        for chunk in chunks:
-            try:
-                embedding = get_embedding(chunk)
-            except Exception as e:
-                print(f"  Error embedding chunk from {filename}: {e}")
-                continue
+        plan = plan_update_document(cur, metadata, body, filename)
+        conn.commit()
 
-            # Store the affects field as part of metadata
-            chunk_metadata = {
-                "affects": metadata.get("affects", []),
-                "source_file": filename
-            }
+        if concurrency:
+            plans.append(plan)
+            continue
 
-            cur.execute("""
-                INSERT INTO regulatory_updates
-                (doc_id, title, effective_date, regulatory_body, update_type,
-                 content, embedding, metadata)
-                VALUES (%s, %s, %s, %s, %s, %s, %s::vector, %s)
-            """, (
-                metadata.get("doc_id"),
-                metadata.get("title"),
-                metadata.get("effective_date"),
-                metadata.get("regulatory_body"),
-                metadata.get("update_type"),
-                chunk,
-                str(embedding),
-                json.dumps(chunk_metadata)
-            ))
-            chunks_inserted += 1
+        # Only chunks whose text changed are embedded
+        try:
+            embeddings = embed_texts([c["content"] for c in plan["insert"]])
+        except Exception as e:
+            print(f"  Error embedding chunks from {filename}: {e}")
+            continue
 
+        apply_update_plan(conn, plan, embeddings)
+        chunks_inserted += len(plan["insert"])
+        chunks_deleted += len(plan["delete"])
         files_processed += 1
-        print(f"  Ingested: {metadata.get('doc_id')} - {metadata.get('title')}")
+        print(f"  Synced: {metadata.get('doc_id')} - {metadata.get('title')} "
+              f"(+{len(plan['insert'])} / -{len(plan['delete'])} chunks)")
+
+    if plans:
+        # Each plan is applied as soon as its last chunk is embedded, while
+        # the remaining embedding requests are still in flight.
+        embedded = [[None] * len(plan["insert"]) for plan in plans]
+        remaining = [len(plan["insert"]) for plan in plans]
+        failed = set()
+
+        def apply_plan(index):
+            nonlocal files_processed, chunks_inserted, chunks_deleted
+            plan = plans[index]
+            if index in failed:
+                print(f"  Skipped {plan['source_file']}: embedding failed")
+                return
+            apply_update_plan(conn, plan, embedded[index])
+            chunks_inserted += len(plan["insert"])
+            chunks_deleted += len(plan["delete"])
+            files_processed += 1
+            print(f"  Synced: {plan['metadata'].get('doc_id')} - "
+                  f"{plan['metadata'].get('title')} "
+                  f"(+{len(plan['insert'])} / -{len(plan['delete'])} chunks)")
+
+        def embed_batch(texts):
+            try:
+                return embed_texts(texts)
+            except Exception as e:
+                print(f"  Error embedding {len(texts)} chunks: {e}")
+                return [None] * len(texts)
+
+        def write_batch(batch, embeddings):
+            for item, embedding in zip(batch, embeddings):
+                index = item["plan"]
+                if embedding is None:
+                    failed.add(index)
+                embedded[index][item["position"]] = embedding
+                remaining[index] -= 1
+                if not remaining[index]:
+                    apply_plan(index)
+
+        for index, count in enumerate(remaining):
+            if not count:
+                apply_plan(index)
+
+        pending_chunks = [
+            {"content": chunk["content"], "plan": index, "position": position}
+            for index, plan in enumerate(plans)
+            for position, chunk in enumerate(plan["insert"])
+        ]
+        run_ingest(pending_chunks, embed_fn=embed_batch, write_fn=write_batch,
+                   concurrency=concurrency, total=len(pending_chunks))
+
+    # Remove updates whose source file no longer exists
+    with transaction(conn) as tx:
+        tx.execute("DELETE FROM regulatory_updates WHERE doc_id <> ALL(%s)",
+                   (list(seen_doc_ids),))
+        chunks_deleted += tx.rowcount
 
-    conn.commit()
     cur.close()
     conn.close()
 
-    print(f"\nIngestion complete: {files_processed} files, "
-          f"{chunks_inserted} chunks inserted")
+    print(f"\nIngestion complete: {files_processed} files synced, "
+          f"{files_unchanged} unchanged, {chunks_inserted} chunks inserted, "
+          f"{chunks_deleted} chunks deleted")
+    print(f"Embedding cache: {EMBEDDING_CACHE.stats()}")
 
 
 def multi_source_search(query, sources=None, top_k=5):
     """Search across multiple data sources (policies and regulatory updates)."""
     if sources is None:
         sources = ["policies", "updates"]
+    validate_sources(sources)
 
     embedding = get_embedding(query)
-    results = {}
 
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    if "policies" in sources:
-        cur.execute("""
-            SELECT pc.content,
-                   1 - (pc.embedding <=> %s::vector) AS score,
-                   pd.doc_id,
-                   pd.title
-            FROM policy_chunks pc
-            JOIN policy_documents pd ON pc.document_id = pd.doc_id
-            ORDER BY pc.embedding <=> %s::vector
-            LIMIT %s
-        """, (str(embedding), str(embedding), top_k))
-
-        results["policies"] = [
-            {"content": row[0], "score": row[1], "doc_id": row[2],
-             "title": row[3], "source_type": "policy"}
-            for row in cur.fetchall()
-        ]
+    # One UNION ALL over every requested source (see multi_search.py)
+    with get_db_pool().connection() as conn:
+        with conn.cursor() as cur:
+            merged = search_sources(cur, embedding, sources, top_k=top_k)
 
-    if "updates" in sources:
-        # Check if the table exists before querying
-        cur.execute("""
-            SELECT EXISTS (
-                SELECT FROM information_schema.tables
-                WHERE table_name = 'regulatory_updates'
-            )
-        """)
-        table_exists = cur.fetchone()[0]
-
-        if table_exists:
-            cur.execute("""
-                SELECT content,
-                       1 - (embedding <=> %s::vector) AS score,
-                       doc_id,
-                       title
-                FROM regulatory_updates
-                ORDER BY embedding <=> %s::vector
-                LIMIT %s
-            """, (str(embedding), str(embedding), top_k))
-
-            results["updates"] = [
-                {"content": row[0], "score": row[1], "doc_id": row[2],
-                 "title": row[3], "source_type": "update"}
-                for row in cur.fetchall()
-            ]
-        else:
-            results["updates"] = []
-
-    cur.close()
-    conn.close()
+    results = {}
+    for name in sources:
+        source_type = SOURCES[name]["source_type"]
+        results[name] = [r for r in merged if r["source_type"] == source_type]
     return results
 
 
@@ -353,10 +462,17 @@ def detect_conflicts(policy_results, update_results):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lab 11 capstone: multi-source RAG.")
+    parser.add_argument("--concurrency", type=int,
+                        help="embed changed update files with up to this many requests "
+                             f"in flight (e.g. {DEFAULT_CONCURRENCY}); without it files are "
+                             "synced one at a time")
+    args = parser.parse_args()
+
     # Step 1: Ingest regulatory updates
     updates_dir = "../data/regulatory_updates"
     print("Ingesting regulatory updates...")
-    ingest_regulatory_updates(updates_dir)
+    ingest_regulatory_updates(updates_dir, concurrency=args.concurrency)
 
     # Step 2: Multi-source search
     query = "What are the current KYC requirements and any recent changes?"
@@ -0,0 +1,126 @@
+"""
+Lab 11 - Unified search over policies and regulatory updates (Solution)
+
+Searching each source separately costs a schema check plus one query per
+source. search_sources() sends a single UNION ALL statement instead. Each
+branch orders one table by vector distance with its own LIMIT, so each can use
+that table's HNSW index. The rows come back merged by score. Which source
+tables exist is cached for SCHEMA_CACHE_SECONDS, so the check is not repeated
+on every call.
+
+Usage:
+    with get_db_pool().connection() as conn:
+        with conn.cursor() as cur:
+            results = search_sources(cur, embedding, ["policies", "updates"], top_k=5)
+"""
+
+import time
+
+from pgvector_adapter import to_vector
+
+# Source name -> table, result columns and the filters the table supports.
+SOURCES = {
+    "policies": {
+        "table": "policy_chunks",
+        "source_type": "policy",
+        "doc_id": "document_id",
+        "title": "doc_title",
+        "filters": {"doc_type": "doc_type", "regulatory_body": "regulatory_body"},
+    },
+    "updates": {
+        "table": "regulatory_updates",
+        "source_type": "update",
+        "doc_id": "doc_id",
+        "title": "title",
+        "filters": {"regulatory_body": "regulatory_body"},
+    },
+}
+
+SCHEMA_CACHE_SECONDS = 60.0
+
+_present_tables = None
+_checked_at = 0.0
+
+
+def reset_source_cache():
+    """Forget which source tables exist (call after creating one)."""
+    global _present_tables
+    _present_tables = None
+
+
+def validate_sources(sources):
+    """Raise ValueError if any name in sources is not a key of SOURCES."""
+    unknown = [name for name in sources if name not in SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown source(s) {unknown!r}; choose from {sorted(SOURCES)}")
+
+
+def present_sources(cursor):
+    """Return the names of SOURCES whose table exists, cached for a while."""
+    global _present_tables, _checked_at
+    if _present_tables is None or time.monotonic() - _checked_at > SCHEMA_CACHE_SECONDS:
+        tables = [source["table"] for source in SOURCES.values()]
+        cursor.execute(
+            "SELECT t FROM unnest(%s::text[]) AS t WHERE to_regclass(t) IS NOT NULL",
+            (tables,),
+        )
+        _present_tables = {row[0] for row in cursor.fetchall()}
+        _checked_at = time.monotonic()
+    return [name for name, source in SOURCES.items() if source["table"] in _present_tables]
+
+
+def search_sources(cursor, embedding, sources=None, top_k=5, **filters):
+    """Search the requested sources in one statement and merge by score.
+
+    Args:
+        cursor: psycopg2 cursor on a connection with register_vector applied.
+        embedding: Query embedding.
+        sources: Names from SOURCES; defaults to all of them. Sources whose
+            table does not exist are skipped.
+        top_k: Results taken from each source.
+        **filters: Column filters such as doc_type or regulatory_body. A
+            source that does not have a filter's column ignores it.
+
+    Returns:
+        List of dicts with content, score, doc_id, title and source_type,
+        best score first.
+
+    Raises:
+        ValueError: If sources names a source that is not in SOURCES.
+    """
+    requested = list(SOURCES) if sources is None else sources
+    validate_sources(requested)
+    available = present_sources(cursor)
+    names = [name for name in requested if name in available]
+    if not names:
+        return []
+
+    vector = to_vector(embedding)
+    branches, params = [], []
+    for name in names:
+        source = SOURCES[name]
+        conditions, values = [], []
+        for key, column in source["filters"].items():
+            if filters.get(key):
+                conditions.append(f"{column} = %s")
+                values.append(filters[key])
+        where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+        branches.append(f"""
+            (SELECT '{source["source_type"]}' AS source_type,
+                    content,
+                    embedding <=> %s AS distance,
+                    {source["doc_id"]} AS doc_id,
+                    {source["title"]} AS title
+             FROM {source["table"]}
+             {where_clause}
+             ORDER BY distance
+             LIMIT %s)
+        """)
+        params.extend([vector] + values + [top_k])
+
+    cursor.execute(" UNION ALL ".join(branches) + " ORDER BY distance", params)
+    return [
+        {"content": row[1], "score": 1 - row[2], "doc_id": row[3],
+         "title": row[4], "source_type": row[0]}
+        for row in cursor.fetchall()
+    ]
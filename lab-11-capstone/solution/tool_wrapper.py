@@ -5,10 +5,18 @@ Package the RAG pipeline as a tool with a standard schema that an AI agent
 can discover and invoke. This bridges the RAG module to the Agents module.
 """
 
-import psycopg2
-import requests
+import os
+import sys
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "shared"))
+from db_pool import get_pool
+from ollama_client import get_client
+from pgvector_adapter import register_vector
+from query_cache import QueryEmbeddingCache
+
+from multi_search import search_sources, validate_sources
+
 DB_CONFIG = {
     "dbname": "pgvector",
     "user": "postgres",
@@ -17,8 +25,7 @@ DB_CONFIG = {
     "port": "5050"
 }
 
-OLLAMA_URL = "http://localhost:11434/api/embed"
-OLLAMA_CHAT_URL = "http://localhost:11434/api/chat"
+QUERY_CACHE = QueryEmbeddingCache()
 
 TOOL_SCHEMA = {
     "name": "policy_search",
@@ -49,118 +56,37 @@ TOOL_SCHEMA = {
 }
 
 
+def get_db_pool():
+    return get_pool(DB_CONFIG, configure=register_vector)
+
+
 def get_embedding(text):
-    response = requests.post(OLLAMA_URL, json={"model": "bge-m3", "input": text})
-    response.raise_for_status()
-    return response.json()["embeddings"][0]
+    return get_client().embed_one(text)
+
+
+def get_query_embedding(query):
+    """Embed a search query, reusing the embedding of an identical earlier query."""
+    return QUERY_CACHE.get(query, get_embedding)
 
 
 def chat_with_llm(messages):
-    response = requests.post(OLLAMA_CHAT_URL, json={
-        "model": "llama3.2",
-        "messages": messages,
-        "stream": False
-    })
-    response.raise_for_status()
-    return response.json()["message"]["content"]
+    return get_client().chat(messages)
 
 
 def search_policies(query, embedding, top_k=5, doc_type=None, regulatory_body=None):
     """Search the policy_chunks table with optional filters."""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    # Build the query with optional filters
-    where_clauses = []
-    params = [str(embedding), str(embedding)]
-
-    if doc_type:
-        where_clauses.append("pd.doc_type = %s")
-        params.append(doc_type)
-
-    if regulatory_body:
-        where_clauses.append("pd.regulatory_body = %s")
-        params.append(regulatory_body)
-
-    where_str = ""
-    if where_clauses:
-        where_str = "WHERE " + " AND ".join(where_clauses)
-
-    params.append(top_k)
-
-    cur.execute(f"""
-        SELECT pc.content,
-               1 - (pc.embedding <=> %s::vector) AS score,
-               pd.doc_id,
-               pd.title
-        FROM policy_chunks pc
-        JOIN policy_documents pd ON pc.document_id = pd.doc_id
-        {where_str}
-        ORDER BY pc.embedding <=> %s::vector
-        LIMIT %s
-    """, params)
-
-    results = [
-        {"content": row[0], "score": row[1], "doc_id": row[2],
-         "title": row[3], "source_type": "policy"}
-        for row in cur.fetchall()
-    ]
-
-    cur.close()
-    conn.close()
-    return results
+    with get_db_pool().connection() as conn:
+        with conn.cursor() as cur:
+            return search_sources(cur, embedding, ["policies"], top_k=top_k,
+                                  doc_type=doc_type, regulatory_body=regulatory_body)
 
 
 def search_updates(query, embedding, top_k=5, regulatory_body=None):
     """Search the regulatory_updates table with optional filters."""
-    conn = psycopg2.connect(**DB_CONFIG)
-    cur = conn.cursor()
-
-    # Check if table exists
-    cur.execute("""
-        SELECT EXISTS (
-            SELECT FROM information_schema.tables
-            WHERE table_name = 'regulatory_updates'
-        )
-    """)
-    if not cur.fetchone()[0]:
-        cur.close()
-        conn.close()
-        return []
-
-    where_clauses = []
-    params = [str(embedding), str(embedding)]
-
-    if regulatory_body:
-        where_clauses.append("regulatory_body = %s")
-        params.append(regulatory_body)
-
-    where_str = ""
-    if where_clauses:
-        where_str = "WHERE " + " AND ".join(where_clauses)
-
-    params.append(top_k)
-
-    cur.execute(f"""
-        SELECT content,
-               1 - (embedding <=> %s::vector) AS score,
-               doc_id,
-               title
-        FROM regulatory_updates
-        {where_str}
-        ORDER BY embedding <=> %s::vector
-        LIMIT %s
-    """, params)
-
-    results = [
-        {"content": row[0], "score": row[1], "doc_id": row[2],
-         "title": row[3], "source_type": "update"}
-        for row in cur.fetchall()
-    ]
-
-    cur.close()
-    conn.close()
-    return results
+    with get_db_pool().connection() as conn:
+        with conn.cursor() as cur:
+            return search_sources(cur, embedding, ["updates"], top_k=top_k,
+                                  regulatory_body=regulatory_body)
 
 
 def determine_confidence(all_results):
@@ -189,7 +115,12 @@ def policy_search_tool(query, filters=None):
     regulatory_body = filters.get("regulatory_body")
 
     try:
-        embedding = get_embedding(query)
+        validate_sources(sources)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    try:
+        embedding = get_query_embedding(query)
     except Exception as e:
         return {
             "answer": f"Error generating embedding: {e}",
@@ -197,27 +128,16 @@ def policy_search_tool(query, filters=None):
             "confidence": "low"
         }
 
-    all_results = []
-
-    # Search policies
-    if "policies" in sources:
-        try:
-            policy_results = search_policies(
-                query, embedding, top_k=5,
-                doc_type=doc_type, regulatory_body=regulatory_body)
-            all_results.extend(policy_results)
-        except Exception as e:
-            print(f"Warning: Policy search failed: {e}")
-
-    # Search updates
-    if "updates" in sources:
-        try:
-            update_results = search_updates(
-                query, embedding, top_k=5,
-                regulatory_body=regulatory_body)
-            all_results.extend(update_results)
-        except Exception as e:
-            print(f"Warning: Update search failed: {e}")
+    # Search every requested source in one query, merged by score
+    try:
+        with get_db_pool().connection() as conn:
+            with conn.cursor() as cur:
+                all_results = search_sources(
+                    cur, embedding, sources, top_k=5,
+                    doc_type=doc_type, regulatory_body=regulatory_body)
+    except Exception as e:
+        print(f"Warning: Search failed: {e}")
+        all_results = []
 
     # Determine confidence
     confidence = determine_confidence(all_results)
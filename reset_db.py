@@ -41,7 +41,12 @@ CREATE TABLE policy_chunks (
     embedding vector(1024),
     metadata JSONB,
     search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    doc_title TEXT,
+    doc_type TEXT,
+    regulatory_body TEXT,
+    effective_date DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP
 );
 
 CREATE INDEX idx_policy_chunks_embedding
@@ -61,6 +66,152 @@ CREATE INDEX idx_policy_documents_doc_type
 
 CREATE INDEX idx_policy_documents_regulatory_body
     ON policy_documents (regulatory_body);
+
+CREATE INDEX idx_policy_chunks_document_id
+    ON policy_chunks (document_id);
+
+CREATE INDEX idx_policy_chunks_doc_type
+    ON policy_chunks (doc_type);
+
+CREATE INDEX idx_policy_chunks_regulatory_body
+    ON policy_chunks (regulatory_body);
+
+CREATE INDEX idx_policy_chunks_effective_date
+    ON policy_chunks (effective_date);
+
+-- B-tree index for reading chunks added since a point in time
+CREATE INDEX idx_policy_chunks_created_at
+    ON policy_chunks (created_at);
+
+CREATE INDEX idx_policy_chunks_changed_at
+    ON policy_chunks ((GREATEST(created_at, updated_at)));
+
+CREATE OR REPLACE FUNCTION policy_chunks_copy_document_fields() RETURNS trigger AS $$
+BEGIN
+    SELECT d.title, d.doc_type, d.regulatory_body, d.effective_date
+    INTO NEW.doc_title, NEW.doc_type, NEW.regulatory_body, NEW.effective_date
+    FROM policy_documents d
+    WHERE d.doc_id = NEW.document_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_policy_chunks_document_fields
+    BEFORE INSERT OR UPDATE OF document_id ON policy_chunks
+    FOR EACH ROW EXECUTE FUNCTION policy_chunks_copy_document_fields();
+
+CREATE OR REPLACE FUNCTION policy_chunks_set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_policy_chunks_updated_at
+    BEFORE UPDATE ON policy_chunks
+    FOR EACH ROW EXECUTE FUNCTION policy_chunks_set_updated_at();
+
+CREATE OR REPLACE FUNCTION policy_documents_sync_chunks() RETURNS trigger AS $$
+BEGIN
+    UPDATE policy_chunks
+    SET doc_title = NEW.title,
+        doc_type = NEW.doc_type,
+        regulatory_body = NEW.regulatory_body,
+        effective_date = NEW.effective_date
+    WHERE document_id = NEW.doc_id
+      AND (doc_title, doc_type, regulatory_body, effective_date)
+          IS DISTINCT FROM (NEW.title, NEW.doc_type, NEW.regulatory_body, NEW.effective_date);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_policy_documents_sync_chunks
+    AFTER INSERT OR UPDATE OF title, doc_type, regulatory_body, effective_date
+    ON policy_documents
+    FOR EACH ROW EXECUTE FUNCTION policy_documents_sync_chunks();
+
+CREATE TABLE regulatory_updates (
+    id SERIAL PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    title TEXT,
+    effective_date DATE,
+    regulatory_body TEXT,
+    update_type TEXT,
+    affects TEXT[] NOT NULL DEFAULT '{}',
+    content TEXT NOT NULL,
+    embedding vector(1024),
+    metadata JSONB,
+    search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_regulatory_updates_embedding
+    ON regulatory_updates USING hnsw (embedding vector_cosine_ops);
+
+CREATE INDEX idx_regulatory_updates_search_vector
+    ON regulatory_updates USING gin (search_vector);
+
+CREATE INDEX idx_regulatory_updates_affects
+    ON regulatory_updates USING gin (affects);
+
+CREATE INDEX idx_regulatory_updates_metadata
+    ON regulatory_updates USING gin (metadata);
+
+CREATE INDEX idx_regulatory_updates_doc_id
+    ON regulatory_updates (doc_id);
+
+CREATE INDEX idx_regulatory_updates_regulatory_body
+    ON regulatory_updates (regulatory_body);
+
+CREATE TABLE corpus_generation (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    -- Seeded from the clock so a recreated table never repeats old values
+    generation BIGINT NOT NULL
+        DEFAULT (extract(epoch FROM clock_timestamp()) * 1000000)::bigint,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO corpus_generation (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_corpus_generation() RETURNS trigger AS $$
+BEGIN
+    -- Deferred row triggers fire for every changed row at commit; bump once.
+    IF current_setting('policychat.corpus_generation_bumped', true)
+            IS DISTINCT FROM 'on' THEN
+        UPDATE corpus_generation
+        SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP;
+        PERFORM set_config('policychat.corpus_generation_bumped', 'on', true);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE CONSTRAINT TRIGGER trg_policy_chunks_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE ON policy_chunks
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE TRIGGER trg_policy_chunks_corpus_generation_truncate
+    AFTER TRUNCATE ON policy_chunks
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE CONSTRAINT TRIGGER trg_policy_documents_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE ON policy_documents
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE TRIGGER trg_policy_documents_corpus_generation_truncate
+    AFTER TRUNCATE ON policy_documents
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE CONSTRAINT TRIGGER trg_regulatory_updates_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE ON regulatory_updates
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE TRIGGER trg_regulatory_updates_corpus_generation_truncate
+    AFTER TRUNCATE ON regulatory_updates
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
 """
 
 conn = psycopg2.connect(**DB_CONFIG)
@@ -70,6 +221,9 @@ cur = conn.cursor()
 print("Dropping existing tables...")
 cur.execute("DROP TABLE IF EXISTS policy_chunks CASCADE;")
 cur.execute("DROP TABLE IF EXISTS policy_documents CASCADE;")
+cur.execute("DROP TABLE IF EXISTS regulatory_updates;")
+cur.execute("DROP TABLE IF EXISTS corpus_generation;")
+cur.execute("DROP TABLE IF EXISTS schema_migrations;")
 
 print("Recreating schema (tables + indexes)...")
 cur.execute(SCHEMA_SQL)
@@ -0,0 +1,145 @@
+"""
+Asyncio ingestion pipeline with bounded embedding concurrency.
+
+Chunks are grouped into batches and embedded with up to `concurrency`
+requests in flight at once, while a single writer task stores finished
+batches in the database. Embedding and writing therefore overlap instead of
+alternating, and the Ollama host is kept busy for the whole run.
+
+embed_fn and write_fn are ordinary blocking functions (requests, psycopg2);
+they run in worker threads via asyncio.to_thread. write_fn is only ever
+called from one task at a time, so it can safely share a single connection.
+
+Usage:
+    stats = run_ingest(chunks, embed_fn=get_embeddings, write_fn=write_batch,
+                       concurrency=4, batch_size=16)
+"""
+
+import asyncio
+import itertools
+import time
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_BATCH_SIZE = 16
+REPORT_INTERVAL_SECONDS = 2.0
+
+
+def iter_batches(items, batch_size):
+    """Yield lists of up to batch_size items from any iterable."""
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class ThroughputReporter:
+    """Tracks written chunks and prints chunks/s at a fixed interval."""
+
+    def __init__(self, total=None, interval=REPORT_INTERVAL_SECONDS):
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def add(self, count):
+        self.done += count
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        progress = f"{self.done}/{self.total}" if self.total is not None else f"{self.done}"
+        print(f"  Ingested {progress} chunks ({self.rate():.1f} chunks/s)")
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        return {
+            "chunks": self.done,
+            "seconds": round(elapsed, 3),
+            "chunks_per_second": round(self.rate(), 2),
+        }
+
+
+async def ingest_async(items, embed_fn, write_fn, concurrency=DEFAULT_CONCURRENCY,
+                       batch_size=DEFAULT_BATCH_SIZE, total=None):
+    """Embed and write items with at most `concurrency` embed calls in flight.
+
+    Args:
+        items: Iterable of chunk dicts, each with a 'content' key.
+        embed_fn: Blocking function mapping a list of texts to embeddings.
+        write_fn: Blocking function called as write_fn(batch, embeddings).
+        concurrency: Maximum number of embedding requests in flight.
+        batch_size: Number of chunks per embedding request.
+        total: Optional total chunk count, used only for progress output.
+
+    Returns:
+        A dict with the number of chunks written, elapsed seconds and chunks/s.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    queue = asyncio.Queue(maxsize=concurrency)
+    reporter = ThroughputReporter(total=total)
+    errors = []
+
+    async def embed_batch(batch):
+        try:
+            texts = [item["content"] for item in batch]
+            embeddings = await asyncio.to_thread(embed_fn, texts)
+            await queue.put((batch, embeddings))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            semaphore.release()
+
+    async def writer():
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                return
+            if errors:
+                # Keep draining so embedders never block on a full queue.
+                continue
+            batch, embeddings = entry
+            try:
+                await asyncio.to_thread(write_fn, batch, embeddings)
+                reporter.add(len(batch))
+            except Exception as e:
+                errors.append(e)
+
+    writer_task = asyncio.create_task(writer())
+    pending = set()
+    for batch in iter_batches(items, batch_size):
+        await semaphore.acquire()
+        if errors:
+            semaphore.release()
+            break
+        task = asyncio.create_task(embed_batch(batch))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    if pending:
+        await asyncio.gather(*pending)
+    await queue.put(None)
+    await writer_task
+
+    if errors:
+        raise errors[0]
+
+    reporter.report()
+    return reporter.summary()
+
+
+def run_ingest(items, embed_fn, write_fn, concurrency=DEFAULT_CONCURRENCY,
+               batch_size=DEFAULT_BATCH_SIZE, total=None):
+    """Synchronous entry point for ingest_async, for use from scripts."""
+    return asyncio.run(ingest_async(
+        items, embed_fn, write_fn,
+        concurrency=concurrency, batch_size=batch_size, total=total,
+    ))
@@ -0,0 +1,198 @@
+"""
+Bulk loading for policy_documents and policy_chunks.
+
+Documents are upserted with a single multi-row INSERT ... ON CONFLICT
+statement. Chunks are streamed into policy_chunks with
+COPY ... FROM STDIN (FORMAT binary): rows are encoded as they arrive from the
+embedding stage, and every batch_rows rows are sent as one COPY and committed
+together, so load time is bounded by embedding speed rather than by one
+INSERT and one commit per row.
+
+Usage:
+    upsert_documents(cur, [doc["metadata"] for doc in documents])
+
+    with ChunkCopyWriter(conn) as writer:
+        for batch, embeddings in embedded_batches:
+            writer.write_many(batch, embeddings)
+    print(writer.stats())
+"""
+
+import io
+import json
+import struct
+from datetime import date
+
+from psycopg2.extras import execute_values
+
+from pgvector_adapter import encode_vector_binary
+
+DEFAULT_COPY_BATCH_ROWS = 1000
+
+CHUNK_COLUMNS = ("document_id", "chunk_index", "content", "heading", "embedding", "metadata")
+
+# COPY binary framing: signature, flags and header-extension length, then a
+# 16-bit field count per tuple and a 16-bit -1 trailer.
+_COPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_COPY_TRAILER = struct.pack(">h", -1)
+_FIELD_COUNT = struct.pack(">h", len(CHUNK_COLUMNS))
+_LENGTH = struct.Struct(">i")
+_INT4 = struct.pack(">i", 4)
+_NULL = struct.pack(">i", -1)
+_JSONB_VERSION = b"\x01"
+
+
+def parse_effective_date(doc_id, value):
+    """Return value as a date, or None (with a warning) if it is not an ISO date.
+
+    Frontmatter is free text, and one bad value must not abort the upsert of
+    every other document in the statement.
+    """
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value).strip())
+    except ValueError:
+        print(f"  Warning: {doc_id} has effective_date {value!r}, which is not "
+              f"a YYYY-MM-DD date; storing NULL")
+        return None
+
+
+def upsert_documents(cursor, documents):
+    """Insert or update policy_documents rows in one statement.
+
+    Args:
+        cursor: psycopg2 cursor.
+        documents: Iterable of frontmatter metadata dicts with doc_id, title
+            and doc_type keys, plus optional regulatory_body and
+            effective_date. An effective_date that is not an ISO date is
+            stored as NULL (it stays in metadata). When a doc_id repeats,
+            the last one wins.
+
+    Returns:
+        The number of distinct documents written.
+    """
+    rows = {}
+    for metadata in documents:
+        doc_id = metadata.get("doc_id", "unknown")
+        rows[doc_id] = (
+            doc_id,
+            metadata.get("title", ""),
+            metadata.get("doc_type", ""),
+            metadata.get("regulatory_body") or None,
+            parse_effective_date(doc_id, metadata.get("effective_date")),
+            json.dumps(metadata),
+        )
+    if not rows:
+        return 0
+
+    execute_values(
+        cursor,
+        """
+        INSERT INTO policy_documents
+        (doc_id, title, doc_type, regulatory_body, effective_date, metadata)
+        VALUES %s
+        ON CONFLICT (doc_id) DO UPDATE SET
+            title = EXCLUDED.title,
+            doc_type = EXCLUDED.doc_type,
+            regulatory_body = EXCLUDED.regulatory_body,
+            effective_date = EXCLUDED.effective_date,
+            metadata = EXCLUDED.metadata
+        """,
+        list(rows.values()),
+        template="(%s, %s, %s, %s, %s::date, %s::jsonb)",
+        page_size=len(rows),
+    )
+    return len(rows)
+
+
+def _text_field(value):
+    if value is None:
+        return _NULL
+    data = value.encode("utf-8")
+    return _LENGTH.pack(len(data)) + data
+
+
+def _bytes_field(data):
+    return _LENGTH.pack(len(data)) + data
+
+
+def encode_chunk_row(chunk, embedding):
+    """Encode one policy_chunks row in COPY binary tuple format."""
+    metadata = chunk.get("metadata")
+    return b"".join((
+        _FIELD_COUNT,
+        _text_field(chunk["document_id"]),
+        _INT4 + struct.pack(">i", chunk["chunk_index"]),
+        _text_field(chunk["content"]),
+        _text_field(chunk.get("heading")),
+        _NULL if embedding is None else _bytes_field(encode_vector_binary(embedding)),
+        _NULL if metadata is None
+        else _bytes_field(_JSONB_VERSION + json.dumps(metadata).encode("utf-8")),
+    ))
+
+
+class ChunkCopyWriter:
+    """Streams chunk rows into policy_chunks with binary COPY in batches.
+
+    With commit=False each batch is only sent, so the rows join the caller's
+    open transaction and are committed (or rolled back) with it.
+    """
+
+    def __init__(self, conn, table="policy_chunks", batch_rows=DEFAULT_COPY_BATCH_ROWS,
+                 commit=True):
+        self.conn = conn
+        self.table = table
+        self.batch_rows = batch_rows
+        self.commit = commit
+        self.rows_written = 0
+        self.batches_committed = 0
+        self._buffer = io.BytesIO()
+        self._pending = 0
+
+    def write(self, chunk, embedding):
+        """Buffer one row, flushing when the batch is full."""
+        self._buffer.write(encode_chunk_row(chunk, embedding))
+        self._pending += 1
+        if self._pending >= self.batch_rows:
+            self.flush()
+
+    def write_many(self, chunks, embeddings):
+        """Buffer rows for chunks paired with their embeddings."""
+        for chunk, embedding in zip(chunks, embeddings):
+            self.write(chunk, embedding)
+
+    def flush(self):
+        """Send buffered rows as one COPY and, unless commit=False, commit them."""
+        if not self._pending:
+            return
+        data = io.BytesIO()
+        data.write(_COPY_HEADER)
+        data.write(self._buffer.getvalue())
+        data.write(_COPY_TRAILER)
+        data.seek(0)
+
+        columns = ", ".join(CHUNK_COLUMNS)
+        with self.conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY {self.table} ({columns}) FROM STDIN WITH (FORMAT binary)", data
+            )
+        if self.commit and not self.conn.autocommit:
+            self.conn.commit()
+
+        self.rows_written += self._pending
+        self.batches_committed += 1
+        self._buffer = io.BytesIO()
+        self._pending = 0
+
+    def stats(self):
+        return {"rows_written": self.rows_written, "batches_committed": self.batches_committed}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
@@ -0,0 +1,252 @@
+"""
+Offset-based chunking engine.
+
+The lab chunkers call len(x.split()) on every paragraph, sentence and piece,
+copy the text for sentence splitting and rebuild strings with " ".join() as
+they go. This engine finds the word start offsets of a document once
+(re.finditer(r"\S+"), the same words as str.split()), counts the words of
+any paragraph or sentence by bisecting those offsets, and keeps pieces as
+(start, end) ranges. Strings are built only when a chunk is emitted. Fixed
+windows are matched directly with a "next N words" regex. Every chunk is a
+dict with its "content" and the "start"/"end" character span it covers in
+the original text.
+
+The content strings are identical to those of the lab strategies:
+- fixed_windows(): fixed_window_chunk, and with overlap the Lab 11 chunk_text
+- heading_sections(): heading_chunk, with preamble=True for the Lab 03 Step 2
+  variant that keeps text before the first ## heading
+- recursive_chunks(): recursive_chunk (paragraphs, then ". " sentences, then
+  word windows)
+
+Usage:
+    for chunk in recursive_chunks(body, target_words=200):
+        print(chunk["start"], chunk["end"], chunk["content"][:40])
+
+    python shared/chunking.py    # timing on a large synthetic document
+"""
+
+import re
+from bisect import bisect_left
+from functools import lru_cache
+
+_WORD = re.compile(r"\S+")
+# split_sentences() replaces "\n" with " " and then splits on ". ".
+_SENTENCE_END = re.compile(r"\.[ \n]")
+
+
+def word_starts(text):
+    """Return the character offset at which each word of text starts."""
+    return [match.start() for match in _WORD.finditer(text)]
+
+
+@lru_cache(maxsize=None)
+def _up_to_words(count):
+    """Regex matching whitespace, then up to count words (group 1)."""
+    return re.compile(r"\s*(\S+(?:\s+\S+){0,%d})" % (count - 1))
+
+
+def _strip_bounds(text, start, end):
+    """Return the bounds of text[start:end].strip() as (start, end)."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _chunk(text, start, end, content=None):
+    return {"content": text[start:end] if content is None else content,
+            "start": start, "end": end}
+
+
+def fixed_windows(text, window_size=200, overlap=0):
+    """Split text into windows of window_size words, overlapping by overlap words.
+
+    Window content is the words joined by single spaces. A text with no
+    words gives no chunks.
+    """
+    if window_size <= 0 or not 0 <= overlap < window_size:
+        raise ValueError(f"Invalid window: window_size={window_size}, overlap={overlap}")
+    window = _up_to_words(window_size)
+    step = _up_to_words(window_size - overlap) if overlap else None
+    chunks = []
+    position = 0
+    while True:
+        match = window.match(text, position)
+        if match is None:
+            return chunks
+        start, end = match.span(1)
+        chunks.append(_chunk(text, start, end, " ".join(text[start:end].split())))
+        position = step.match(text, start).end() if step else end
+
+
+def heading_sections(text, preamble=False):
+    """Split Markdown text into sections by ## headings.
+
+    Text before the first ## heading is dropped, unless preamble is True: then
+    everything from the first non-blank line that is not a # title onwards
+    becomes a "Preamble" section. Sections with no content are skipped.
+    Each chunk also has a "heading" key.
+    """
+    sections = []
+    heading = None
+    body_start = body_end = None
+
+    def close_section():
+        if heading is not None and body_start is not None:
+            start, end = _strip_bounds(text, body_start, body_end)
+            if start < end:
+                section = _chunk(text, start, end)
+                section["heading"] = heading
+                sections.append(section)
+
+    line_start = 0
+    length = len(text)
+    while line_start <= length:
+        line_end = text.find("\n", line_start)
+        if line_end == -1:
+            line_end = length
+        if text.startswith("## ", line_start):
+            close_section()
+            heading = text[line_start:line_end].strip("# ").strip()
+            body_start = body_end = None
+        elif heading is not None:
+            if body_start is None:
+                body_start = line_start
+            body_end = line_end
+        elif preamble and not text.startswith("# ", line_start) and \
+                not text[line_start:line_end].isspace() and line_start < line_end:
+            heading = "Preamble"
+            body_start, body_end = line_start, line_end
+        line_start = line_end + 1
+    close_section()
+    return sections
+
+
+def split_paragraphs(text):
+    """Return chunks for the non-blank paragraphs of text (split on blank lines)."""
+    return [_chunk(text, start, end) for start, end in _paragraph_bounds(text, 0, len(text))]
+
+
+def split_sentences(text):
+    """Return chunks for the sentences of text, as Lab 03's split_sentences().
+
+    Newlines become spaces and every sentence ends with a period.
+    """
+    return [_chunk(text, start, end, _sentence_text(text, start, end))
+            for start, end in _sentence_bounds(text, 0, len(text))]
+
+
+def _paragraph_bounds(text, start, end):
+    position = start
+    while position <= end:
+        separator = text.find("\n\n", position, end)
+        stop = end if separator == -1 else separator
+        bounds = _strip_bounds(text, position, stop)
+        if bounds[0] < bounds[1]:
+            yield bounds
+        if separator == -1:
+            break
+        position = separator + 2
+
+
+def _sentence_bounds(text, start, end):
+    position = start
+    for match in _SENTENCE_END.finditer(text, start, end):
+        bounds = _strip_bounds(text, position, match.start())
+        if bounds[0] < bounds[1]:
+            yield bounds
+        position = match.end()
+    bounds = _strip_bounds(text, position, end)
+    if bounds[0] < bounds[1]:
+        yield bounds
+
+
+def _sentence_text(text, start, end):
+    sentence = text[start:end].replace("\n", " ")
+    return sentence if sentence.endswith(".") else sentence + "."
+
+
+def recursive_chunks(text, target_words=200):
+    """Chunk text by paragraphs, then sentences, then words, up to target_words.
+
+    Paragraphs over target_words are split into sentences, and sentences over
+    it into word windows. Consecutive pieces are then merged (joined with a
+    blank line) while they fit within target_words.
+    """
+    starts = word_starts(text)
+
+    def word_range(start, end):
+        return bisect_left(starts, start), bisect_left(starts, end)
+
+    # Pieces are (start, end, word_count, render) and are only rendered
+    # once their chunk is emitted.
+    pieces = []
+    for para_start, para_end in _paragraph_bounds(text, 0, len(text)):
+        first, last = word_range(para_start, para_end)
+        if last - first <= target_words:
+            pieces.append((para_start, para_end, last - first, None))
+            continue
+        for sent_start, sent_end in _sentence_bounds(text, para_start, para_end):
+            first, last = word_range(sent_start, sent_end)
+            if last - first <= target_words:
+                pieces.append((sent_start, sent_end, last - first, _sentence_text))
+                continue
+            for window in range(first, last, target_words):
+                window_end = min(window + target_words, last)
+                last_word_end = _WORD.match(text, starts[window_end - 1]).end()
+                pieces.append((starts[window], min(last_word_end, sent_end),
+                               window_end - window, _word_window(sent_end)))
+
+    chunks = []
+    group = []
+    group_words = 0
+    for piece in pieces:
+        if group_words + piece[2] > target_words and group:
+            chunks.append(_merge(text, group))
+            group, group_words = [], 0
+        group.append(piece)
+        group_words += piece[2]
+    if group:
+        chunks.append(_merge(text, group))
+    return chunks
+
+
+def _word_window(sentence_end):
+    """Render a word window of an oversized sentence as sentence.split() would."""
+    def render(text, start, end):
+        words = " ".join(text[start:end].split())
+        if end == sentence_end and not words.endswith("."):
+            words += "."
+        return words
+    return render
+
+
+def _merge(text, group):
+    content = "\n\n".join(
+        text[start:end] if render is None else render(text, start, end)
+        for start, end, _, render in group
+    )
+    return _chunk(text, group[0][0], group[-1][1], content)
+
+
+if __name__ == "__main__":
+    import os
+    import time
+
+    path = os.path.join(os.path.dirname(__file__), "..", "lab-03-chunking", "data", "sample_policy.md")
+    with open(path) as f:
+        sample = f.read().split("---", 2)[2].strip()
+    document = "\n\n".join([sample] * 200)
+    print(f"Document: {len(document):,} chars, {len(document.split()):,} words")
+
+    for name, strategy in (
+        ("fixed_windows(200)", lambda: fixed_windows(document, 200)),
+        ("fixed_windows(500, overlap=50)", lambda: fixed_windows(document, 500, 50)),
+        ("heading_sections()", lambda: heading_sections(document)),
+        ("recursive_chunks(200)", lambda: recursive_chunks(document, 200)),
+    ):
+        started = time.perf_counter()
+        chunks = strategy()
+        elapsed = time.perf_counter() - started
+        print(f"  {name:32s} {len(chunks):6d} chunks in {elapsed * 1000:7.1f} ms")
@@ -0,0 +1,211 @@
+"""
+Process-wide, thread-safe PostgreSQL connection pool.
+
+Opening a psycopg2 connection costs a TCP round trip plus authentication, which
+is often slower than the vector search itself. The pool keeps between minconn
+and maxconn connections open, hands them out to threads, and blocks (up to a
+timeout) when all of them are busy instead of failing. Connections that have
+been idle for a while are pinged before they are handed out, and broken ones
+are replaced transparently.
+
+Usage:
+    pool = get_pool(DB_CONFIG, configure=register_vector)
+    with pool.connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1")
+    print(pool.stats())
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.pool import PoolError
+
+DEFAULT_MINCONN = 1
+DEFAULT_MAXCONN = 10
+DEFAULT_TIMEOUT = 30.0
+# Connections idle for longer than this are pinged before reuse.
+DEFAULT_CHECK_INTERVAL = 5.0
+
+
+class ConnectionPool:
+    """Blocking connection pool with health checks and usage gauges."""
+
+    def __init__(self, db_config, minconn=DEFAULT_MINCONN, maxconn=DEFAULT_MAXCONN,
+                 timeout=DEFAULT_TIMEOUT, check_interval=DEFAULT_CHECK_INTERVAL,
+                 configure=None):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError(f"Invalid pool size: minconn={minconn}, maxconn={maxconn}")
+        self.db_config = dict(db_config)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.configure = configure
+
+        self._cond = threading.Condition()
+        self._idle = []          # (connection, returned_at), most recent last
+        self._size = 0           # open connections, idle + in use
+        self._waiting = 0
+        self._closed = False
+        self._checkouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(**self.db_config)
+        if self.configure is not None:
+            self.configure(conn)
+        return conn
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _release_slot(self):
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to timeout seconds for one."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        conn, returned_at = None, None
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("connection pool is closed")
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolError(
+                        f"timed out after {timeout:.1f}s waiting for a connection "
+                        f"({self.maxconn} in use)"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+            waited = time.monotonic() - started
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        if conn is not None and not self._is_healthy(conn, returned_at):
+            conn.close()
+            conn = None
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                self._release_slot()
+                raise
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a connection to the pool, rolling back any open transaction."""
+        if not close and not conn.closed:
+            status = conn.get_transaction_status()
+            if status == TRANSACTION_STATUS_UNKNOWN:
+                close = True
+            elif status != TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    close = True
+
+        if close or conn.closed or self._closed:
+            if not conn.closed:
+                conn.close()
+            self._release_slot()
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection; commit on success, roll back on error."""
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+            if not conn.closed:
+                conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.putconn(conn)
+
+    def stats(self):
+        """Return gauges: in-use, idle and waiting connections, and wait times."""
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "size": self._size,
+                "in_use": self._size - idle,
+                "idle": idle,
+                "waiting": self._waiting,
+                "max_size": self.maxconn,
+                "checkouts": self._checkouts,
+                "wait_time_total": round(self._wait_total, 6),
+                "wait_time_avg": round(self._wait_total / self._checkouts, 6)
+                                 if self._checkouts else 0.0,
+                "wait_time_max": round(self._wait_max, 6),
+            }
+
+    def closeall(self):
+        """Close idle connections; in-use ones are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            conn.close()
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool(db_config, **kwargs):
+    """Return the process-wide ConnectionPool, creating it on first use.
+
+    Arguments are only used by the call that creates the pool.
+    """
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = ConnectionPool(db_config, **kwargs)
+    return _default_pool
@@ -0,0 +1,194 @@
+"""
+Persistent, content-addressed embedding cache shared by the labs.
+
+Embeddings are keyed by (model name, SHA-256 of the text) and stored as
+float32 blobs in a SQLite database, so re-running a lab only calls Ollama for
+text it has not embedded before. The cache is bounded by entry count and
+evicts the least recently used entries first. The entry count is tracked in
+memory, so storing a batch does not count the table; once the count passes
+max_entries, the cache recounts and trims itself to 90% of it.
+
+Usage:
+    cache = EmbeddingCache()
+    embeddings = cache.embed(texts, get_embeddings)   # get_embeddings(list) -> list
+    print(cache.stats())
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), ".cache", "embeddings.sqlite")
+DEFAULT_MODEL = "bge-m3"
+DEFAULT_MAX_ENTRIES = 200_000
+
+# SQLite limits the number of bound parameters per statement.
+_LOOKUP_BATCH = 500
+# Eviction trims to this fraction of max_entries, so it runs once per many puts.
+_EVICT_TO_RATIO = 0.9
+
+
+def text_key(text):
+    """Return the SHA-256 hex digest used to address a piece of text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _encode(embedding):
+    return array("f", embedding).tobytes()
+
+
+def _decode(blob):
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding cache with LRU eviction and hit/miss counters."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                key TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, key)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._entries = self._count()
+
+    def get_many(self, texts, model=DEFAULT_MODEL):
+        """Look up cached embeddings. Returns a list with None for each miss."""
+        keys = [text_key(t) for t in texts]
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = list(set(keys[start:start + _LOOKUP_BATCH]))
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, embedding FROM embeddings "
+                    f"WHERE model = ? AND key IN ({placeholders})",
+                    [model] + batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = _decode(blob)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND key = ?",
+                    [(now, model, key) for key in found],
+                )
+                self._conn.commit()
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, texts, embeddings, model=DEFAULT_MODEL):
+        """Store embeddings for the given texts, then evict if over capacity."""
+        now = time.time()
+        rows = [(model, text_key(t), _encode(e), now) for t, e in zip(texts, embeddings)]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, embedding, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            # An upper bound: replaced keys and other processes' writes are
+            # reconciled by the recount in _evict().
+            self._entries += len(rows)
+            if self._entries > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def embed(self, texts, embed_fn, model=DEFAULT_MODEL):
+        """Return embeddings for texts, calling embed_fn only for cache misses.
+
+        embed_fn takes a list of texts and returns their embeddings in order.
+        It is called at most once per call, with each missing text only once.
+        Returns an empty list without calling embed_fn when texts is empty.
+        """
+        texts = list(texts)
+        results = self.get_many(texts, model=model)
+
+        missing = list(dict.fromkeys(t for t, r in zip(texts, results) if r is None))
+        if missing:
+            new_embeddings = list(embed_fn(missing))
+            if len(new_embeddings) != len(missing):
+                raise ValueError(f"embed_fn returned {len(new_embeddings)} embeddings "
+                                 f"for {len(missing)} texts")
+            self.put_many(missing, new_embeddings, model=model)
+            by_text = dict(zip(missing, new_embeddings))
+            results = [r if r is not None else by_text[t] for t, r in zip(texts, results)]
+        return results
+
+    def _count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _evict(self):
+        """Recount, and if over capacity delete least recently used entries."""
+        self._entries = self._count()
+        if self._entries <= self.max_entries:
+            return
+        excess = self._entries - int(self.max_entries * _EVICT_TO_RATIO)
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,),
+        )
+        self._entries -= excess
+
+    def stats(self):
+        """Return hit/miss counters and the current number of cached entries."""
+        with self._lock:
+            entries = self._count()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+            }
+
+    def clear(self):
+        """Remove every cached embedding and reset the counters."""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._entries = 0
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    cache = EmbeddingCache()
+    print(f"Embedding cache: {cache.path}")
+    print(f"Stats: {cache.stats()}")
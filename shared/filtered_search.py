@@ -0,0 +1,200 @@
+"""
+Filtered vector search that still returns top_k rows.
+
+An HNSW index scan yields at most hnsw.ef_search candidates (40 by default).
+When a selective WHERE clause is applied on top of it, most of them are
+filtered out and the query returns fewer than top_k rows, or the planner gives
+up on the index and sorts the whole table.
+
+filtered_vector_search() takes the nearest candidates from the index without
+any filter, then applies the filters to that candidate set. If fewer than
+top_k rows match, it retries with a larger candidate pool. On pgvector 0.8+,
+iterative index scans let the pool grow past ef_search. On older versions the
+pool is capped at the maximum ef_search, and the search finishes with an
+exact, filter-first scan. Every call reports how many candidates were scanned.
+
+nearest_documents() applies the same idea to document-level retrieval: it
+groups the nearest chunks by document and grows the chunk pool until top_k
+distinct documents are found or every chunk has been considered.
+
+Run inside a transaction (psycopg2's default); the index settings are
+transaction-local.
+
+Usage:
+    rows, stats = filtered_vector_search(
+        cur, query_embedding,
+        select="pc.content, pc.doc_title",
+        conditions=["pc.doc_type = %s"], params=["AML Policy"], top_k=5,
+    )
+    # rows: [(distance, content, title), ...]
+    # stats: {"strategy": "hnsw_iterative", "candidates_scanned": 160, "rounds": 2, ...}
+
+    doc_ids = nearest_documents(cur, query_embedding, top_k=5)
+"""
+
+from pgvector_adapter import to_vector
+
+MIN_CANDIDATES = 40
+CANDIDATE_FACTOR = 4
+GROWTH_FACTOR = 4
+# pgvector rejects hnsw.ef_search values above 1000.
+MAX_EF_SEARCH = 1000
+# Past this many candidates an exact scan of the filtered rows is cheaper.
+MAX_CANDIDATES = 20000
+
+_iterative_scan_supported = None
+
+
+def supports_iterative_scan(cursor):
+    """Return True when the installed pgvector (0.8+) has hnsw.iterative_scan."""
+    global _iterative_scan_supported
+    if _iterative_scan_supported is None:
+        cursor.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cursor.fetchone()
+        version = tuple(int(part) for part in row[0].split(".")[:2]) if row else (0, 0)
+        _iterative_scan_supported = version >= (0, 8)
+    return _iterative_scan_supported
+
+
+def _set_local(cursor, name, value):
+    cursor.execute("SELECT set_config(%s, %s, true)", (name, str(value)))
+
+
+def _candidate_query(select, joins, conditions, table, alias):
+    on_clause = " AND ".join(conditions) if conditions else "TRUE"
+    return f"""
+        WITH candidates AS MATERIALIZED (
+            SELECT id, embedding <=> %s AS distance
+            FROM {table}
+            ORDER BY distance
+            LIMIT %s
+        ),
+        scanned AS (
+            SELECT count(*) AS n FROM candidates
+        )
+        SELECT scanned.n, c.distance, {select}
+        FROM scanned
+        LEFT JOIN (
+            candidates c
+            JOIN {table} {alias} ON {alias}.id = c.id
+            {joins}
+        ) ON {on_clause}
+        ORDER BY c.distance
+        LIMIT %s
+    """
+
+
+def _exact_query(select, joins, conditions, table, alias):
+    where_clause = "WHERE " + " AND ".join(conditions) if conditions else ""
+    return f"""
+        SELECT count(*) OVER () AS n, {alias}.embedding <=> %s AS distance, {select}
+        FROM {table} {alias}
+        {joins}
+        {where_clause}
+        ORDER BY distance
+        LIMIT %s
+    """
+
+
+def filtered_vector_search(cursor, query_embedding, select, joins="", conditions=None,
+                           params=None, top_k=5, table="policy_chunks", alias="pc"):
+    """Return the top_k nearest rows that satisfy conditions.
+
+    Args:
+        cursor: psycopg2 cursor on a connection with register_vector applied.
+        query_embedding: Query vector (list or array).
+        select: Column list for the result rows, using `alias` for the table.
+        joins: Extra JOIN clauses needed by select or conditions.
+        conditions: SQL boolean expressions, ANDed together.
+        params: Parameters for the %s placeholders in conditions.
+        top_k: Number of rows wanted.
+
+    Returns:
+        (rows, stats): rows are tuples of (distance, *selected columns),
+        nearest first; stats reports the strategy used, the number of
+        candidates scanned, the number of rounds and the final ef_search.
+    """
+    conditions = conditions or []
+    params = list(params or [])
+    vector = to_vector(query_embedding)
+    iterative = supports_iterative_scan(cursor)
+
+    candidates = max(top_k * CANDIDATE_FACTOR, MIN_CANDIDATES)
+    rounds = 0
+    total_scanned = 0
+    sql = _candidate_query(select, joins, conditions, table, alias)
+
+    while candidates <= MAX_CANDIDATES and (iterative or candidates <= MAX_EF_SEARCH):
+        rounds += 1
+        ef_search = min(candidates, MAX_EF_SEARCH)
+        _set_local(cursor, "hnsw.ef_search", ef_search)
+        if iterative:
+            _set_local(cursor, "hnsw.iterative_scan", "strict_order")
+            _set_local(cursor, "hnsw.max_scan_tuples", max(candidates * 2, 20000))
+
+        cursor.execute(sql, [vector, candidates] + params + [top_k])
+        result = cursor.fetchall()
+        scanned = result[0][0] if result else 0
+        total_scanned += scanned
+        rows = [row[1:] for row in result if row[1] is not None]
+
+        if len(rows) >= top_k or scanned < candidates:
+            return rows, {
+                "strategy": "hnsw_iterative" if iterative else "hnsw",
+                "candidates_scanned": total_scanned,
+                "rounds": rounds,
+                "ef_search": ef_search,
+            }
+        candidates *= GROWTH_FACTOR
+
+    # The filters are too selective for the index: score only the rows that
+    # pass them, which the planner can find through ordinary B-tree/GIN indexes.
+    rounds += 1
+    _set_local(cursor, "enable_indexscan", "off")
+    cursor.execute(_exact_query(select, joins, conditions, table, alias),
+                   [vector] + params + [top_k])
+    result = cursor.fetchall()
+    _set_local(cursor, "enable_indexscan", "on")
+    scanned = result[0][0] if result else 0
+    return [row[1:] for row in result], {
+        "strategy": "exact",
+        "candidates_scanned": total_scanned + scanned,
+        "rounds": rounds,
+        "ef_search": None,
+    }
+
+
+def nearest_documents(cursor, query_embedding, top_k=5, column="document_id",
+                      table="policy_chunks"):
+    """Return the top_k distinct values of column for the nearest chunks.
+
+    Documents are ranked by their nearest chunk. Several of the nearest
+    chunks often share a document, so the chunk pool is grown until it holds
+    top_k distinct documents or the table is exhausted. Past MAX_EF_SEARCH
+    candidates the last round ranks every chunk exactly. Run inside a
+    transaction; hnsw.ef_search is set transaction-locally.
+    """
+    vector = to_vector(query_embedding)
+    candidates = max(top_k * CANDIDATE_FACTOR, MIN_CANDIDATES)
+    while True:
+        exact = candidates > MAX_EF_SEARCH
+        if not exact:
+            _set_local(cursor, "hnsw.ef_search", candidates)
+        # LIMIT NULL means no limit, which makes the inner query an exact scan.
+        cursor.execute(f"""
+            SELECT {column}, SUM(COUNT(*)) OVER ()
+            FROM (
+                SELECT {column}, embedding <=> %s AS distance
+                FROM {table}
+                ORDER BY distance
+                LIMIT %s
+            ) nearest
+            GROUP BY {column}
+            ORDER BY MIN(distance)
+            LIMIT %s
+        """, (vector, None if exact else candidates, top_k))
+        rows = cursor.fetchall()
+        scanned = int(rows[0][1]) if rows else 0
+        if exact or len(rows) >= top_k or scanned < candidates:
+            return [row[0] for row in rows]
+        candidates *= GROWTH_FACTOR
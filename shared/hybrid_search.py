@@ -0,0 +1,140 @@
+"""
+Index-backed hybrid search with Reciprocal Rank Fusion.
+
+Scoring every chunk with both cosine distance and ts_rank and sorting by the
+combined score reads the whole table, because neither index can produce rows
+in that order. hybrid_search() instead takes two bounded candidate lists:
+- the vector_depth nearest chunks, from the HNSW index on embedding;
+- the text_depth best full-text matches for
+  search_vector @@ websearch_to_tsquery(query), from the GIN index.
+It then fuses them in the same statement, so a query costs one round trip and
+touches at most vector_depth + text_depth chunks however large the table
+grows.
+
+Two fusion methods are available:
+- "rrf" (default): sum of 1 / (rrf_k + rank) over the lists a chunk appears in.
+  Only ranks are used, so the two scores need no common scale.
+- "weighted": vector_weight * cosine similarity + text_weight * ts_rank,
+  computed for every candidate from either list.
+
+Run inside a transaction (psycopg2's default); a vector_depth above the
+default hnsw.ef_search raises it for the current transaction only.
+
+Usage:
+    rows = hybrid_search(cur, "suspicious activity reports", query_embedding,
+                         select="pc.content, pc.heading", top_k=5)
+    # rows: [(score, vector_score, text_score, vector_rank, text_rank,
+    #         content, heading), ...]
+"""
+
+from filtered_search import MAX_EF_SEARCH
+from pgvector_adapter import to_vector
+
+DEFAULT_VECTOR_DEPTH = 40
+DEFAULT_TEXT_DEPTH = 40
+DEFAULT_RRF_K = 60
+# pgvector's default hnsw.ef_search; deeper vector lists need it raised.
+DEFAULT_EF_SEARCH = 40
+FUSION_METHODS = ("rrf", "weighted")
+
+_SCORE_EXPRESSIONS = {
+    "rrf": """
+        COALESCE(1.0 / (%(rrf_k)s + f.vector_rank), 0)
+        + COALESCE(1.0 / (%(rrf_k)s + f.text_rank), 0)
+    """,
+    "weighted": """
+        %(vector_weight)s * (1 - ({alias}.embedding <=> %(embedding)s))
+        + %(text_weight)s * ts_rank({alias}.search_vector, q.query)
+    """,
+}
+
+
+def _hybrid_query(select, method, table, alias):
+    score = _SCORE_EXPRESSIONS[method].replace("{alias}", alias)
+    return f"""
+        WITH q AS (
+            SELECT websearch_to_tsquery('english', %(query)s) AS query
+        ),
+        vector_candidates AS MATERIALIZED (
+            SELECT id, row_number() OVER (ORDER BY distance) AS rank
+            FROM (
+                SELECT id, embedding <=> %(embedding)s AS distance
+                FROM {table}
+                ORDER BY distance
+                LIMIT %(vector_depth)s
+            ) nearest
+        ),
+        text_candidates AS MATERIALIZED (
+            SELECT id, row_number() OVER (ORDER BY text_rank DESC, id) AS rank
+            FROM (
+                SELECT t.id, ts_rank(t.search_vector, q.query) AS text_rank
+                FROM {table} t, q
+                WHERE t.search_vector @@ q.query
+                ORDER BY text_rank DESC
+                LIMIT %(text_depth)s
+            ) matches
+        ),
+        fused AS (
+            SELECT COALESCE(v.id, tc.id) AS id,
+                   v.rank AS vector_rank,
+                   tc.rank AS text_rank
+            FROM vector_candidates v
+            FULL JOIN text_candidates tc ON tc.id = v.id
+        )
+        SELECT {score} AS score,
+               1 - ({alias}.embedding <=> %(embedding)s) AS vector_score,
+               ts_rank({alias}.search_vector, q.query) AS text_score,
+               f.vector_rank,
+               f.text_rank,
+               {select}
+        FROM fused f
+        JOIN {table} {alias} ON {alias}.id = f.id
+        CROSS JOIN q
+        ORDER BY score DESC, {alias}.id
+        LIMIT %(top_k)s
+    """
+
+
+def hybrid_search(cursor, query, query_embedding, select, top_k=5,
+                  vector_depth=DEFAULT_VECTOR_DEPTH, text_depth=DEFAULT_TEXT_DEPTH,
+                  method="rrf", rrf_k=DEFAULT_RRF_K, vector_weight=0.7, text_weight=0.3,
+                  table="policy_chunks", alias="pc"):
+    """Return the top_k chunks by fused vector and full-text relevance.
+
+    Args:
+        cursor: psycopg2 cursor on a connection with register_vector applied.
+        query: Search text, parsed with websearch_to_tsquery.
+        query_embedding: Query vector (list or array).
+        select: Column list for the result rows, using `alias` for the table.
+        top_k: Number of rows wanted.
+        vector_depth: Candidates taken from the HNSW index.
+        text_depth: Candidates taken from the full-text GIN index.
+        method: "rrf" or "weighted".
+        rrf_k: RRF rank constant.
+        vector_weight, text_weight: Weights for method="weighted".
+
+    Returns:
+        Rows of (score, vector_score, text_score, vector_rank, text_rank,
+        *selected columns), best first. A rank is None when the chunk was not
+        in that candidate list.
+    """
+    if method not in FUSION_METHODS:
+        raise ValueError(f"method must be one of {FUSION_METHODS}, got {method!r}")
+
+    vector_depth = max(vector_depth, top_k)
+    text_depth = max(text_depth, top_k)
+    if vector_depth > DEFAULT_EF_SEARCH:
+        cursor.execute("SELECT set_config('hnsw.ef_search', %s, true)",
+                       (str(min(vector_depth, MAX_EF_SEARCH)),))
+
+    cursor.execute(_hybrid_query(select, method, table, alias), {
+        "query": query,
+        "embedding": to_vector(query_embedding),
+        "vector_depth": vector_depth,
+        "text_depth": text_depth,
+        "rrf_k": rrf_k,
+        "vector_weight": vector_weight,
+        "text_weight": text_weight,
+        "top_k": top_k,
+    })
+    return cursor.fetchall()
@@ -0,0 +1,229 @@
+"""
+Incremental, idempotent re-ingestion of policy documents.
+
+Each document stores a hash of its frontmatter and body in
+policy_documents.metadata, and each chunk stores a hash of its text in
+policy_chunks.metadata (both under "content_hash"). On a re-run, unchanged
+documents are skipped outright, unless they have no stored chunks. For a
+changed document the stored chunks are diffed against the new ones by hash.
+Chunks whose text is unchanged keep their row and embedding and only have
+their position, heading or metadata updated.
+New text is embedded and inserted, and chunks that disappeared are deleted.
+Each document is applied in a single transaction, so a refresh costs time
+proportional to what changed rather than to the size of the corpus.
+
+Usage:
+    stats = sync_documents(conn, documents, chunk_fn=chunk_document,
+                           embed_fn=embed_texts, prune=True)
+"""
+
+import hashlib
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+
+from psycopg2.extras import execute_values
+
+from bulk_load import upsert_documents
+from pgvector_adapter import to_vector
+
+HASH_KEY = "content_hash"
+
+
+def content_hash(text):
+    """Return the SHA-256 hex digest of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def document_hash(metadata, content):
+    """Hash a document's frontmatter (minus any stored hash) and body."""
+    fields = {k: v for k, v in metadata.items() if k != HASH_KEY}
+    return content_hash(json.dumps(fields, sort_keys=True) + "\n" + content)
+
+
+def with_hash(metadata, digest):
+    """Return a copy of metadata carrying digest under HASH_KEY."""
+    return {**metadata, HASH_KEY: digest}
+
+
+def diff_chunks(existing, new_hashes):
+    """Match stored chunks to new chunks by content hash.
+
+    Args:
+        existing: List of (row_id, content_hash) for the stored chunks.
+        new_hashes: Content hashes of the new chunks, in order.
+
+    Returns:
+        (keep, insert, delete): keep is a list of (row_id, new_position) for
+        stored chunks that can be reused, insert lists the positions of new
+        chunks that need embedding, and delete lists row_ids to remove.
+    """
+    available = defaultdict(list)
+    for row_id, digest in existing:
+        available[digest].append(row_id)
+
+    keep, insert = [], []
+    for position, digest in enumerate(new_hashes):
+        row_ids = available.get(digest)
+        if row_ids:
+            keep.append((row_ids.pop(0), position))
+        else:
+            insert.append(position)
+
+    delete = [row_id for row_ids in available.values() for row_id in row_ids]
+    return keep, insert, delete
+
+
+@contextmanager
+def transaction(conn):
+    """Run a block in one transaction, even on an autocommit connection."""
+    autocommit = conn.autocommit
+    if autocommit:
+        conn.autocommit = False
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                yield cur
+    finally:
+        if autocommit:
+            conn.autocommit = True
+
+
+def stored_document_hashes(cursor):
+    """Return {doc_id: content_hash} for the stored policy documents that have chunks.
+
+    A document row without chunks is left out even if it carries a hash: a
+    bulk load that failed after upserting it never wrote its chunks, so its
+    hash cannot be trusted to mean the document is in sync.
+    """
+    cursor.execute(f"""
+        SELECT d.doc_id, d.metadata->>'{HASH_KEY}'
+        FROM policy_documents d
+        WHERE EXISTS (SELECT 1 FROM policy_chunks c WHERE c.document_id = d.doc_id)
+    """)
+    return dict(cursor.fetchall())
+
+
+def sync_document(conn, metadata, chunks, embed_fn):
+    """Bring one document's stored chunks in line with `chunks`.
+
+    metadata must already carry the document hash (see with_hash) and every
+    chunk dict needs document_id, chunk_index, heading, content and metadata.
+    Only inserted chunks are embedded. Returns counts per operation.
+    """
+    doc_id = metadata["doc_id"]
+    new_hashes = [content_hash(chunk["content"]) for chunk in chunks]
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT id, chunk_index, heading, metadata
+            FROM policy_chunks
+            WHERE document_id = %s
+            ORDER BY chunk_index
+        """, (doc_id,))
+        rows = {row[0]: row for row in cur.fetchall()}
+
+    existing = [(row_id, (row[3] or {}).get(HASH_KEY)) for row_id, row in rows.items()]
+    keep, insert, delete = diff_chunks(existing, new_hashes)
+
+    embeddings = embed_fn([chunks[i]["content"] for i in insert]) if insert else []
+
+    updates = []
+    for row_id, position in keep:
+        chunk = chunks[position]
+        chunk_metadata = with_hash(chunk["metadata"], new_hashes[position])
+        _, chunk_index, heading, stored_metadata = rows[row_id]
+        if (chunk_index, heading, stored_metadata) != (
+            chunk["chunk_index"], chunk["heading"], chunk_metadata
+        ):
+            updates.append((chunk["chunk_index"], chunk["heading"],
+                            json.dumps(chunk_metadata), row_id))
+
+    with transaction(conn) as cur:
+        upsert_documents(cur, [metadata])
+        if delete:
+            cur.execute("DELETE FROM policy_chunks WHERE id = ANY(%s)", (delete,))
+        if updates:
+            execute_values(cur, """
+                UPDATE policy_chunks AS pc
+                SET chunk_index = v.chunk_index,
+                    heading = v.heading,
+                    metadata = v.metadata
+                FROM (VALUES %s) AS v (chunk_index, heading, metadata, id)
+                WHERE pc.id = v.id
+            """, updates, template="(%s::int, %s, %s::jsonb, %s::int)")
+        if insert:
+            execute_values(cur, """
+                INSERT INTO policy_chunks
+                (document_id, chunk_index, content, heading, embedding, metadata)
+                VALUES %s
+            """, [
+                (
+                    doc_id,
+                    chunks[i]["chunk_index"],
+                    chunks[i]["content"],
+                    chunks[i]["heading"],
+                    to_vector(embedding),
+                    json.dumps(with_hash(chunks[i]["metadata"], new_hashes[i])),
+                )
+                for i, embedding in zip(insert, embeddings)
+            ], template="(%s, %s, %s, %s, %s, %s::jsonb)")
+
+    return {
+        "unchanged": len(keep) - len(updates),
+        "updated": len(updates),
+        "inserted": len(insert),
+        "deleted": len(delete),
+    }
+
+
+def prune_documents(conn, keep_doc_ids):
+    """Delete documents (and their chunks) whose doc_id is not in keep_doc_ids."""
+    keep_doc_ids = list(keep_doc_ids)
+    with transaction(conn) as cur:
+        cur.execute("""
+            DELETE FROM policy_chunks
+            WHERE document_id <> ALL(%s::text[])
+        """, (keep_doc_ids,))
+        chunks_deleted = cur.rowcount
+        cur.execute("""
+            DELETE FROM policy_documents
+            WHERE doc_id <> ALL(%s::text[])
+        """, (keep_doc_ids,))
+        return {"documents_deleted": cur.rowcount, "chunks_deleted": chunks_deleted}
+
+
+def sync_documents(conn, documents, chunk_fn, embed_fn, prune=False):
+    """Incrementally sync a corpus of {"metadata", "content"} documents.
+
+    chunk_fn(document) returns the document's chunk dicts. Documents whose
+    hash matches the stored one and that have stored chunks are skipped
+    without chunking or embedding.
+    With prune=True, stored documents missing from the corpus are deleted.
+    """
+    with conn.cursor() as cur:
+        stored = stored_document_hashes(cur)
+
+    totals = {"documents_skipped": 0, "documents_synced": 0,
+              "unchanged": 0, "updated": 0, "inserted": 0, "deleted": 0}
+    seen = set()
+    for doc in documents:
+        doc_id = doc["metadata"].get("doc_id", "unknown")
+        if doc_id in seen:
+            continue
+        seen.add(doc_id)
+        digest = document_hash(doc["metadata"], doc["content"])
+        if stored.get(doc_id) == digest:
+            totals["documents_skipped"] += 1
+            continue
+
+        metadata = with_hash({**doc["metadata"], "doc_id": doc_id}, digest)
+        counts = sync_document(conn, metadata, chunk_fn(doc), embed_fn)
+        for key, value in counts.items():
+            totals[key] += value
+        totals["documents_synced"] += 1
+        print(f"  Synced {doc_id}: {counts}")
+
+    if prune:
+        totals.update(prune_documents(conn, seen))
+    return totals
@@ -0,0 +1,236 @@
+"""
+Deferred, parallel index builds for bulk ingestion.
+
+Every row inserted into a table with an HNSW index pays to be linked into the
+graph one at a time, which makes a full re-ingest far slower than loading the
+rows and building the graph once at the end. deferred_indexes() drops the
+HNSW and GIN indexes on a table, lets the caller load data, then recreates
+them from their original definitions with a larger maintenance_work_mem and
+parallel maintenance workers. Build progress is read from
+pg_stat_progress_create_index on a second connection and printed as it runs.
+
+Usage:
+    if is_bulk_load(cur, "policy_chunks", len(chunks)):
+        with deferred_indexes(conn, monitor_config=DB_CONFIG):
+            load(chunks)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import sql
+
+DEFAULT_DEFERRED_METHODS = ("hnsw", "gin")
+DEFAULT_MAINTENANCE_WORK_MEM = "512MB"
+DEFAULT_PARALLEL_WORKERS = 4
+# A load counts as bulk when it adds at least this fraction of the table's rows.
+DEFAULT_BULK_RATIO = 0.3
+PROGRESS_INTERVAL_SECONDS = 2.0
+
+
+def estimated_rows(cursor, table):
+    """Return the planner's row estimate for table (0 if never analyzed)."""
+    cursor.execute("SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cursor.fetchone()
+    return max(int(row[0]), 0) if row else 0
+
+
+def is_bulk_load(cursor, table, incoming_rows, ratio=DEFAULT_BULK_RATIO):
+    """Decide whether loading incoming_rows into table should defer its indexes.
+
+    True when the table is empty or the load adds at least `ratio` times its
+    current size; rebuilding is then cheaper than incremental maintenance.
+    """
+    existing = estimated_rows(cursor, table)
+    if existing == 0:
+        cursor.execute(
+            sql.SQL("SELECT EXISTS (SELECT 1 FROM {})").format(sql.Identifier(table))
+        )
+        if not cursor.fetchone()[0]:
+            return incoming_rows > 0
+    return incoming_rows >= ratio * max(existing, 1)
+
+
+def find_indexes(cursor, table, methods=DEFAULT_DEFERRED_METHODS):
+    """Return [(index_name, index_definition)] for table's indexes using methods."""
+    cursor.execute("""
+        SELECT i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_am am ON am.oid = i.relam
+        WHERE x.indrelid = to_regclass(%s)
+          AND am.amname = ANY(%s)
+          AND NOT x.indisprimary
+          AND NOT x.indisunique
+        ORDER BY i.relname
+    """, (table, list(methods)))
+    return cursor.fetchall()
+
+
+class ProgressMonitor(threading.Thread):
+    """Polls pg_stat_progress_create_index for one backend from its own connection."""
+
+    def __init__(self, db_config, backend_pid, interval=PROGRESS_INTERVAL_SECONDS):
+        super().__init__(daemon=True)
+        self.db_config = db_config
+        self.backend_pid = backend_pid
+        self.interval = interval
+        self.index_name = None
+        self._stop_event = threading.Event()
+
+    def run(self):
+        try:
+            conn = psycopg2.connect(**self.db_config)
+        except psycopg2.Error as e:
+            print(f"  (index build progress unavailable: {e})")
+            return
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cur:
+                while not self._stop_event.wait(self.interval):
+                    cur.execute("""
+                        SELECT phase, blocks_done, blocks_total, tuples_done, tuples_total
+                        FROM pg_stat_progress_create_index
+                        WHERE pid = %s
+                    """, (self.backend_pid,))
+                    row = cur.fetchone()
+                    if row:
+                        print(f"  [{self.index_name}] {format_progress(*row)}")
+        finally:
+            conn.close()
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def format_progress(phase, blocks_done, blocks_total, tuples_done, tuples_total):
+    """Render one pg_stat_progress_create_index row as a short status line."""
+    if tuples_total:
+        return f"{phase}: {tuples_done}/{tuples_total} tuples ({100 * tuples_done / tuples_total:.0f}%)"
+    if blocks_total:
+        return f"{phase}: {blocks_done}/{blocks_total} blocks ({100 * blocks_done / blocks_total:.0f}%)"
+    return phase
+
+
+def rebuild_indexes(conn, definitions, maintenance_work_mem=DEFAULT_MAINTENANCE_WORK_MEM,
+                    parallel_workers=DEFAULT_PARALLEL_WORKERS, monitor_config=None,
+                    timings=None):
+    """Create each (name, definition) index with tuned build settings.
+
+    With monitor_config set, a second connection reports build progress.
+    Returns {index_name: build_seconds}, filled into timings if given, so a
+    caller can tell which indexes were built before a failure.
+    """
+    timings = {} if timings is None else timings
+    monitor = None
+    if monitor_config is not None:
+        monitor = ProgressMonitor(monitor_config, conn.get_backend_pid())
+        monitor.start()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+            cur.execute("SET max_parallel_maintenance_workers = %s", (parallel_workers,))
+            for name, definition in definitions:
+                if monitor is not None:
+                    monitor.index_name = name
+                print(f"  Building {name}...")
+                started = time.perf_counter()
+                cur.execute(definition)
+                if not conn.autocommit:
+                    conn.commit()
+                timings[name] = round(time.perf_counter() - started, 2)
+                print(f"  Built {name} in {timings[name]}s")
+    finally:
+        try:
+            _reset_build_settings(conn)
+        finally:
+            if monitor is not None:
+                monitor.stop()
+    return timings
+
+
+def _reset_build_settings(conn):
+    """Restore the session's index build settings after rebuild_indexes()."""
+    try:
+        if not conn.autocommit:
+            # Leave any transaction aborted by a failed CREATE INDEX first.
+            conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute("RESET maintenance_work_mem")
+            cur.execute("RESET max_parallel_maintenance_workers")
+        if not conn.autocommit:
+            conn.commit()
+    except psycopg2.Error:
+        # A broken connection takes its session settings with it; keep the
+        # original error.
+        pass
+
+
+@contextmanager
+def deferred_indexes(conn, table="policy_chunks", methods=DEFAULT_DEFERRED_METHODS,
+                     maintenance_work_mem=DEFAULT_MAINTENANCE_WORK_MEM,
+                     parallel_workers=DEFAULT_PARALLEL_WORKERS, monitor_config=None):
+    """Drop table's HNSW/GIN indexes for the duration of a bulk load.
+
+    The indexes are rebuilt from their original definitions when the block
+    exits, including when it raises an Exception, so the table is not left
+    unindexed. The block's exception is re-raised even when the rebuild
+    fails too; the rebuild error is printed with the definitions to re-run.
+    On KeyboardInterrupt or SystemExit nothing is rebuilt, and the pending
+    definitions are printed instead, as they are when the rebuild itself is
+    interrupted. Yields a dict that receives the per-index build timings.
+    """
+    with conn.cursor() as cur:
+        definitions = find_indexes(cur, table, methods)
+        for name, _ in definitions:
+            cur.execute(sql.SQL("DROP INDEX IF EXISTS {}").format(sql.Identifier(name)))
+    if not conn.autocommit:
+        conn.commit()
+    if definitions:
+        print(f"  Deferred {len(definitions)} index(es) on {table}: "
+              f"{', '.join(name for name, _ in definitions)}")
+
+    result = {"indexes": [name for name, _ in definitions], "timings": {}}
+
+    def print_pending(message):
+        print(f"  {message}. Indexes still to create on {table}:")
+        for name, definition in definitions:
+            if name not in result["timings"]:
+                print(f"    {definition};")
+
+    def rebuild():
+        try:
+            rebuild_indexes(
+                conn, definitions,
+                maintenance_work_mem=maintenance_work_mem,
+                parallel_workers=parallel_workers,
+                monitor_config=monitor_config,
+                timings=result["timings"],
+            )
+        except (KeyboardInterrupt, SystemExit):
+            print_pending("Index rebuild interrupted")
+            raise
+
+    try:
+        yield result
+    except Exception:
+        try:
+            if not conn.autocommit:
+                conn.rollback()
+            rebuild()
+        except Exception as rebuild_error:
+            # Keep the load's exception; report what still needs rebuilding.
+            print_pending(f"Rebuilding indexes failed after the load failed: {rebuild_error}")
+        raise
+    except (KeyboardInterrupt, SystemExit):
+        # Don't start a long rebuild the user is trying to stop.
+        if definitions:
+            print_pending("Load interrupted; indexes were not rebuilt")
+        raise
+    else:
+        if not conn.autocommit:
+            conn.commit()
+        rebuild()
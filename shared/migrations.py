@@ -0,0 +1,326 @@
+"""
+Idempotent schema migrations for existing PolicyChat databases.
+
+shared/postgres/schema.sql (mirrored in reset_db.py) always describes the
+current schema, but the Postgres container only runs it on first start.
+ensure_schema() brings a database created from an older schema up to date.
+Each migration is written to be safe to re-run and is recorded in
+schema_migrations once applied, so calling ensure_schema() on every run only
+costs one query.
+
+Usage:
+    python shared/migrations.py          # migrate the lab database
+    ensure_schema(conn)                  # from an ingestion script
+"""
+
+import psycopg2
+
+DB_CONFIG = {
+    "dbname": "pgvector",
+    "user": "postgres",
+    "password": "postgres",
+    "host": "localhost",
+    "port": "5050",
+}
+
+# Document fields copied onto every chunk so searches can filter and display
+# them without joining policy_documents.
+DENORMALIZE_DOCUMENT_FIELDS = """
+ALTER TABLE policy_documents
+    ADD COLUMN IF NOT EXISTS effective_date DATE,
+    ADD COLUMN IF NOT EXISTS regulatory_body TEXT;
+
+ALTER TABLE policy_chunks
+    ADD COLUMN IF NOT EXISTS doc_title TEXT,
+    ADD COLUMN IF NOT EXISTS doc_type TEXT,
+    ADD COLUMN IF NOT EXISTS regulatory_body TEXT,
+    ADD COLUMN IF NOT EXISTS effective_date DATE;
+
+CREATE INDEX IF NOT EXISTS idx_policy_chunks_document_id
+    ON policy_chunks (document_id);
+CREATE INDEX IF NOT EXISTS idx_policy_chunks_doc_type
+    ON policy_chunks (doc_type);
+CREATE INDEX IF NOT EXISTS idx_policy_chunks_regulatory_body
+    ON policy_chunks (regulatory_body);
+CREATE INDEX IF NOT EXISTS idx_policy_chunks_effective_date
+    ON policy_chunks (effective_date);
+
+CREATE OR REPLACE FUNCTION policy_chunks_copy_document_fields() RETURNS trigger AS $$
+BEGIN
+    SELECT d.title, d.doc_type, d.regulatory_body, d.effective_date
+    INTO NEW.doc_title, NEW.doc_type, NEW.regulatory_body, NEW.effective_date
+    FROM policy_documents d
+    WHERE d.doc_id = NEW.document_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_policy_chunks_document_fields ON policy_chunks;
+CREATE TRIGGER trg_policy_chunks_document_fields
+    BEFORE INSERT OR UPDATE OF document_id ON policy_chunks
+    FOR EACH ROW EXECUTE FUNCTION policy_chunks_copy_document_fields();
+
+CREATE OR REPLACE FUNCTION policy_documents_sync_chunks() RETURNS trigger AS $$
+BEGIN
+    UPDATE policy_chunks
+    SET doc_title = NEW.title,
+        doc_type = NEW.doc_type,
+        regulatory_body = NEW.regulatory_body,
+        effective_date = NEW.effective_date
+    WHERE document_id = NEW.doc_id
+      AND (doc_title, doc_type, regulatory_body, effective_date)
+          IS DISTINCT FROM (NEW.title, NEW.doc_type, NEW.regulatory_body, NEW.effective_date);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_policy_documents_sync_chunks ON policy_documents;
+CREATE TRIGGER trg_policy_documents_sync_chunks
+    AFTER INSERT OR UPDATE OF title, doc_type, regulatory_body, effective_date
+    ON policy_documents
+    FOR EACH ROW EXECUTE FUNCTION policy_documents_sync_chunks();
+
+UPDATE policy_chunks pc
+SET doc_title = d.title,
+    doc_type = d.doc_type,
+    regulatory_body = d.regulatory_body,
+    effective_date = d.effective_date
+FROM policy_documents d
+WHERE d.doc_id = pc.document_id
+  AND (pc.doc_title, pc.doc_type, pc.regulatory_body, pc.effective_date)
+      IS DISTINCT FROM (d.title, d.doc_type, d.regulatory_body, d.effective_date);
+"""
+
+# Full-text column for hybrid search. Tables created without it get the
+# generated form; an existing plain column is left for
+# search_vector.backfill_search_vectors() to fill.
+ADD_SEARCH_VECTOR = """
+ALTER TABLE policy_chunks
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_policy_chunks_search_vector
+    ON policy_chunks USING gin (search_vector);
+"""
+
+# Lab 11 regulatory updates, indexed like policy_chunks. Tables created by
+# older capstone runs gain the new columns, and affects is copied out of
+# metadata.
+REGULATORY_UPDATES_SCHEMA = """
+CREATE TABLE IF NOT EXISTS regulatory_updates (
+    id SERIAL PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    title TEXT,
+    effective_date DATE,
+    regulatory_body TEXT,
+    update_type TEXT,
+    affects TEXT[] NOT NULL DEFAULT '{}',
+    content TEXT NOT NULL,
+    embedding vector(1024),
+    metadata JSONB,
+    search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+ALTER TABLE regulatory_updates
+    ADD COLUMN IF NOT EXISTS affects TEXT[] NOT NULL DEFAULT '{}',
+    ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+    ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+UPDATE regulatory_updates
+SET affects = ARRAY(SELECT jsonb_array_elements_text(metadata->'affects'))
+WHERE affects = '{}' AND jsonb_typeof(metadata->'affects') = 'array';
+
+CREATE INDEX IF NOT EXISTS idx_regulatory_updates_embedding
+    ON regulatory_updates USING hnsw (embedding vector_cosine_ops);
+CREATE INDEX IF NOT EXISTS idx_regulatory_updates_search_vector
+    ON regulatory_updates USING gin (search_vector);
+CREATE INDEX IF NOT EXISTS idx_regulatory_updates_affects
+    ON regulatory_updates USING gin (affects);
+CREATE INDEX IF NOT EXISTS idx_regulatory_updates_metadata
+    ON regulatory_updates USING gin (metadata);
+CREATE INDEX IF NOT EXISTS idx_regulatory_updates_doc_id
+    ON regulatory_updates (doc_id);
+CREATE INDEX IF NOT EXISTS idx_regulatory_updates_regulatory_body
+    ON regulatory_updates (regulatory_body);
+"""
+
+# Insert timestamps on chunks, used by the in-memory retriever as a refresh
+# watermark. Existing rows get the time of the migration.
+CHUNK_CREATED_AT = """
+ALTER TABLE policy_chunks
+    ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_policy_chunks_created_at
+    ON policy_chunks (created_at);
+"""
+
+# Corpus generation counter, bumped by triggers on every write to the
+# searchable tables. Search result caches key entries by it, so a committed
+# load makes every older entry unreachable. These statement-level triggers
+# are replaced by deferred ones in 0007.
+CORPUS_GENERATION = """
+CREATE TABLE IF NOT EXISTS corpus_generation (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    -- Seeded from the clock so a recreated table never repeats old values
+    generation BIGINT NOT NULL
+        DEFAULT (extract(epoch FROM clock_timestamp()) * 1000000)::bigint,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO corpus_generation (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_corpus_generation() RETURNS trigger AS $$
+BEGIN
+    UPDATE corpus_generation
+    SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_policy_chunks_corpus_generation ON policy_chunks;
+CREATE TRIGGER trg_policy_chunks_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON policy_chunks
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+
+DROP TRIGGER IF EXISTS trg_policy_documents_corpus_generation ON policy_documents;
+CREATE TRIGGER trg_policy_documents_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON policy_documents
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+
+DROP TRIGGER IF EXISTS trg_regulatory_updates_corpus_generation ON regulatory_updates;
+CREATE TRIGGER trg_regulatory_updates_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON regulatory_updates
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+"""
+
+# Update timestamps on chunks, so the in-memory retriever also picks up rows
+# changed in place (enrichment, re-synced headings, copied document fields).
+CHUNK_UPDATED_AT = """
+ALTER TABLE policy_chunks
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+
+CREATE OR REPLACE FUNCTION policy_chunks_set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_policy_chunks_updated_at ON policy_chunks;
+CREATE TRIGGER trg_policy_chunks_updated_at
+    BEFORE UPDATE ON policy_chunks
+    FOR EACH ROW EXECUTE FUNCTION policy_chunks_set_updated_at();
+
+CREATE INDEX IF NOT EXISTS idx_policy_chunks_changed_at
+    ON policy_chunks ((GREATEST(created_at, updated_at)));
+"""
+
+# Bump the corpus generation at commit instead of after every statement. The
+# counter row is then locked only between a writer's last statement and its
+# commit, so writers no longer hold it while they take other row locks (which
+# could deadlock) and parallel backfill workers are not serialized. The bump
+# still commits atomically with the data it describes.
+DEFER_CORPUS_GENERATION = """
+CREATE OR REPLACE FUNCTION bump_corpus_generation() RETURNS trigger AS $$
+BEGIN
+    -- Deferred row triggers fire for every changed row at commit; bump once.
+    IF current_setting('policychat.corpus_generation_bumped', true)
+            IS DISTINCT FROM 'on' THEN
+        UPDATE corpus_generation
+        SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP;
+        PERFORM set_config('policychat.corpus_generation_bumped', 'on', true);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_policy_chunks_corpus_generation ON policy_chunks;
+CREATE CONSTRAINT TRIGGER trg_policy_chunks_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE ON policy_chunks
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_corpus_generation();
+
+DROP TRIGGER IF EXISTS trg_policy_chunks_corpus_generation_truncate ON policy_chunks;
+CREATE TRIGGER trg_policy_chunks_corpus_generation_truncate
+    AFTER TRUNCATE ON policy_chunks
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+
+DROP TRIGGER IF EXISTS trg_policy_documents_corpus_generation ON policy_documents;
+CREATE CONSTRAINT TRIGGER trg_policy_documents_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE ON policy_documents
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_corpus_generation();
+
+DROP TRIGGER IF EXISTS trg_policy_documents_corpus_generation_truncate ON policy_documents;
+CREATE TRIGGER trg_policy_documents_corpus_generation_truncate
+    AFTER TRUNCATE ON policy_documents
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+
+DROP TRIGGER IF EXISTS trg_regulatory_updates_corpus_generation ON regulatory_updates;
+CREATE CONSTRAINT TRIGGER trg_regulatory_updates_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE ON regulatory_updates
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_corpus_generation();
+
+DROP TRIGGER IF EXISTS trg_regulatory_updates_corpus_generation_truncate ON regulatory_updates;
+CREATE TRIGGER trg_regulatory_updates_corpus_generation_truncate
+    AFTER TRUNCATE ON regulatory_updates
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+"""
+
+MIGRATIONS = [
+    ("0001_denormalize_document_fields", DENORMALIZE_DOCUMENT_FIELDS),
+    ("0002_add_search_vector", ADD_SEARCH_VECTOR),
+    ("0003_regulatory_updates", REGULATORY_UPDATES_SCHEMA),
+    ("0004_chunk_created_at", CHUNK_CREATED_AT),
+    ("0005_corpus_generation", CORPUS_GENERATION),
+    ("0006_chunk_updated_at", CHUNK_UPDATED_AT),
+    ("0007_defer_corpus_generation", DEFER_CORPUS_GENERATION),
+]
+
+
+def ensure_schema(conn):
+    """Apply any migrations not yet recorded in schema_migrations.
+
+    Each migration runs in its own transaction. Returns the names applied.
+    """
+    autocommit = conn.autocommit
+    if autocommit:
+        conn.autocommit = False
+    applied = []
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS schema_migrations (
+                        name TEXT PRIMARY KEY,
+                        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cur.execute("SELECT name FROM schema_migrations")
+                done = {row[0] for row in cur.fetchall()}
+
+        for name, sql in MIGRATIONS:
+            if name in done:
+                continue
+            with conn:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute("INSERT INTO schema_migrations (name) VALUES (%s)", (name,))
+            applied.append(name)
+    finally:
+        if autocommit:
+            conn.autocommit = True
+    return applied
+
+
+if __name__ == "__main__":
+    conn = psycopg2.connect(**DB_CONFIG)
+    applied = ensure_schema(conn)
+    conn.close()
+    if applied:
+        print(f"Applied migrations: {', '.join(applied)}")
+    else:
+        print("Schema is up to date.")
@@ -0,0 +1,137 @@
+"""
+Shared Ollama client for embedding and chat calls.
+
+A single OllamaClient owns a pooled requests.Session, so repeated calls reuse
+keep-alive connections instead of opening a new TCP connection per request.
+Every call has connect/read timeouts, and failed requests are retried with
+exponential backoff on 5xx responses and connection resets.
+
+Usage:
+    from ollama_client import get_client
+
+    client = get_client()
+    vectors = client.embed(["first text", "second text"])
+    answer = client.chat([{"role": "user", "content": "Hello"}])
+"""
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+EMBED_MODEL = "bge-m3"
+CHAT_MODEL = "llama3.2"
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 120
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.5
+DEFAULT_EMBED_BATCH_SIZE = 32
+
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+
+
+class OllamaClient:
+    """Pooled, retrying HTTP client for the Ollama embed and chat endpoints."""
+
+    def __init__(
+        self,
+        base_url=OLLAMA_BASE_URL,
+        embed_model=EMBED_MODEL,
+        chat_model=CHAT_MODEL,
+        pool_size=DEFAULT_POOL_SIZE,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
+        max_retries=DEFAULT_MAX_RETRIES,
+        backoff_factor=DEFAULT_BACKOFF_FACTOR,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.embed_model = embed_model
+        self.chat_model = chat_model
+        self.timeout = (connect_timeout, read_timeout)
+
+        # Both embed and chat are safe to repeat, so POST is retried too.
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset(["GET", "POST"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _post(self, path, payload):
+        response = self.session.post(
+            f"{self.base_url}{path}", json=payload, timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def embed(self, texts, batch_size=DEFAULT_EMBED_BATCH_SIZE):
+        """Embed a list of texts, batch_size texts per request.
+
+        Returns one embedding per input text, in input order.
+        """
+        texts = list(texts)
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            batch = texts[start:start + batch_size]
+            result = self._post("/api/embed", {"model": self.embed_model, "input": batch})
+            batch_embeddings = result["embeddings"]
+            if len(batch_embeddings) != len(batch):
+                raise ValueError(
+                    f"Expected {len(batch)} embeddings from Ollama, "
+                    f"got {len(batch_embeddings)}"
+                )
+            embeddings.extend(batch_embeddings)
+        return embeddings
+
+    def embed_one(self, text):
+        """Embed a single text and return its vector."""
+        result = self._post("/api/embed", {"model": self.embed_model, "input": text})
+        return result["embeddings"][0]
+
+    def chat(self, messages, model=None):
+        """Send a non-streaming chat request and return the reply text."""
+        result = self._post("/api/chat", {
+            "model": model or self.chat_model,
+            "messages": messages,
+            "stream": False,
+        })
+        return result["message"]["content"]
+
+    def close(self):
+        self.session.close()
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide OllamaClient, creating it on first use."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = OllamaClient()
+    return _default_client
+
+
+if __name__ == "__main__":
+    client = get_client()
+    vectors = client.embed(["Know your customer", "Anti-money laundering"])
+    print(f"Embedded {len(vectors)} texts ({len(vectors[0])} dimensions)")
@@ -0,0 +1,89 @@
+"""
+NumPy <-> pgvector transport for psycopg2.
+
+Registering the adapter lets queries pass NumPy float32 arrays straight to
+psycopg2 and get `vector` columns back as NumPy arrays, instead of building
+and parsing "[0.1, 0.2, ...]" strings by hand with str() or json.dumps().
+
+psycopg2 only sends query parameters as text, so arrays are rendered with a
+single printf-style call at float32 precision ("%.9g" round-trips float32)
+and parsed back with np.fromstring. The pgvector binary wire format is used
+where psycopg2 does support binary data: COPY ... (FORMAT binary), via
+encode_vector_binary.
+
+Bind a query vector once and order by its alias, so the text is sent once:
+
+    cur.execute(
+        "SELECT content, embedding <=> %s AS distance "
+        "FROM policy_chunks ORDER BY distance LIMIT %s",
+        (to_vector(query_embedding), top_k),
+    )
+"""
+
+import struct
+
+import numpy as np
+from psycopg2.extensions import new_type, register_adapter, register_type
+
+_HEADER = struct.Struct(">HH")
+_vector_oid = None
+
+
+def to_vector(values):
+    """Return values as a 1-D float32 NumPy array suitable for binding."""
+    return np.asarray(values, dtype=np.float32).reshape(-1)
+
+
+class VectorAdapter:
+    """psycopg2 adapter that renders a float32 array as a vector literal."""
+
+    _formats = {}
+
+    def __init__(self, array):
+        self.array = array
+
+    def getquoted(self):
+        values = self.array.astype(np.float32, copy=False).ravel().tolist()
+        fmt = self._formats.get(len(values))
+        if fmt is None:
+            fmt = ",".join(["%.9g"] * len(values))
+            self._formats[len(values)] = fmt
+        literal = fmt % tuple(values) if values else ""
+        return f"'[{literal}]'::vector".encode("ascii")
+
+
+def parse_vector(value, cursor=None):
+    """Typecaster for the vector type: "[1,2,3]" -> float32 array."""
+    if value is None:
+        return None
+    return np.fromstring(value[1:-1], dtype=np.float32, sep=",")
+
+
+def encode_vector_binary(values):
+    """Encode a vector in pgvector's binary format (vector_recv).
+
+    Layout: int16 dimensions, int16 unused, then big-endian float32 values.
+    """
+    array = to_vector(values)
+    return _HEADER.pack(array.shape[0], 0) + array.astype(">f4").tobytes()
+
+
+def register_vector(conn):
+    """Register the NumPy adapter and vector typecaster on a connection.
+
+    The vector type's OID is looked up once per process and reused.
+    Connections to a database without the vector extension are left as is.
+    """
+    global _vector_oid
+    register_adapter(np.ndarray, VectorAdapter)
+
+    if _vector_oid is None:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regtype('vector')::oid")
+            _vector_oid = cur.fetchone()[0]
+        if _vector_oid is None:
+            return conn
+
+    vector_type = new_type((_vector_oid,), "VECTOR", parse_vector)
+    register_type(vector_type, conn)
+    return conn
@@ -27,7 +27,13 @@ CREATE TABLE policy_chunks (
     embedding vector(1024),
     metadata JSONB,
     search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    -- Copied from policy_documents by triggers so searches need no JOIN
+    doc_title TEXT,
+    doc_type TEXT,
+    regulatory_body TEXT,
+    effective_date DATE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP
 );
 
 -- HNSW index for fast approximate nearest-neighbour search on embeddings
@@ -57,3 +63,167 @@ CREATE INDEX idx_policy_documents_doc_type
 -- B-tree index for filtering documents by regulatory body
 CREATE INDEX idx_policy_documents_regulatory_body
     ON policy_documents (regulatory_body);
+
+-- B-tree indexes for filtering chunks by their document fields
+CREATE INDEX idx_policy_chunks_document_id
+    ON policy_chunks (document_id);
+
+CREATE INDEX idx_policy_chunks_doc_type
+    ON policy_chunks (doc_type);
+
+CREATE INDEX idx_policy_chunks_regulatory_body
+    ON policy_chunks (regulatory_body);
+
+CREATE INDEX idx_policy_chunks_effective_date
+    ON policy_chunks (effective_date);
+
+-- B-tree indexes for reading chunks added or changed since a point in time
+CREATE INDEX idx_policy_chunks_created_at
+    ON policy_chunks (created_at);
+
+CREATE INDEX idx_policy_chunks_changed_at
+    ON policy_chunks ((GREATEST(created_at, updated_at)));
+
+-- Fill a chunk's document fields from its parent document on insert
+CREATE OR REPLACE FUNCTION policy_chunks_copy_document_fields() RETURNS trigger AS $$
+BEGIN
+    SELECT d.title, d.doc_type, d.regulatory_body, d.effective_date
+    INTO NEW.doc_title, NEW.doc_type, NEW.regulatory_body, NEW.effective_date
+    FROM policy_documents d
+    WHERE d.doc_id = NEW.document_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_policy_chunks_document_fields
+    BEFORE INSERT OR UPDATE OF document_id ON policy_chunks
+    FOR EACH ROW EXECUTE FUNCTION policy_chunks_copy_document_fields();
+
+-- Record when a chunk was last updated in place
+CREATE OR REPLACE FUNCTION policy_chunks_set_updated_at() RETURNS trigger AS $$
+BEGIN
+    NEW.updated_at = CURRENT_TIMESTAMP;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_policy_chunks_updated_at
+    BEFORE UPDATE ON policy_chunks
+    FOR EACH ROW EXECUTE FUNCTION policy_chunks_set_updated_at();
+
+-- Push document field changes down to the document's chunks
+CREATE OR REPLACE FUNCTION policy_documents_sync_chunks() RETURNS trigger AS $$
+BEGIN
+    UPDATE policy_chunks
+    SET doc_title = NEW.title,
+        doc_type = NEW.doc_type,
+        regulatory_body = NEW.regulatory_body,
+        effective_date = NEW.effective_date
+    WHERE document_id = NEW.doc_id
+      AND (doc_title, doc_type, regulatory_body, effective_date)
+          IS DISTINCT FROM (NEW.title, NEW.doc_type, NEW.regulatory_body, NEW.effective_date);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_policy_documents_sync_chunks
+    AFTER INSERT OR UPDATE OF title, doc_type, regulatory_body, effective_date
+    ON policy_documents
+    FOR EACH ROW EXECUTE FUNCTION policy_documents_sync_chunks();
+
+-- Regulatory updates ingested by the Lab 11 capstone
+CREATE TABLE regulatory_updates (
+    id SERIAL PRIMARY KEY,
+    doc_id TEXT NOT NULL,
+    title TEXT,
+    effective_date DATE,
+    regulatory_body TEXT,
+    update_type TEXT,
+    affects TEXT[] NOT NULL DEFAULT '{}',
+    content TEXT NOT NULL,
+    embedding vector(1024),
+    metadata JSONB,
+    search_vector tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- HNSW index for nearest-neighbour search on update embeddings
+CREATE INDEX idx_regulatory_updates_embedding
+    ON regulatory_updates
+    USING hnsw (embedding vector_cosine_ops);
+
+-- GIN index on search_vector for full-text search over updates
+CREATE INDEX idx_regulatory_updates_search_vector
+    ON regulatory_updates
+    USING gin (search_vector);
+
+-- GIN index for finding updates by affected policy area
+CREATE INDEX idx_regulatory_updates_affects
+    ON regulatory_updates
+    USING gin (affects);
+
+-- GIN index on update metadata for JSONB queries
+CREATE INDEX idx_regulatory_updates_metadata
+    ON regulatory_updates
+    USING gin (metadata);
+
+-- B-tree indexes for looking up and filtering updates
+CREATE INDEX idx_regulatory_updates_doc_id
+    ON regulatory_updates (doc_id);
+
+CREATE INDEX idx_regulatory_updates_regulatory_body
+    ON regulatory_updates (regulatory_body);
+
+-- Corpus generation, bumped once by every transaction that writes to the
+-- searchable tables, so search result caches never serve results from
+-- before a load. The row triggers are deferred to commit, so the counter row
+-- is locked only while the writer commits.
+CREATE TABLE corpus_generation (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    -- Seeded from the clock so a recreated table never repeats old values
+    generation BIGINT NOT NULL
+        DEFAULT (extract(epoch FROM clock_timestamp()) * 1000000)::bigint,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO corpus_generation (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_corpus_generation() RETURNS trigger AS $$
+BEGIN
+    -- Deferred row triggers fire for every changed row at commit; bump once.
+    IF current_setting('policychat.corpus_generation_bumped', true)
+            IS DISTINCT FROM 'on' THEN
+        UPDATE corpus_generation
+        SET generation = generation + 1, updated_at = CURRENT_TIMESTAMP;
+        PERFORM set_config('policychat.corpus_generation_bumped', 'on', true);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE CONSTRAINT TRIGGER trg_policy_chunks_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE ON policy_chunks
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE TRIGGER trg_policy_chunks_corpus_generation_truncate
+    AFTER TRUNCATE ON policy_chunks
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE CONSTRAINT TRIGGER trg_policy_documents_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE ON policy_documents
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE TRIGGER trg_policy_documents_corpus_generation_truncate
+    AFTER TRUNCATE ON policy_documents
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE CONSTRAINT TRIGGER trg_regulatory_updates_corpus_generation
+    AFTER INSERT OR UPDATE OR DELETE ON regulatory_updates
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION bump_corpus_generation();
+
+CREATE TRIGGER trg_regulatory_updates_corpus_generation_truncate
+    AFTER TRUNCATE ON regulatory_updates
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_generation();
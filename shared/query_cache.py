@@ -0,0 +1,160 @@
+"""
+In-memory LRU cache of query embeddings for the search path.
+
+Search endpoints embed the user's query on every request, and the same
+compliance questions come up again and again. QueryEmbeddingCache sits in
+front of the embedding call. The cache key is the normalized query
+(whitespace collapsed, case folded), so "What are the KYC requirements?" and
+"what are the  KYC requirements? " share one entry. The model always embeds
+the query as the user wrote it, though. The first spelling seen fills the
+entry, and later variants reuse its embedding until the entry expires.
+Entries expire after ttl seconds, and the least recently used entry is
+evicted past max_entries.
+
+One instance is safe to share between Flask worker threads. To share
+embeddings between processes as well, pass an EmbeddingCache as l2. Misses
+in memory then check its SQLite file before calling the model, and new
+embeddings are written to it. They are stored under their own model name,
+so an entry keyed by normalized text is never mistaken for the embedding of
+that exact text during ingestion. The SQLite tier is bounded by its own
+max_entries rather than by ttl.
+
+Cached embeddings are shared by every caller; treat them as read-only.
+
+Usage:
+    QUERY_CACHE = QueryEmbeddingCache(max_entries=1024, ttl=3600)
+    embedding = QUERY_CACHE.get(query, get_embedding)   # get_embedding(text) -> vector
+    print(QUERY_CACHE.stats())
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from embedding_cache import DEFAULT_MODEL
+
+# EmbeddingCache model name for query embeddings keyed by normalized text.
+DEFAULT_L2_MODEL = f"{DEFAULT_MODEL}:normalized-query"
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL_SECONDS = 3600
+
+
+def normalize_query(text):
+    """Collapse runs of whitespace, trim and case-fold a query."""
+    return " ".join(text.split()).casefold()
+
+
+class TTLCache:
+    """Thread-safe mapping with per-entry expiry and least-recently-used eviction."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        # key -> (expires_at, value), least recently used first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the live value for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used past max_entries."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Return hit/miss counters, the hit rate and the number of entries."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.expired = 0
+
+
+class QueryEmbeddingCache:
+    """TTL + LRU cache from normalized query text to embedding."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS,
+                 l2=None, model=DEFAULT_L2_MODEL):
+        self.memory = TTLCache(max_entries, ttl)
+        self.l2 = l2
+        self.model = model
+        self.l2_hits = 0
+        self._lock = threading.Lock()
+
+    def get(self, query, embed_fn):
+        """Return the embedding for query, calling embed_fn(query) only on a miss.
+
+        embed_fn receives query unchanged; only the lookup is normalized.
+        Concurrent misses for the same key may each call it; the last result
+        is kept.
+        """
+        key = normalize_query(query)
+        embedding = self.memory.get(key)
+        if embedding is not None:
+            return embedding
+
+        if self.l2 is not None:
+            embedding = self.l2.get_many([key], model=self.model)[0]
+            if embedding is not None:
+                with self._lock:
+                    self.l2_hits += 1
+                self.memory.put(key, embedding)
+                return embedding
+
+        embedding = embed_fn(query)
+        if self.l2 is not None:
+            self.l2.put_many([key], [embedding], model=self.model)
+        self.memory.put(key, embedding)
+        return embedding
+
+    def stats(self):
+        """Return hit/miss counters, the hit rate and the number of entries.
+
+        hits are served from memory, l2_hits from the SQLite tier, and misses
+        called the model.
+        """
+        stats = self.memory.stats()
+        l2_hits = self.l2_hits
+        lookups = stats["hits"] + stats["misses"]
+        stats["misses"] -= l2_hits
+        stats["l2_hits"] = l2_hits
+        stats["hit_rate"] = (stats["hits"] + l2_hits) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drop every in-memory entry and reset the counters."""
+        self.memory.clear()
+        with self._lock:
+            self.l2_hits = 0
@@ -0,0 +1,82 @@
+"""
+Search result cache that is invalidated by writes to the corpus.
+
+A repeated search costs an embedding plus a vector query, even though
+policy_chunks rarely changes between two identical questions.
+SearchResultCache keeps recent results in memory, keyed by (normalized query,
+filters, top_k, version). The version comes from the corpus_generation table.
+Deferred triggers bump that counter once, at commit, for every transaction
+that writes policy_chunks, policy_documents or regulatory_updates, including
+ingestion, Lab 07 enrichment and capstone update loads. Once a load commits,
+every entry cached before it has an outdated key and is never served again.
+Read the version before searching, so results are never filed under a newer
+generation than the data they came from.
+
+Without the counter table (migrations not yet applied), the version is None
+and every search bypasses the cache.
+
+Cached results are shared by every caller; treat them as read-only.
+
+Usage:
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            version = corpus_generation(cur)
+    results, hit = RESULT_CACHE.get_or_search(query, filters, top_k, version, run_search)
+"""
+
+import json
+
+import psycopg2
+
+from query_cache import TTLCache, normalize_query
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 600
+
+
+def corpus_generation(cursor):
+    """Return the current corpus generation, or None if the table is missing.
+
+    Call it at the start of a transaction: a missing table rolls it back.
+    """
+    try:
+        cursor.execute("SELECT generation FROM corpus_generation")
+    except psycopg2.errors.UndefinedTable:
+        cursor.connection.rollback()
+        return None
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def result_key(query, filters, top_k, version):
+    """Build the cache key; empty filter values are dropped, as searches ignore them."""
+    active = {name: value for name, value in (filters or {}).items() if value}
+    return (normalize_query(query), json.dumps(active, sort_keys=True), top_k, version)
+
+
+class SearchResultCache:
+    """TTL + LRU cache of search results keyed by query and corpus version."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.memory = TTLCache(max_entries, ttl)
+
+    def get_or_search(self, query, filters, top_k, version, search_fn):
+        """Return (value, hit), calling search_fn() only when nothing is cached.
+
+        With version None the result of search_fn() is returned uncached.
+        """
+        if version is None:
+            return search_fn(), False
+        key = result_key(query, filters, top_k, version)
+        value = self.memory.get(key)
+        if value is not None:
+            return value, True
+        value = search_fn()
+        self.memory.put(key, value)
+        return value, False
+
+    def stats(self):
+        return self.memory.stats()
+
+    def clear(self):
+        self.memory.clear()
@@ -0,0 +1,401 @@
+"""
+Pluggable policy chunk retrievers: pgvector or in-process.
+
+Both backends take a query embedding, optional filters (doc_type,
+regulatory_body, tag, review_status) and top_k. Both return
+(results, stats), where results are dicts with content, heading, doc_title,
+metadata and score.
+
+PgVectorRetriever runs filtered_vector_search() against Postgres for every
+query. InMemoryRetriever loads policy_chunks into the process once. It keeps
+the embeddings in one contiguous float32 matrix with their inverse lengths,
+plus row-aligned id, doc_type, regulatory_body, review_status and tag arrays
+and the result columns. Each query is then one exact matrix-vector product
+with filtering and argpartition top-k, and needs no database round trip.
+
+The in-memory copy refreshes itself at most every refresh_interval seconds.
+It reads the id and GREATEST(created_at, updated_at) of every live chunk,
+fetches in full only the ids it does not hold or whose change time differs
+from the one it holds, and drops ids that no longer exist. Comparing per row
+rather than against a high-water mark means rows committed late by long
+transactions, whose timestamps are their transaction's start time, are not
+missed. A trigger sets updated_at on every UPDATE, so chunks changed in
+place, such as metadata re-enriched by Lab 07 or document fields copied down
+by the sync triggers, are picked up too.
+
+Given snapshot_path, InMemoryRetriever starts from an export written by
+shared/snapshot.py instead of reading every vector from Postgres. Filtering
+and validation use the snapshot's .npy columns, and a chunk's JSON line is
+only parsed the first time it is returned. Its first refresh then fetches
+only the chunks added or changed since the export. A snapshot whose ids no
+longer match the database (matches_database()) is ignored, and everything
+is loaded from Postgres instead.
+
+Usage:
+    retriever = make_retriever("memory", db_connection)
+    results, stats = retriever.search(query_embedding, {"doc_type": "AML Policy"}, top_k=5)
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+
+from filtered_search import filtered_vector_search
+from similarity import normalize, top_k as top_k_scores
+from snapshot import load_snapshot, matches_database, tag_key
+
+DEFAULT_REFRESH_INTERVAL = 30.0
+_RESULT_SELECT = "pc.content, pc.heading, pc.doc_title, pc.metadata"
+_CHUNK_SELECT = """id, embedding, doc_type, regulatory_body,
+                   content, heading, doc_title, metadata,
+                   GREATEST(created_at, updated_at)"""
+
+
+def filter_conditions(filters, alias="pc"):
+    """Translate a search filters dict into SQL conditions and parameters."""
+    conditions, params = [], []
+    filters = filters or {}
+    if filters.get("doc_type"):
+        conditions.append(f"{alias}.doc_type = %s")
+        params.append(filters["doc_type"])
+    if filters.get("regulatory_body"):
+        conditions.append(f"{alias}.regulatory_body = %s")
+        params.append(filters["regulatory_body"])
+    if filters.get("tag"):
+        conditions.append(f"{alias}.metadata->'tags' @> %s::jsonb")
+        params.append(json.dumps([filters["tag"]]))
+    if filters.get("review_status"):
+        conditions.append(f"{alias}.metadata->>'review_status' = %s")
+        params.append(filters["review_status"])
+    return conditions, params
+
+
+def _result(content, heading, doc_title, metadata, score):
+    return {
+        "content": content,
+        "heading": heading,
+        "score": float(score),
+        "doc_title": doc_title,
+        "metadata": metadata if metadata else {},
+    }
+
+
+class PgVectorRetriever:
+    """Searches policy_chunks in Postgres on every query."""
+
+    backend = "pgvector"
+
+    def __init__(self, connection):
+        # connection() returns a context manager yielding a psycopg2
+        # connection with register_vector applied (e.g. pool.connection).
+        self.connection = connection
+
+    def version(self):
+        """Results depend only on the database, so the version never changes."""
+        return 0
+
+    def search(self, query_embedding, filters=None, top_k=5):
+        conditions, params = filter_conditions(filters)
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                rows, stats = filtered_vector_search(
+                    cur, query_embedding, select=_RESULT_SELECT,
+                    conditions=conditions, params=params, top_k=top_k,
+                )
+        return [_result(*row[1:], 1 - float(row[0])) for row in rows], stats
+
+
+def _inverse_norms(vectors):
+    norms = np.linalg.norm(vectors, axis=1)
+    return np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+
+
+class _ExportRows:
+    """Result columns of a snapshot's rows, parsed from chunks.jsonl on first use."""
+
+    def __init__(self, exported):
+        self.exported = exported
+        self._parsed = {}
+
+    def get(self, index):
+        row = self._parsed.get(index)
+        if row is None:
+            chunk = self.exported.chunk(index)
+            row = (chunk["content"], chunk["heading"], chunk["doc_title"], chunk["metadata"])
+            self._parsed[index] = row
+        return row
+
+
+class _Snapshot:
+    """Immutable, row-aligned arrays for the chunks loaded so far."""
+
+    def __init__(self, ids, vectors, inverse_norms, doc_types, regulatory_bodies,
+                 review_statuses, tags, rows, changed_at, export_rows=None):
+        self.ids = ids
+        # Raw embeddings; scores are scaled by inverse_norms instead of
+        # normalizing, so a float32 snapshot can be searched in place.
+        self.vectors = vectors
+        self.inverse_norms = inverse_norms
+        # Filter columns; "" where the value is missing
+        self.doc_types = doc_types
+        self.regulatory_bodies = regulatory_bodies
+        self.review_statuses = review_statuses
+        self.tags = tags
+        # (content, heading, doc_title, metadata) per row, or the row's index
+        # in export_rows for rows loaded from a snapshot and not yet read
+        self.rows = rows
+        # GREATEST(created_at, updated_at) per row; NaT when unknown
+        self.changed_at = changed_at
+        self.export_rows = export_rows
+
+    @classmethod
+    def empty(cls, dim=0):
+        return cls(np.empty(0, dtype=np.int64), np.empty((0, dim), dtype=np.float32),
+                   np.empty(0, dtype=np.float32), np.empty(0, dtype=object),
+                   np.empty(0, dtype=object), np.empty(0, dtype=object),
+                   np.empty(0, dtype=object), [], np.empty(0, dtype="datetime64[us]"))
+
+    @classmethod
+    def from_export(cls, exported):
+        """Build from an EmbeddingSnapshot loaded by snapshot.load_snapshot().
+
+        Only the row-aligned .npy columns are used; chunks.jsonl lines are
+        parsed when their rows are first returned. A float32 export is
+        searched straight from its memory map. A float16 one is converted to
+        float32 once, since matrix products need it.
+        """
+        embeddings = exported.embeddings
+        if embeddings.dtype != np.float32:
+            embeddings = embeddings.astype(np.float32)
+        return cls(
+            ids=exported.ids,
+            vectors=embeddings,
+            inverse_norms=exported.inverse_norms,
+            doc_types=exported.doc_types,
+            regulatory_bodies=exported.regulatory_bodies,
+            review_statuses=exported.review_statuses,
+            tags=exported.tags,
+            rows=list(range(len(exported))),
+            changed_at=exported.changed_at,
+            export_rows=_ExportRows(exported),
+        )
+
+    def row(self, position):
+        """Return (content, heading, doc_title, metadata) for one row."""
+        row = self.rows[position]
+        return self.export_rows.get(row) if isinstance(row, int) else row
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class InMemoryRetriever:
+    """Exact top-k search over an in-process copy of policy_chunks."""
+
+    backend = "memory"
+
+    def __init__(self, connection, refresh_interval=DEFAULT_REFRESH_INTERVAL,
+                 snapshot_path=None):
+        self.connection = connection
+        self.refresh_interval = refresh_interval
+        self.snapshot_path = snapshot_path
+        self._snapshot = None
+        self._version = 0
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def reload(self):
+        """Discard the in-memory copy and load every chunk again from Postgres."""
+        with self._lock:
+            self._snapshot = None
+            return self._refresh()
+
+    def refresh(self):
+        """Load chunks added or changed since the last refresh and drop deleted ones."""
+        with self._lock:
+            return self._refresh()
+
+    def _load(self):
+        if self.snapshot_path:
+            exported = load_snapshot(self.snapshot_path)
+            with self.connection() as conn:
+                with conn.cursor() as cur:
+                    usable = matches_database(cur, exported)
+            if usable:
+                self._snapshot = _Snapshot.from_export(exported)
+                self._version += 1
+            else:
+                print(f"Snapshot {self.snapshot_path} does not match policy_chunks; "
+                      f"loading every chunk from Postgres instead.")
+        return self._refresh()
+
+    def _refresh(self):
+        started = time.perf_counter()
+        current = self._snapshot
+        with self.connection() as conn:
+            with conn.cursor() as cur:
+                live_ids = None
+                if current is None:
+                    cur.execute(f"""
+                        SELECT {_CHUNK_SELECT}
+                        FROM policy_chunks
+                        WHERE embedding IS NOT NULL
+                        ORDER BY id
+                    """)
+                    fetched = cur.fetchall()
+                else:
+                    # Compare every live id's change time with the one held,
+                    # and fetch the full rows only for those that differ.
+                    cur.execute("""
+                        SELECT id, GREATEST(created_at, updated_at)
+                        FROM policy_chunks
+                        WHERE embedding IS NOT NULL
+                    """)
+                    live = cur.fetchall()
+                    live_ids = np.fromiter((row[0] for row in live), dtype=np.int64,
+                                           count=len(live))
+                    stored = dict(zip(current.ids.tolist(), current.changed_at.tolist()))
+                    wanted = [chunk_id for chunk_id, changed in live
+                              if chunk_id not in stored or stored[chunk_id] != changed]
+                    fetched = []
+                    if wanted:
+                        cur.execute(f"""
+                            SELECT {_CHUNK_SELECT}
+                            FROM policy_chunks
+                            WHERE id = ANY(%s) AND embedding IS NOT NULL
+                            ORDER BY id
+                        """, (wanted,))
+                        fetched = cur.fetchall()
+
+        if current is None or (not len(current) and fetched):
+            current = _Snapshot.empty(len(fetched[0][1]) if fetched else 0)
+        held = set(current.ids.tolist())
+        updated = sum(1 for row in fetched if row[0] in held)
+
+        keep = np.ones(len(current), dtype=bool)
+        if live_ids is not None:
+            keep = np.isin(current.ids, live_ids)
+        removed = int((~keep).sum())
+        if updated:
+            keep &= ~np.isin(current.ids, np.array([row[0] for row in fetched], dtype=np.int64))
+
+        if fetched or removed:
+            kept_rows = [row for row, flag in zip(current.rows, keep) if flag]
+            new_vectors = (np.stack([np.asarray(row[1], dtype=np.float32) for row in fetched])
+                           if fetched else current.vectors[:0])
+            new_metadata = [row[7] or {} for row in fetched]
+
+            def column(values, dtype=object):
+                return np.array(values, dtype=dtype)
+
+            self._snapshot = _Snapshot(
+                ids=np.concatenate([current.ids[keep],
+                                    column([row[0] for row in fetched], np.int64)]),
+                vectors=np.ascontiguousarray(np.concatenate([current.vectors[keep], new_vectors])),
+                inverse_norms=np.concatenate([current.inverse_norms[keep],
+                                              _inverse_norms(new_vectors)]),
+                doc_types=np.concatenate([current.doc_types[keep],
+                                          column([row[2] or "" for row in fetched])]),
+                regulatory_bodies=np.concatenate([current.regulatory_bodies[keep],
+                                                  column([row[3] or "" for row in fetched])]),
+                review_statuses=np.concatenate([
+                    current.review_statuses[keep],
+                    column([metadata.get("review_status") or "" for metadata in new_metadata]),
+                ]),
+                tags=np.concatenate([current.tags[keep],
+                                     column([tag_key(metadata.get("tags"))
+                                             for metadata in new_metadata])]),
+                rows=kept_rows + [tuple(row[4:8]) for row in fetched],
+                changed_at=np.concatenate([
+                    current.changed_at[keep],
+                    column([row[8] for row in fetched], "datetime64[us]"),
+                ]),
+                export_rows=current.export_rows,
+            )
+            self._version += 1
+        else:
+            self._snapshot = current
+        self._refreshed_at = time.monotonic()
+        return {
+            "rows": len(self._snapshot),
+            "added": len(fetched) - updated,
+            "updated": updated,
+            "removed": removed,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def _current(self):
+        """Return the current snapshot, refreshing it first when it is due."""
+        due = time.monotonic() - self._refreshed_at > self.refresh_interval
+        if self._snapshot is None:
+            with self._lock:
+                if self._snapshot is None:
+                    self._load()
+        elif due and self._lock.acquire(blocking=False):
+            # Other threads keep searching the previous snapshot meanwhile.
+            try:
+                self._refresh()
+            finally:
+                self._lock.release()
+        return self._snapshot
+
+    def version(self):
+        """Return a number that changes whenever the in-memory copy does.
+
+        Refreshes the copy first when it is due, as a search would.
+        """
+        self._current()
+        return self._version
+
+    def _filter_mask(self, snapshot, filters):
+        mask = np.ones(len(snapshot), dtype=bool)
+        if filters.get("doc_type"):
+            mask &= snapshot.doc_types == filters["doc_type"]
+        if filters.get("regulatory_body"):
+            mask &= snapshot.regulatory_bodies == filters["regulatory_body"]
+        if filters.get("tag"):
+            needle = tag_key([filters["tag"]])
+            mask &= np.fromiter((needle in tags for tags in snapshot.tags),
+                                dtype=bool, count=len(snapshot))
+        if filters.get("review_status"):
+            mask &= snapshot.review_statuses == filters["review_status"]
+        return mask
+
+    def search(self, query_embedding, filters=None, top_k=5):
+        snapshot = self._current()
+        started = time.perf_counter()
+        if not len(snapshot):
+            return [], {"strategy": "in_memory_exact", "candidates_scanned": 0, "rows": 0}
+
+        scores = (snapshot.vectors @ normalize(query_embedding)[0]) * snapshot.inverse_norms
+        candidates = None
+        if filters and any(filters.get(key) for key in
+                           ("doc_type", "regulatory_body", "tag", "review_status")):
+            candidates = np.flatnonzero(self._filter_mask(snapshot, filters))
+            scores = scores[candidates]
+        positions, best = top_k_scores(scores, top_k)
+        if candidates is not None:
+            positions = candidates[positions]
+
+        results = [_result(*snapshot.row(p), score) for p, score in zip(positions, best)]
+        return results, {
+            "strategy": "in_memory_exact",
+            "candidates_scanned": len(scores),
+            "rows": len(snapshot),
+            "search_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+
+BACKENDS = {
+    PgVectorRetriever.backend: PgVectorRetriever,
+    InMemoryRetriever.backend: InMemoryRetriever,
+}
+
+
+def make_retriever(backend, connection, **kwargs):
+    """Create the retriever for backend ("pgvector" or "memory")."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown retriever backend {backend!r}; choose from {sorted(BACKENDS)}")
+    return BACKENDS[backend](connection, **kwargs)
@@ -0,0 +1,77 @@
+"""
+Batched maintenance for policy_chunks.search_vector.
+
+In the current schema search_vector is a generated column, so Postgres fills
+it on every insert and update and nothing needs backfilling. Databases built
+from an older schema may instead have a plain tsvector column that is NULL for
+rows loaded without it. backfill_search_vectors() fills those rows in keyset
+batches of batch_size, committing after each one. Each batch locks only the
+rows it updates, and the job can be stopped and re-run at any time. Search
+code never writes to the table.
+
+Usage:
+    stats = backfill_search_vectors(conn, batch_size=1000)
+    # {"generated": False, "rows_updated": 5400, "batches": 6}
+"""
+
+import time
+
+DEFAULT_BACKFILL_BATCH_SIZE = 1000
+
+
+def is_generated_column(cursor, table="policy_chunks", column="search_vector"):
+    """Return True when table.column is a generated column."""
+    cursor.execute("""
+        SELECT attgenerated <> ''
+        FROM pg_attribute
+        WHERE attrelid = to_regclass(%s) AND attname = %s AND NOT attisdropped
+    """, (table, column))
+    row = cursor.fetchone()
+    return bool(row and row[0])
+
+
+def backfill_search_vectors(conn, table="policy_chunks", batch_size=DEFAULT_BACKFILL_BATCH_SIZE):
+    """Populate NULL search_vector values in batches, one transaction per batch.
+
+    Does nothing when search_vector is generated. Rows locked by another
+    transaction are skipped and picked up by the next run.
+    Returns {generated, rows_updated, batches, seconds}.
+    """
+    with conn.cursor() as cur:
+        generated = is_generated_column(cur, table)
+    if not conn.autocommit:
+        conn.commit()
+
+    stats = {"generated": generated, "rows_updated": 0, "batches": 0, "seconds": 0.0}
+    if generated:
+        return stats
+
+    started = time.perf_counter()
+    last_id = 0
+    while True:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                UPDATE {table} t
+                SET search_vector = to_tsvector('english', t.content)
+                FROM (
+                    SELECT id FROM {table}
+                    WHERE search_vector IS NULL AND id > %s
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ) batch
+                WHERE t.id = batch.id
+                RETURNING t.id
+            """, (last_id, batch_size))
+            ids = [row[0] for row in cur.fetchall()]
+        if not conn.autocommit:
+            conn.commit()
+        if not ids:
+            break
+        last_id = max(ids)
+        stats["rows_updated"] += len(ids)
+        stats["batches"] += 1
+        print(f"  Backfilled {stats['rows_updated']} search vectors (up to id {last_id})")
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
@@ -0,0 +1,445 @@
+"""
+Embedding snapshots: export policy_chunks to disk, restore it with COPY.
+
+Rebuilding a database from the policy files means embedding every chunk
+through Ollama again, and loading an in-process index from Postgres means
+fetching every vector(1024) as text. A snapshot is a directory that holds
+both in a form that can be memory-mapped:
+
+    manifest.json          format, row count, dimensions, dtype, change-time watermark
+    embeddings.npy         (count, dim) matrix, float16 by default
+    inverse_norms.npy      1 / length of each embedding row (0 for zero vectors)
+    ids.npy                policy_chunks.id of each embedding row
+    changed_at.npy         GREATEST(created_at, updated_at) of each row
+    content_hashes.npy     md5 of each row's content
+    doc_types.npy          doc_type of each row ("" when NULL)
+    regulatory_bodies.npy  regulatory_body of each row ("" when NULL)
+    review_statuses.npy    metadata review_status of each row ("" when unset)
+    tags.npy               metadata tags of each row, as a tag_key() string
+    chunks.jsonl           one line per row: document_id, chunk_index, heading,
+                           content, metadata, doc_title, doc_type,
+                           regulatory_body, content_hash and changed_at
+    offsets.npy            byte offset of each line in chunks.jsonl (count + 1 entries)
+    documents.jsonl        policy_documents metadata, for the restore's upsert
+
+load_snapshot() maps the .npy files with np.load(mmap_mode="r"), so opening a
+snapshot costs the same whatever its size; pages are read as rows are used.
+The row-aligned .npy columns are enough to validate a snapshot and to filter
+its rows, so a reader only parses the chunks.jsonl lines of the rows it
+returns. float16 halves the file and keeps about three significant digits,
+which leaves cosine rankings of bge-m3 embeddings unchanged in practice.
+Export with dtype="float32" for an exact copy that can also be searched
+straight from the memory map.
+
+restore_snapshot() upserts the documents and streams the chunks into
+policy_chunks through ChunkCopyWriter. No model is called. Restored chunks get
+new ids and created_at values.
+
+Because ids are reused after reset_db.py and a re-ingest, a snapshot's ids
+only mean something for the database it was exported from.
+matches_database() checks that before a service relies on them. The database
+must have changes at least as new as the snapshot's watermark, and a sample
+of the snapshot rows whose change time is unchanged in policy_chunks must
+still have the same content hash.
+
+The export runs in one REPEATABLE READ transaction, so every file describes
+the same state of the tables. manifest.json is written last, after the other
+files are in place.
+
+Usage:
+    export_snapshot(conn, "shared/.cache/snapshot")
+    snapshot = load_snapshot("shared/.cache/snapshot")
+    snapshot.embeddings[i], snapshot.chunk(i)
+    restore_snapshot(conn, "shared/.cache/snapshot", replace=True)
+
+    python shared/snapshot.py export [PATH] [--dtype float32]
+    python shared/snapshot.py restore [PATH] [--replace]
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import date, datetime
+
+import numpy as np
+import psycopg2
+from numpy.lib.format import open_memmap
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
+
+from bulk_load import DEFAULT_COPY_BATCH_ROWS, ChunkCopyWriter, upsert_documents
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), ".cache", "snapshot")
+DEFAULT_DTYPE = "float16"
+DEFAULT_FETCH_ROWS = 1000
+SNAPSHOT_FORMAT = 3
+# Unchanged rows whose content hash matches_database() checks.
+HASH_SAMPLE_ROWS = 1000
+
+MANIFEST_FILE = "manifest.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+INVERSE_NORMS_FILE = "inverse_norms.npy"
+IDS_FILE = "ids.npy"
+CHANGED_AT_FILE = "changed_at.npy"
+CONTENT_HASHES_FILE = "content_hashes.npy"
+DOC_TYPES_FILE = "doc_types.npy"
+REGULATORY_BODIES_FILE = "regulatory_bodies.npy"
+REVIEW_STATUSES_FILE = "review_statuses.npy"
+TAGS_FILE = "tags.npy"
+CHUNKS_FILE = "chunks.jsonl"
+OFFSETS_FILE = "offsets.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+
+# Row-aligned columns saved with np.save once the export has read every row.
+_COLUMN_FILES = (INVERSE_NORMS_FILE, IDS_FILE, CHANGED_AT_FILE, CONTENT_HASHES_FILE,
+                 DOC_TYPES_FILE, REGULATORY_BODIES_FILE, REVIEW_STATUSES_FILE, TAGS_FILE,
+                 OFFSETS_FILE)
+_TAG_SEPARATOR = "\x1f"
+
+DB_CONFIG = {
+    "dbname": "pgvector",
+    "user": "postgres",
+    "password": "postgres",
+    "host": "localhost",
+    "port": "5050",
+}
+
+_DOCUMENT_FIELDS = ("doc_id", "title", "doc_type", "regulatory_body", "effective_date")
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _json_line(value):
+    return json.dumps(value, default=_json_default).encode("utf-8") + b"\n"
+
+
+def _tmp(path):
+    return path + ".tmp"
+
+
+def tag_key(tags):
+    """Encode a tag list as one string in which tag_key([tag]) is a substring per tag."""
+    if not tags:
+        return ""
+    return _TAG_SEPARATOR + _TAG_SEPARATOR.join(tags) + _TAG_SEPARATOR
+
+
+class EmbeddingSnapshot:
+    """A snapshot directory opened with its arrays memory-mapped."""
+
+    def __init__(self, path, mmap_mode="r"):
+        self.path = path
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {self.manifest.get('format')!r} "
+                             f"in {path}; expected {SNAPSHOT_FORMAT}")
+
+        def load(name):
+            return np.load(os.path.join(path, name), mmap_mode=mmap_mode)
+
+        self.embeddings = load(EMBEDDINGS_FILE)
+        self.inverse_norms = load(INVERSE_NORMS_FILE)
+        self.ids = load(IDS_FILE)
+        self.changed_at = load(CHANGED_AT_FILE)
+        self.content_hashes = load(CONTENT_HASHES_FILE)
+        self.doc_types = load(DOC_TYPES_FILE)
+        self.regulatory_bodies = load(REGULATORY_BODIES_FILE)
+        self.review_statuses = load(REVIEW_STATUSES_FILE)
+        self.tags = load(TAGS_FILE)
+        self.offsets = load(OFFSETS_FILE)
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    @property
+    def watermark(self):
+        """Latest GREATEST(created_at, updated_at) in the snapshot, or None."""
+        value = self.manifest.get("watermark")
+        return datetime.fromisoformat(value) if value else None
+
+    def chunk(self, index):
+        """Read one row's chunk fields, seeking straight to its line."""
+        start, end = int(self.offsets[index]), int(self.offsets[index + 1])
+        with open(os.path.join(self.path, CHUNKS_FILE), "rb") as f:
+            f.seek(start)
+            return json.loads(f.read(end - start))
+
+    def iter_chunks(self):
+        """Yield every row's chunk fields in embedding-row order."""
+        with open(os.path.join(self.path, CHUNKS_FILE), "rb") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def documents(self):
+        """Return the policy_documents metadata dicts stored with the snapshot."""
+        with open(os.path.join(self.path, DOCUMENTS_FILE), "rb") as f:
+            return [json.loads(line) for line in f]
+
+
+def load_snapshot(path=DEFAULT_SNAPSHOT_PATH):
+    """Open a snapshot directory; embeddings and ids are memory-mapped."""
+    return EmbeddingSnapshot(path)
+
+
+def matches_database(cursor, snapshot, sample_rows=HASH_SAMPLE_ROWS):
+    """Return True if snapshot's ids still refer to the same policy_chunks rows.
+
+    False when the newest change in the database is older than the
+    snapshot's watermark, or when a sampled snapshot row whose change time
+    is unchanged in the database now holds different content. Either means
+    the snapshot came from another database or an earlier load, and its
+    rows must not be used. Rows whose change time differs are not checked;
+    a reader such as InMemoryRetriever fetches them again anyway.
+
+    Reads one id and timestamp per chunk, and hashes the content of at most
+    sample_rows rows, looked up by id.
+    """
+    cursor.execute("""
+        SELECT id, GREATEST(created_at, updated_at)
+        FROM policy_chunks
+        WHERE embedding IS NOT NULL
+    """)
+    current = dict(cursor.fetchall())
+    watermark = snapshot.watermark
+    if watermark is not None:
+        newest = max((changed for changed in current.values() if changed is not None),
+                     default=None)
+        if newest is None or newest < watermark:
+            return False
+
+    unchanged = [
+        position
+        for position, (chunk_id, changed) in enumerate(
+            zip(snapshot.ids.tolist(), snapshot.changed_at.tolist()))
+        if chunk_id in current and current[chunk_id] == changed
+    ]
+    if not unchanged:
+        return True
+    sample = unchanged[::max(1, len(unchanged) // sample_rows)][:sample_rows]
+    expected = {int(snapshot.ids[position]): snapshot.content_hashes[position].decode("ascii")
+                for position in sample}
+    cursor.execute("SELECT id, md5(content) FROM policy_chunks WHERE id = ANY(%s)",
+                   (list(expected),))
+    return all(expected[chunk_id] == digest for chunk_id, digest in cursor.fetchall())
+
+
+def export_snapshot(conn, path=DEFAULT_SNAPSHOT_PATH, dtype=DEFAULT_DTYPE,
+                    fetch_rows=DEFAULT_FETCH_ROWS):
+    """Write every embedded policy_chunks row and its documents to path.
+
+    Rows are read through a server-side cursor fetch_rows at a time and
+    written straight into the memory-mapped embedding file, so the export
+    never holds the corpus in memory. conn needs register_vector applied.
+    Any transaction open on conn is rolled back first, and the connection's
+    session settings are restored afterwards.
+
+    Returns:
+        Dict with rows, documents, dim, dtype, bytes and seconds.
+    """
+    started = time.perf_counter()
+    os.makedirs(path, exist_ok=True)
+    paths = {name: os.path.join(path, name) for name in
+             (MANIFEST_FILE, EMBEDDINGS_FILE, CHUNKS_FILE, DOCUMENTS_FILE) + _COLUMN_FILES}
+
+    # None means the server default, which set_session spells "DEFAULT".
+    session = {
+        "isolation_level": conn.isolation_level or "DEFAULT",
+        "readonly": "DEFAULT" if conn.readonly is None else conn.readonly,
+        "autocommit": conn.autocommit,
+    }
+    if not conn.autocommit:
+        conn.rollback()
+    conn.set_session(isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True,
+                     autocommit=False)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT count(*), max(GREATEST(created_at, updated_at)),
+                       max(vector_dims(embedding))
+                FROM policy_chunks WHERE embedding IS NOT NULL
+            """)
+            count, watermark, dim = cur.fetchone()
+            dim = dim or 0
+
+            cur.execute("""
+                SELECT doc_id, title, doc_type, regulatory_body, effective_date, metadata
+                FROM policy_documents ORDER BY doc_id
+            """)
+            with open(_tmp(paths[DOCUMENTS_FILE]), "wb") as f:
+                documents = 0
+                for row in cur:
+                    metadata = dict(row[5] or {})
+                    for field, value in zip(_DOCUMENT_FIELDS, row[:5]):
+                        if value is not None:
+                            metadata.setdefault(field, value)
+                    f.write(_json_line(metadata))
+                    documents += 1
+
+        embeddings = open_memmap(_tmp(paths[EMBEDDINGS_FILE]), mode="w+",
+                                 dtype=dtype, shape=(count, dim))
+        columns = {
+            INVERSE_NORMS_FILE: np.empty(count, dtype=np.float32),
+            IDS_FILE: np.empty(count, dtype=np.int64),
+            CHANGED_AT_FILE: np.empty(count, dtype="datetime64[us]"),
+            CONTENT_HASHES_FILE: np.empty(count, dtype="S32"),
+            OFFSETS_FILE: np.empty(count + 1, dtype=np.int64),
+        }
+        # Width unknown until every row is read; kept as lists until then.
+        text_columns = {name: [] for name in
+                        (DOC_TYPES_FILE, REGULATORY_BODIES_FILE, REVIEW_STATUSES_FILE, TAGS_FILE)}
+        written = 0
+        with conn.cursor(name="snapshot_export") as cur, \
+                open(_tmp(paths[CHUNKS_FILE]), "wb") as f:
+            cur.itersize = fetch_rows
+            cur.execute("""
+                SELECT id, embedding, document_id, chunk_index, heading, content,
+                       metadata, doc_title, doc_type, regulatory_body,
+                       md5(content), GREATEST(created_at, updated_at)
+                FROM policy_chunks
+                WHERE embedding IS NOT NULL
+                ORDER BY id
+            """)
+            for i, row in enumerate(cur):
+                metadata = row[6] or {}
+                embeddings[i] = row[1]
+                norm = float(np.linalg.norm(embeddings[i].astype(np.float32)))
+                columns[INVERSE_NORMS_FILE][i] = 1.0 / norm if norm > 0 else 0.0
+                columns[IDS_FILE][i] = row[0]
+                columns[CHANGED_AT_FILE][i] = row[11]
+                columns[CONTENT_HASHES_FILE][i] = row[10]
+                columns[OFFSETS_FILE][i] = written
+                text_columns[DOC_TYPES_FILE].append(row[8] or "")
+                text_columns[REGULATORY_BODIES_FILE].append(row[9] or "")
+                text_columns[REVIEW_STATUSES_FILE].append(metadata.get("review_status") or "")
+                text_columns[TAGS_FILE].append(tag_key(metadata.get("tags")))
+                written += f.write(_json_line({
+                    "document_id": row[2],
+                    "chunk_index": row[3],
+                    "heading": row[4],
+                    "content": row[5],
+                    "metadata": row[6],
+                    "doc_title": row[7],
+                    "doc_type": row[8],
+                    "regulatory_body": row[9],
+                    "content_hash": row[10],
+                    "changed_at": row[11],
+                }))
+            columns[OFFSETS_FILE][count] = written
+        embeddings.flush()
+        del embeddings
+    finally:
+        conn.rollback()
+        conn.set_session(**session)
+
+    for name, values in text_columns.items():
+        columns[name] = np.array(values, dtype=str)
+    for name in _COLUMN_FILES:
+        np.save(_tmp(paths[name]), columns[name])
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "count": count,
+        "dim": dim,
+        "dtype": np.dtype(dtype).name,
+        "documents": documents,
+        "watermark": watermark.isoformat() if watermark else None,
+        "exported_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    with open(_tmp(paths[MANIFEST_FILE]), "w") as f:
+        json.dump(manifest, f, indent=2)
+    # np.save appends .npy to names that lack it.
+    for name in _COLUMN_FILES:
+        os.replace(_tmp(paths[name]) + ".npy", paths[name])
+    for name in (EMBEDDINGS_FILE, CHUNKS_FILE, DOCUMENTS_FILE, MANIFEST_FILE):
+        os.replace(_tmp(paths[name]), paths[name])
+
+    return {
+        "rows": count,
+        "documents": documents,
+        "dim": dim,
+        "dtype": manifest["dtype"],
+        "bytes": sum(os.path.getsize(p) for p in paths.values()),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def restore_snapshot(conn, path=DEFAULT_SNAPSHOT_PATH, replace=False,
+                     batch_rows=DEFAULT_COPY_BATCH_ROWS):
+    """Load a snapshot's documents and chunks into the database.
+
+    Args:
+        conn: psycopg2 connection with the schema in place.
+        path: Snapshot directory written by export_snapshot().
+        replace: Delete the stored chunks of the snapshot's documents first.
+            Without it, restoring into a database that already holds those
+            chunks duplicates them.
+        batch_rows: Rows per COPY batch.
+
+    Returns:
+        Dict with documents, chunks_removed, rows_written, batches_committed
+        and seconds.
+    """
+    started = time.perf_counter()
+    snapshot = load_snapshot(path)
+    documents = snapshot.documents()
+    removed = 0
+    with conn.cursor() as cur:
+        upserted = upsert_documents(cur, documents)
+        if replace:
+            doc_ids = list(dict.fromkeys(doc.get("doc_id", "unknown") for doc in documents))
+            cur.execute("DELETE FROM policy_chunks WHERE document_id = ANY(%s)", (doc_ids,))
+            removed = cur.rowcount
+    if not conn.autocommit:
+        conn.commit()
+
+    with ChunkCopyWriter(conn, batch_rows=batch_rows) as writer:
+        for chunk, embedding in zip(snapshot.iter_chunks(), snapshot.embeddings):
+            writer.write(chunk, embedding)
+    return {
+        "documents": upserted,
+        "chunks_removed": removed,
+        **writer.stats(),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+if __name__ == "__main__":
+    from contextlib import nullcontext
+
+    from index_build import deferred_indexes, is_bulk_load
+    from migrations import ensure_schema
+    from pgvector_adapter import register_vector
+
+    parser = argparse.ArgumentParser(description="Export or restore an embedding snapshot.")
+    parser.add_argument("command", choices=["export", "restore"])
+    parser.add_argument("path", nargs="?", default=DEFAULT_SNAPSHOT_PATH,
+                        help=f"snapshot directory (default: {DEFAULT_SNAPSHOT_PATH})")
+    parser.add_argument("--dtype", choices=["float16", "float32"], default=DEFAULT_DTYPE,
+                        help="embedding precision for export")
+    parser.add_argument("--replace", action="store_true",
+                        help="on restore, delete the stored chunks of the snapshot's "
+                             "documents first")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    register_vector(conn)
+    if args.command == "export":
+        stats = export_snapshot(conn, args.path, dtype=args.dtype)
+        print(f"Exported {stats['rows']} chunks and {stats['documents']} documents "
+              f"to {args.path} ({stats['bytes'] / 1e6:.1f} MB, {stats['seconds']}s)")
+    else:
+        applied = ensure_schema(conn)
+        if applied:
+            print(f"Applied migrations: {', '.join(applied)}")
+        with conn.cursor() as cur:
+            defer = is_bulk_load(cur, "policy_chunks", len(load_snapshot(args.path)))
+        with deferred_indexes(conn, monitor_config=DB_CONFIG) if defer else nullcontext():
+            stats = restore_snapshot(conn, args.path, replace=args.replace)
+        print(f"Restored {stats['rows_written']} chunks and {stats['documents']} documents "
+              f"from {args.path} ({stats['seconds']}s)")
+    conn.close()
@@ -0,0 +1,125 @@
+"""
+Generator stages for streaming ingestion.
+
+Loading a whole corpus into a list of documents, then a list of chunks, then a
+list of embeddings keeps all of it in memory at once. These stages are
+generators instead: each document is read, parsed and chunked only when the
+next stage asks for it, and embeddings exist for one batch at a time. Peak
+memory is therefore set by the batch sizes, not by the size of the corpus.
+
+    paths -> read_documents -> iter_chunks -> embed_batches -> writer
+
+Every stage accepts any iterable, so stages can be chained, replaced or fed
+from a list in tests. ingest_in_transactions runs the chunk and embed stages
+on one batch of documents at a time, then writes the batch's document rows,
+hashes and chunks in a single short transaction.
+
+Usage:
+    documents = read_documents(iter_document_paths(POLICIES_DIR), parse_frontmatter)
+    chunks = iter_chunks(documents, chunk_document)
+    for batch, embeddings in embed_batches(chunks, embed_texts, batch_size=32):
+        ...
+
+    ingest_in_transactions(conn, documents, chunk_document, embed_fn=embed_chunks)
+"""
+
+import os
+
+from async_ingest import iter_batches
+from bulk_load import DEFAULT_COPY_BATCH_ROWS, ChunkCopyWriter, upsert_documents
+from incremental_ingest import transaction
+
+DEFAULT_DOCUMENT_BATCH_SIZE = 100
+DEFAULT_EMBED_BATCH_SIZE = 32
+
+
+def iter_document_paths(directory, suffix=".md"):
+    """Yield the paths of the files in directory ending with suffix, by name."""
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(suffix):
+            yield os.path.join(directory, filename)
+
+
+def read_documents(paths, parse_fn):
+    """Yield {"metadata", "content"} documents, reading one file at a time.
+
+    parse_fn takes a file's text and returns (metadata, body).
+    """
+    for path in paths:
+        with open(path, "r") as f:
+            text = f.read()
+        metadata, body = parse_fn(text)
+        yield {"metadata": metadata, "content": body}
+
+
+def ingest_in_transactions(conn, documents, chunk_fn, embed_fn, prepare_fn=None,
+                           replace=False, batch_size=DEFAULT_DOCUMENT_BATCH_SIZE,
+                           copy_rows=DEFAULT_COPY_BATCH_ROWS, stats=None):
+    """Load documents batch by batch, each batch in one short transaction.
+
+    Every batch is chunked and embedded first, with no transaction open, so
+    slow embedding requests hold no locks. A transaction then upserts the
+    batch's policy_documents rows (and with replace, deletes their stored
+    chunks), COPYs the new chunks and commits. The document rows, their
+    hashes and their chunks become visible together: readers keep the old
+    chunks until the commit, and a failure rolls the whole batch back
+    instead of leaving documents with a hash but no chunks.
+
+    Args:
+        conn: psycopg2 connection.
+        documents: Iterable of {"metadata", "content"} documents.
+        chunk_fn: Function mapping a document to its list of chunk dicts.
+        embed_fn: Function mapping a list of chunk dicts to one embedding
+            per chunk, in order.
+        prepare_fn: Optional function mapping a document to the metadata dict
+            to upsert (e.g. to add a content hash); defaults to its metadata.
+        replace: Delete the stored chunks of each batch's documents first.
+        batch_size: Documents per transaction; their chunks and embeddings
+            are held in memory until it commits.
+        copy_rows: Rows per COPY statement.
+        stats: Optional dict; "documents", "chunks_removed", "rows_written"
+            and "transactions" are added to it.
+
+    Returns:
+        The stats dict.
+    """
+    stats = {} if stats is None else stats
+    for key in ("documents", "chunks_removed", "rows_written", "transactions"):
+        stats.setdefault(key, 0)
+    for batch in iter_batches(documents, batch_size):
+        rows = [prepare_fn(doc) if prepare_fn else doc["metadata"] for doc in batch]
+        chunks = list(iter_chunks(batch, chunk_fn))
+        embeddings = embed_fn(chunks) if chunks else []
+        if len(embeddings) != len(chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(chunks)} chunks")
+
+        with transaction(conn) as cur:
+            documents_written = upsert_documents(cur, rows)
+            chunks_removed = 0
+            if replace:
+                doc_ids = list(dict.fromkeys(row.get("doc_id", "unknown") for row in rows))
+                cur.execute("DELETE FROM policy_chunks WHERE document_id = ANY(%s)", (doc_ids,))
+                chunks_removed = cur.rowcount
+            with ChunkCopyWriter(conn, batch_rows=copy_rows, commit=False) as writer:
+                writer.write_many(chunks, embeddings)
+        stats["documents"] += documents_written
+        stats["chunks_removed"] += chunks_removed
+        stats["rows_written"] += writer.rows_written
+        stats["transactions"] += 1
+    return stats
+
+
+def iter_chunks(documents, chunk_fn):
+    """Yield the chunks of each document in turn; chunk_fn(doc) returns a list."""
+    for doc in documents:
+        yield from chunk_fn(doc)
+
+
+def embed_batches(chunks, embed_fn, batch_size=DEFAULT_EMBED_BATCH_SIZE):
+    """Yield (batch, embeddings) for consecutive batches of chunks.
+
+    chunks can be any iterable of dicts with a "content" key; embed_fn maps a
+    list of texts to their embeddings.
+    """
+    for batch in iter_batches(chunks, batch_size):
+        yield batch, embed_fn([chunk["content"] for chunk in batch])